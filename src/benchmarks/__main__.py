@@ -0,0 +1,74 @@
+"""
+Benchmark generating and rendering flashcards against local stubs of the APIs.
+
+Run from the src directory, for example:
+
+    python -m benchmarks --corpus 10 100 --output benchmarks.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from src.benchmarks.bench import corpora, runBenchmarks, stages
+from src.flashcards.styles.styles import styles
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="benchmarks", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument(
+        "--corpus",
+        type=int,
+        nargs="+",
+        choices=corpora,
+        default=[10],
+        help="The sizes of the word corpora to run.",
+    )
+    parser.add_argument(
+        "--stage",
+        nargs="+",
+        choices=stages,
+        default=list(stages),
+        help="The stages to measure. Generation always runs.",
+    )
+    parser.add_argument("--style", choices=list(styles), default="watercolor")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="The maximum number of flashcards generated at once.",
+    )
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1,
+        help="The factor to scale the recorded API latencies by, or 0 for none.",
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="The JSON file to write the results to, or - for stdout.",
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        runBenchmarks(
+            tuple(args.corpus),
+            styles[args.style],
+            args.concurrency,
+            args.latency_scale,
+            tuple(args.stage),
+        )
+    )
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
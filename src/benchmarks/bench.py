@@ -0,0 +1,225 @@
+import asyncio
+import base64
+import os
+import platform
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+import aiohttp
+
+from src.benchmarks.stubs import StubServer
+from src.converter import convertToPdf
+from src.converter.backends import getBackend
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.generator import Generator
+from src.flashcards.styles.styles import Style, styles
+from src.flashcards.utils.images import ImageStore
+from src.flashcards.utils.limits import Limits
+from src.flashcards.utils.misc import strAsBase64
+from src.flashcards.utils.openai import OpenAiClient
+
+__all__ = ("corpora", "corpus", "summarize", "runBenchmarks", "stages")
+
+corpusPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.txt")
+
+# The sizes of the word corpora, which are prefixes of the same fixed word list.
+corpora = (10, 100, 1000)
+
+stages = ("generator", "prerender", "convertToPdf", "render")
+
+
+def corpus(size: int) -> list[str]:
+    """
+    A fixed corpus of words.
+
+    Args:
+        size: The number of words, from `corpora`.
+
+    Returns:
+        The words.
+    """
+    if size not in corpora:
+        raise ValueError("Unknown corpus size.", size)
+    with open(corpusPath) as f:
+        return [line.strip() for line in f if line.strip()][:size]
+
+
+def summarize(latencies: list[float], seconds: float) -> dict[str, float]:
+    """
+    Summarize the latencies of a stage.
+
+    Args:
+        latencies: The seconds each item of the stage took.
+        seconds: The wall-clock seconds the whole stage took.
+
+    Returns:
+        The number of items, the throughput in items per second, and the mean,
+        maximum and 50th, 95th and 99th percentile latencies in seconds.
+    """
+    latencies = sorted(latencies)
+    if len(latencies) > 1:
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    else:
+        percentiles = latencies * 99
+    return {
+        "count": len(latencies),
+        "seconds": seconds,
+        "throughput": len(latencies) / seconds if seconds else 0.0,
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+        "p50": percentiles[49] if latencies else 0.0,
+        "p95": percentiles[94] if latencies else 0.0,
+        "p99": percentiles[98] if latencies else 0.0,
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+async def benchGenerator(
+    words: list[str],
+    style: Style,
+    stubs: StubServer,
+    concurrency: int,
+    imagePath: str,
+) -> tuple[dict, list[Flashcard]]:
+    """
+    Measure generating the fields of flashcards against the stub servers.
+
+    Returns:
+        The summary of the stage, and the generated flashcards.
+    """
+    flashcards = [Flashcard(word, style) for word in words]
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    imageStore = ImageStore(imagePath)
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0)
+    ) as session:
+        # The stubs are not rate limited, so neither is the client.
+        openai = OpenAiClient(
+            session,
+            baseUrl=stubs.openaiUrl,
+            apiKey="stub",
+            requestsPerMinute=float("inf"),
+            tokensPerMinute=float("inf"),
+            imagesPerMinute=float("inf"),
+        )
+        limits = Limits()
+
+        async def generate(flashcard: Flashcard):
+            generator = Generator(
+                flashcard.word,
+                session,
+                limits=limits,
+                imageStore=imageStore,
+                openai=openai,
+                apiUrls=stubs.apiUrls,
+            )
+            async with semaphore:
+                start = time.perf_counter()
+                await flashcard.generate(generator=generator)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*map(generate, flashcards))
+        seconds = time.perf_counter() - start
+
+    summary = summarize(latencies, seconds)
+    summary["requests"] = dict(stubs.requests)
+    return summary, flashcards
+
+
+def benchSync(items: list, function: Callable[[object], object]) -> dict:
+    """
+    Measure a blocking function over items, one at a time.
+
+    The stage is skipped, with the error as the reason, if the first item fails,
+    such as when no browser is available.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i, item in enumerate(items):
+        itemStart = time.perf_counter()
+        try:
+            function(item)
+        except Exception as error:
+            if i == 0:
+                return {"skipped": repr(error)}
+            raise
+        latencies.append(time.perf_counter() - itemStart)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def prerender(flashcard: Flashcard) -> tuple[str, str]:
+    """Template both sides of a flashcard, as rendering it does."""
+    return flashcard._prerenderSides(getBackend(flashcard.style.backend).assetUrl)
+
+
+def printFront(flashcard: Flashcard) -> bytes:
+    """Print the front of a flashcard with `convertToPdf`."""
+    svg = strAsBase64(flashcard._prerenderFront())
+    return base64.b64decode(convertToPdf(svg, "image/svg+xml", *flashcard.style.size))
+
+
+async def runBenchmarks(
+    sizes: tuple[int, ...] = (10,),
+    style: Style | None = None,
+    concurrency: int = 8,
+    latencyScale: float = 1,
+    selectedStages: tuple[str, ...] = stages,
+) -> dict:
+    """
+    Run the benchmarks.
+
+    Each corpus is generated against fresh stub servers, and the generated
+    flashcards are then prerendered, printed and rendered one at a time, so that
+    every stage is measured on its own.
+
+    Args:
+        sizes: The sizes of the corpora to run, from `corpora`.
+        style: The style of the flashcards. The watercolor style is used if this is
+            None.
+        concurrency: The maximum number of flashcards generated at once.
+        latencyScale: The factor to scale the stubs' recorded latencies by.
+        selectedStages: The stages to measure, from `stages`. Generation always
+            runs, since the other stages need its flashcards.
+
+    Returns:
+        The results, keyed by corpus size and stage, with details of the run.
+    """
+    style = style or styles["watercolor"]
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {
+            "style": style.name,
+            "concurrency": concurrency,
+            "latencyScale": latencyScale,
+        },
+        "corpora": {},
+    }
+    for size in sizes:
+        words = corpus(size)
+        with tempfile.TemporaryDirectory() as imagePath:
+            async with StubServer(latencyScale) as stubs:
+                generatorResults, flashcards = await benchGenerator(
+                    words, style, stubs, concurrency, imagePath
+                )
+
+            corpusResults = {"generator": generatorResults}
+            for stage, function in (
+                ("prerender", prerender),
+                ("convertToPdf", printFront),
+                ("render", Flashcard.render),
+            ):
+                if stage in selectedStages:
+                    corpusResults[stage] = await asyncio.to_thread(
+                        benchSync, flashcards, function
+                    )
+        results["corpora"][str(size)] = corpusResults
+    return results
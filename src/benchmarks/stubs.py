@@ -0,0 +1,255 @@
+import asyncio
+import base64
+import io
+import itertools
+import json
+import os
+import re
+import socket
+import string
+from collections import Counter
+
+import PIL.Image
+from aiohttp import web
+
+from src.flashcards.generator import aiPrompts
+
+__all__ = ("StubServer",)
+
+fixturesPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# What GPT is asked for in batches, mapped to the prompts asking for it alone.
+batchPrompts = {"imagePrompts": "dallePrompt", "rhymes": "rhyming"}
+
+
+def loadFixture(name: str) -> str:
+    """Read a fixture, as text with {{word}} placeholders."""
+    with open(os.path.join(fixturesPath, f"{name}.json")) as f:
+        return f.read()
+
+
+def promptPattern(template: str) -> re.Pattern:
+    """
+    A pattern matching the messages a prompt template formats to.
+
+    Each placeholder of the template becomes a named group.
+    """
+    pattern = []
+    seen = set()
+    for literal, field, _, _ in string.Formatter().parse(template):
+        pattern.append(re.escape(literal))
+        if field is None:
+            continue
+        pattern.append(f"(?P={field})" if field in seen else f"(?P<{field}>.*?)")
+        seen.add(field)
+    return re.compile("".join(pattern), re.DOTALL)
+
+
+class StubServer:
+    """
+    Local stand-ins of the upstream APIs, replaying recorded fixtures.
+
+    The dictionary, Webster, Datamuse, RhymeBrain and OpenAI APIs are served from
+    one local aiohttp server. Every response is a recorded response with the word
+    asked about substituted in, and is delayed by the next of the latencies recorded
+    for its provider, so that runs are repeatable.
+
+    Args:
+        latencyScale: The factor to scale the recorded latencies by, or 0 to answer
+            at once.
+        host: The interface to listen on.
+
+    Attributes:
+        requests: The number of requests served, keyed by provider.
+    """
+
+    def __init__(self, latencyScale: float = 1, host: str = "127.0.0.1"):
+        self.latencyScale = latencyScale
+        self.host = host
+        self.requests: Counter[str] = Counter()
+        self.url: str | None = None
+
+        self._fixtures = {
+            name: loadFixture(name)
+            for name in ("dictionary", "webster", "datamuse", "rhymebrain")
+        }
+        self._gpt = json.loads(loadFixture("gpt"))
+        self._latencies = {
+            provider: itertools.cycle(latencies)
+            for provider, latencies in json.loads(loadFixture("latencies")).items()
+        }
+        self._prompts = {
+            field: promptPattern(prompt["messages"][-1]["content"])
+            for field, prompt in aiPrompts.items()
+        }
+        self._image: str | None = None
+        self._runner: web.AppRunner | None = None
+
+    async def __aenter__(self) -> "StubServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.stop()
+
+    @property
+    def apiUrls(self) -> dict[str, str]:
+        """The base URLs to point generators at. See `Generator`."""
+        return {
+            "dictionary": f"{self.url}/dictionary",
+            "basicThesaurus": f"{self.url}/webster/thesaurus",
+            "advancedThesaurus": f"{self.url}/webster/ithesaurus",
+            "rhymezone": f"{self.url}/datamuse/words",
+            "rhymebrain": f"{self.url}/rhymebrain/talk?function=getRhymes",
+        }
+
+    @property
+    def openaiUrl(self) -> str:
+        """The base URL to point OpenAI clients at. See `OpenAiClient`."""
+        return f"{self.url}/openai"
+
+    async def start(self):
+        """Start serving on a free port."""
+        app = web.Application()
+        app.add_routes(
+            [
+                web.get("/dictionary/{word}", self._dictionary),
+                web.get("/webster/{thesaurus}/{word}", self._webster),
+                web.get("/datamuse/words", self._datamuse),
+                web.get("/rhymebrain/talk", self._rhymebrain),
+                web.post("/openai/chat/completions", self._chatCompletions),
+                web.post("/openai/images/generations", self._imageGenerations),
+            ]
+        )
+        self._image = await asyncio.to_thread(self._renderImage)
+
+        sock = socket.socket()
+        sock.bind((self.host, 0))
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        self.url = f"http://{self.host}:{sock.getsockname()[1]}"
+
+    async def stop(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _replay(self, provider: str, name: str, word: str) -> web.Response:
+        """Respond with a fixture after its provider's recorded latency."""
+        await self._delay(provider)
+        body = self._fixtures[name].replace("{{word}}", json.dumps(word)[1:-1])
+        return web.Response(text=body, content_type="application/json")
+
+    async def _delay(self, provider: str):
+        self.requests[provider] += 1
+        if self.latencyScale:
+            await asyncio.sleep(next(self._latencies[provider]) * self.latencyScale)
+
+    async def _dictionary(self, request: web.Request) -> web.Response:
+        word = request.match_info["word"]
+        return await self._replay("dictionary", "dictionary", word)
+
+    async def _webster(self, request: web.Request) -> web.Response:
+        return await self._replay("webster", "webster", request.match_info["word"])
+
+    async def _datamuse(self, request: web.Request) -> web.Response:
+        word = request.query.get("rel_rhy", "")
+        return await self._replay("datamuse", "datamuse", word)
+
+    async def _rhymebrain(self, request: web.Request) -> web.Response:
+        word = request.query.get("word", "")
+        return await self._replay("rhymebrain", "rhymebrain", word)
+
+    async def _chatCompletions(self, request: web.Request) -> web.Response:
+        reqData = await request.json()
+        await self._delay("gpt")
+        prompt = reqData["messages"][-1]["content"]
+        content = self._complete(prompt)
+        promptTokens = sum(len(m["content"]) for m in reqData["messages"]) // 4
+        completionTokens = len(content) // 4
+        return web.json_response(
+            {
+                "object": "chat.completion",
+                "model": reqData.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": promptTokens,
+                    "completion_tokens": completionTokens,
+                    "total_tokens": promptTokens + completionTokens,
+                },
+            }
+        )
+
+    async def _imageGenerations(self, request: web.Request) -> web.Response:
+        reqData = await request.json()
+        await self._delay("dalle")
+        return web.json_response(
+            {"data": [{"b64_json": self._image} for _ in range(reqData.get("n", 1))]}
+        )
+
+    def _complete(self, prompt: str) -> str:
+        """Answer a prompt the way the model answers the prompt it comes from."""
+        for field, pattern in self._prompts.items():
+            match = pattern.fullmatch(prompt)
+            if match is None:
+                continue
+            if field == "batch":
+                return self._completeBatch(match["words"], match["fields"])
+            count = int(match.groupdict().get("count") or 1)
+            return self._answer(field, match.groupdict().get("word", ""), count)
+        return ""
+
+    def _completeBatch(self, words: str, fields: str) -> str:
+        """Answer a batch prompt with a JSON object of fields per word."""
+        answers = {}
+        for word in json.loads(words):
+            answers[word] = {}
+            requested = re.findall(r'- "(\w+)": (?:a list of (\d+))?', fields)
+            for field, count in requested:
+                items = self._items(batchPrompts.get(field, field), word)
+                if field == "offensive":
+                    answers[word][field] = False
+                elif isinstance(items, list):
+                    answers[word][field] = items[: int(count or 1)]
+                else:
+                    answers[word][field] = items
+        return json.dumps(answers)
+
+    def _answer(self, field: str, word: str, count: int) -> str:
+        """Format a fixture the way the model formats its answer to a prompt."""
+        items = self._items(field, word)
+        if not isinstance(items, list):
+            return items
+        items = list(itertools.islice(itertools.cycle(items), count))
+        if field in ("definitions", "dallePrompt"):
+            items = [f"{i}. {item}" for i, item in enumerate(items, start=1)]
+        elif field == "inspirationalQuotes":
+            items = [f'"{item}"' for item in items]
+        return "\n".join(items)
+
+    def _items(self, field: str, word: str) -> str | list[str]:
+        """The recorded answer of a prompt, for a word."""
+        value = self._gpt.get(field, "")
+        if isinstance(value, list):
+            return [item.replace("{{word}}", word) for item in value]
+        return value.replace("{{word}}", word)
+
+    @staticmethod
+    def _renderImage() -> str:
+        """A 1024x1024 PNG, base-64 encoded, standing in for generated images."""
+        gradient = PIL.Image.radial_gradient("L").resize((1024, 1024))
+        noise = PIL.Image.effect_noise((1024, 1024), 24)
+        image = PIL.Image.merge(
+            "RGB", (gradient, PIL.Image.blend(gradient, noise, 0.3), noise)
+        )
+        data = io.BytesIO()
+        image.save(data, "PNG")
+        return base64.b64encode(data.getvalue()).decode("utf-8")
@@ -1 +1,9 @@
-from .render import convertToPdf
+from .assets import AssetServer, assets
+from .engine import Engine, engine
+from .render import (
+    convertDocumentToPdf,
+    convertDocumentToPng,
+    convertPagesToPdf,
+    convertToPdf,
+)
+from .writer import DeckWriter, Layout
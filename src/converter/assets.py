@@ -0,0 +1,231 @@
+import atexit
+import contextvars
+import html
+import mimetypes
+import os
+import secrets
+import shutil
+import threading
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+__all__ = ("AssetServer", "assets")
+
+# The tokens of the files published in the current scope, if there is one.
+_scopeTokens: contextvars.ContextVar[list[str] | None] = contextvars.ContextVar(
+    "scopeTokens", default=None
+)
+
+
+class AssetServer:
+    """
+    A local HTTP server that hands documents and files to the browser by reference.
+
+    Instead of being inlined as base-64 data URIs, and then passed to the browser as
+    JavaScript string literals, documents and images are published under unguessable
+    URLs that the browser fetches itself. Files are streamed from disk, and documents
+    are only kept in memory while they are published. Files are published for the
+    duration of the `scope` they are published in, so long-running processes do not
+    accumulate them.
+
+    The server listens on the loopback interface, on a port chosen by the OS, and is
+    only started once something is published. It runs on a daemon thread, serving
+    each request on a thread of its own, so it works with blocking renderers.
+
+    Args:
+        host: The interface to listen on.
+    """
+
+    def __init__(self, host: str = "127.0.0.1"):
+        self.host = host
+        self._server: ThreadingHTTPServer | None = None
+        self._lock = threading.Lock()
+        self._documents: dict[str, tuple[bytes, str]] = {}
+        self._files: dict[str, tuple[str, str]] = {}
+        self._fileTokens: dict[str, str] = {}
+        self._fileUsers: dict[str, int] = {}
+
+    @property
+    def running(self) -> bool:
+        """Whether the server has been started."""
+        return self._server is not None
+
+    def start(self) -> str:
+        """
+        Start the server, unless it is already running.
+
+        Returns:
+            The base URL of the server.
+        """
+        with self._lock:
+            if self._server is None:
+                self._server = ThreadingHTTPServer((self.host, 0), self._handler())
+                self._server.daemon_threads = True
+                threading.Thread(
+                    target=self._server.serve_forever, name="assets", daemon=True
+                ).start()
+                atexit.register(self.stop)
+            host, port = self._server.server_address[:2]
+            return f"http://{host}:{port}"
+
+    def stop(self):
+        """Stop the server, if it is running."""
+        with self._lock:
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
+                atexit.unregister(self.stop)
+
+    def publishFile(self, path: str) -> str:
+        """
+        Publish a file until the current `scope` exits.
+
+        Files published outside of any scope stay published for as long as the
+        server runs. A file published by several scopes keeps the same URL until the
+        last of them exits.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The URL of the file.
+        """
+        path = os.path.abspath(path)
+        baseUrl = self.start()
+        with self._lock:
+            token = self._fileTokens.get(path)
+            if token is None:
+                token = secrets.token_urlsafe(16)
+                mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                self._files[token] = (path, mimetype)
+                self._fileTokens[path] = token
+                self._fileUsers[token] = 0
+            # Files published outside of a scope are never released.
+            self._fileUsers[token] += 1
+            scopeTokens = _scopeTokens.get()
+            if scopeTokens is not None:
+                scopeTokens.append(token)
+            return f"{baseUrl}/{token}"
+
+    @contextmanager
+    def scope(self) -> Iterator[None]:
+        """
+        Unpublish the files published in the context once it exits.
+
+        The scope is carried by the context, so it covers files published on worker
+        threads that copied the context, such as with `asyncio.to_thread`.
+        """
+        tokens = []
+        reset = _scopeTokens.set(tokens)
+        try:
+            yield
+        finally:
+            _scopeTokens.reset(reset)
+            with self._lock:
+                for token in tokens:
+                    self._fileUsers[token] -= 1
+                    if not self._fileUsers[token]:
+                        del self._fileUsers[token]
+                        del self._fileTokens[self._files.pop(token)[0]]
+
+    @contextmanager
+    def published(self, data: str | bytes, mimetype: str) -> Iterator[str]:
+        """
+        Publish a document for the duration of the context.
+
+        Args:
+            data: The document.
+            mimetype: The mimetype of the document.
+
+        Yields:
+            The URL of the document.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+            mimetype = f"{mimetype}; charset=utf-8"
+        baseUrl = self.start()
+        token = secrets.token_urlsafe(16)
+        self._documents[token] = (data, mimetype)
+        try:
+            yield f"{baseUrl}/{token}"
+        finally:
+            del self._documents[token]
+
+    @contextmanager
+    def pages(self, pages: list[str], width: int, height: int) -> Iterator[str]:
+        """
+        Publish SVGs as the pages of one document, for the duration of the context.
+
+        Each SVG is framed as a document of its own, so the files it references are
+        loaded, and its styles do not leak into the other pages.
+
+        Args:
+            pages: The SVGs, in page order.
+            width: The width of each SVG.
+            height: The height of each SVG.
+
+        Yields:
+            The URL of the document.
+        """
+        with ExitStack() as stack:
+            urls = [
+                stack.enter_context(self.published(page, "image/svg+xml"))
+                for page in pages
+            ]
+            frames = "".join(
+                f'<iframe src="{html.escape(url)}" scrolling="no"></iframe>'
+                for url in urls
+            )
+            document = (
+                "<!DOCTYPE html><html><head><style>"
+                "body { margin: 0; }"
+                f"iframe {{ display: block; border: 0; width: {width}px;"
+                f" height: {height}px; break-after: page; }}"
+                "iframe:last-child { break-after: auto; }"
+                f"</style></head><body>{frames}</body></html>"
+            )
+            with self.published(document, "text/html") as url:
+                yield url
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        """The request handler class of the server, bound to this instance."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                token = self.path.lstrip("/").split("?", 1)[0]
+                if token in server._documents:
+                    data, mimetype = server._documents[token]
+                    self._respond(mimetype, len(data), "no-store")
+                    self.wfile.write(data)
+                elif token in server._files:
+                    path, mimetype = server._files[token]
+                    try:
+                        f = open(path, "rb")
+                    except OSError:
+                        self.send_error(404)
+                        return
+                    with f:
+                        # Files keep their URL, so the browser may reuse them.
+                        size = os.fstat(f.fileno()).st_size
+                        self._respond(mimetype, size, "max-age=3600")
+                        shutil.copyfileobj(f, self.wfile)
+                else:
+                    self.send_error(404)
+
+            def _respond(self, mimetype: str, length: int, cacheControl: str):
+                self.send_response(200)
+                self.send_header("Content-Type", mimetype)
+                self.send_header("Content-Length", str(length))
+                self.send_header("Cache-Control", cacheControl)
+                self.end_headers()
+
+            def log_message(self, *_):
+                pass
+
+        return Handler
+
+
+assets = AssetServer()
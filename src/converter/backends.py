@@ -0,0 +1,157 @@
+import io
+import mimetypes
+from abc import ABC, abstractmethod
+
+from src.converter.assets import assets
+from src.converter.render import convertDocumentToPdf, convertDocumentToPng
+from src.flashcards.utils.misc import fileAsBase64
+
+__all__ = ("Backend", "ChromeBackend", "VectorBackend", "backends", "getBackend")
+
+
+class Backend(ABC):
+    """
+    A way of converting rendered SVGs to PDFs and PNGs.
+
+    Attributes:
+        name: The name styles refer to the backend by.
+    """
+
+    name: str
+
+    def assetUrl(self, path: str) -> str:
+        """
+        The URL that SVGs rendered by the backend refer to a file on disk by.
+
+        Files are inlined as base-64 data URIs by default.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The URL.
+        """
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return f"data:{mimetype};base64,{fileAsBase64(path)}"
+
+    @abstractmethod
+    def svgToPdf(self, pages: list[str], width: int, height: int) -> bytes:
+        """
+        Convert SVGs to a single PDF, with one SVG per page.
+
+        Args:
+            pages: The SVGs, in page order.
+            width: The width of each SVG.
+            height: The height of each SVG.
+
+        Returns:
+            The PDF.
+        """
+
+    @abstractmethod
+    def svgToPng(self, svg: str, width: int, height: int, scale: float = 1) -> bytes:
+        """
+        Convert an SVG to a PNG.
+
+        Args:
+            svg: The SVG.
+            width: The width of the SVG.
+            height: The height of the SVG.
+            scale: The number of PNG pixels per SVG pixel.
+
+        Returns:
+            The PNG.
+        """
+
+
+class ChromeBackend(Backend):
+    """
+    Renders SVGs by printing them with headless Chrome.
+
+    The SVGs, and the files they refer to, are served to the browser by the local
+    asset server, so neither has to be base-64 encoded on the way.
+    """
+
+    name = "chrome"
+
+    def assetUrl(self, path: str) -> str:
+        return assets.publishFile(path)
+
+    def svgToPdf(self, pages: list[str], width: int, height: int) -> bytes:
+        with assets.pages(pages, width, height) as url:
+            return convertDocumentToPdf(url, width, height)
+
+    def svgToPng(self, svg: str, width: int, height: int, scale: float = 1) -> bytes:
+        with assets.pages([svg], width, height) as url:
+            return convertDocumentToPng(url, width, height, scale)
+
+
+class VectorBackend(Backend):
+    """
+    Renders SVGs in-process with CairoSVG, without a browser.
+
+    Notes:
+        CairoSVG does not lay out HTML, so the contents of <foreignObject> elements
+        are not drawn. Styles that rely on them should keep the chrome backend.
+    """
+
+    name = "vector"
+
+    def svgToPdf(self, pages: list[str], width: int, height: int) -> bytes:
+        cairosvg = self._cairosvg()
+        from pypdf import PdfWriter
+
+        # At 72 DPI one SVG pixel is one PDF point, matching the chrome backend.
+        writer = PdfWriter()
+        for page in pages:
+            writer.append(
+                io.BytesIO(
+                    cairosvg.svg2pdf(
+                        bytestring=page.encode("utf-8"),
+                        dpi=72,
+                        output_width=width,
+                        output_height=height,
+                    )
+                )
+            )
+
+        bytes_stream = io.BytesIO()
+        writer.write(bytes_stream)
+        return bytes_stream.getvalue()
+
+    def svgToPng(self, svg: str, width: int, height: int, scale: float = 1) -> bytes:
+        return self._cairosvg().svg2png(
+            bytestring=svg.encode("utf-8"),
+            output_width=round(width * scale),
+            output_height=round(height * scale),
+        )
+
+    @staticmethod
+    def _cairosvg():
+        """Import CairoSVG, which is only needed by this backend."""
+        try:
+            import cairosvg
+        except (ImportError, OSError) as error:
+            raise ImportError("The vector backend requires cairosvg and cairo.") from error
+        return cairosvg
+
+
+backends: dict[str, Backend] = {
+    backend.name: backend for backend in (ChromeBackend(), VectorBackend())
+}
+
+
+def getBackend(name: str) -> Backend:
+    """
+    Get a rendering backend from its name.
+
+    Args:
+        name: The name of the backend.
+
+    Returns:
+        The backend.
+    """
+    try:
+        return backends[name]
+    except KeyError:
+        raise ValueError("Unknown rendering backend.", name) from None
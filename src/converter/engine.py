@@ -1,18 +1,119 @@
 import atexit
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+if TYPE_CHECKING:
+    from selenium.webdriver import Chrome
 
-service = Service(ChromeDriverManager().install())
+__all__ = ("Engine", "createWebdriver", "engine")
 
-chrome_options = webdriver.ChromeOptions()
-chrome_options.add_argument("--kiosk-printing")
-chrome_options.add_argument("--headless")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-extensions")
+chromeArguments = (
+    "--kiosk-printing",
+    "--headless",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+)
 
-webdriver_chrome = webdriver.Chrome(service=service, options=chrome_options)
-atexit.register(webdriver_chrome.close)
+
+def createWebdriver(driverPath: str | None = None) -> "Chrome":
+    """
+    Launch a new headless Chrome instance.
+
+    Args:
+        driverPath: The path to the chromedriver binary. The CHROMEDRIVER_PATH
+            environment variable is used if this is None, and if neither is set a
+            chromedriver is installed with webdriver_manager.
+
+    Returns:
+        The browser.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    driverPath = driverPath or os.environ.get("CHROMEDRIVER_PATH")
+    if driverPath is None:
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        driverPath = ChromeDriverManager().install()
+
+    chrome_options = webdriver.ChromeOptions()
+    for argument in chromeArguments:
+        chrome_options.add_argument(argument)
+
+    return webdriver.Chrome(service=Service(driverPath), options=chrome_options)
+
+
+class Engine:
+    """
+    A headless Chrome instance that is only launched once it is needed.
+
+    The browser is launched on first access of `webdriver`, or explicitly with
+    `start`, and shut down with `stop` or when the process exits. Engines may also be
+    used as context managers. WebDriver sessions are not thread-safe, so threads
+    sharing the browser should take turns with `use`.
+
+    Args:
+        driverPath: The path to the chromedriver binary. See `createWebdriver`.
+    """
+
+    def __init__(self, driverPath: str | None = None):
+        self.driverPath = driverPath
+        self._webdriver: "Chrome | None" = None
+        self._lock = threading.Lock()
+        self._useLock = threading.Lock()
+
+    def __enter__(self) -> "Engine":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        """Whether the browser has been launched."""
+        return self._webdriver is not None
+
+    @property
+    def webdriver(self) -> "Chrome":
+        """The browser, which is launched if it is not running yet."""
+        return self.start()
+
+    def start(self) -> "Chrome":
+        """
+        Launch the browser, unless it is already running.
+
+        Returns:
+            The browser.
+        """
+        with self._lock:
+            if self._webdriver is None:
+                self._webdriver = createWebdriver(self.driverPath)
+                atexit.register(self.stop)
+            return self._webdriver
+
+    @contextmanager
+    def use(self) -> Iterator["Chrome"]:
+        """
+        Use the browser exclusively for the duration of the context.
+
+        Yields:
+            The browser, which is launched if it is not running yet.
+        """
+        with self._useLock:
+            yield self.start()
+
+    def stop(self):
+        """Shut down the browser, if it is running."""
+        with self._lock:
+            if self._webdriver is not None:
+                self._webdriver.quit()
+                self._webdriver = None
+                atexit.unregister(self.stop)
+
+
+engine = Engine()
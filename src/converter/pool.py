@@ -0,0 +1,292 @@
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from src.converter.engine import createWebdriver
+from src.converter.render import (
+    convertDocumentToPdf,
+    convertDocumentToPng,
+    convertPagesToPdf,
+    convertToPdf,
+)
+
+if TYPE_CHECKING:
+    from selenium.webdriver import Chrome
+
+__all__ = ("Renderer", "RendererPool")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, eq=False)
+class Renderer:
+    """
+    A browser instance owned by a renderer pool.
+
+    Attributes:
+        webdriver: The browser.
+        uses: The number of renders performed by the browser.
+        pending: The last blocking call made with the browser, which may still be
+            running if its caller was cancelled.
+    """
+
+    webdriver: "Chrome"
+    uses: int = 0
+    pending: Future | None = None
+
+    def healthy(self, maxUses: int, maxHeapBytes: int) -> bool:
+        """
+        Check whether the browser can keep being used.
+
+        Args:
+            maxUses: The number of renders after which the browser is retired.
+            maxHeapBytes: The JS heap size after which the browser is retired.
+
+        Returns:
+            Whether the browser is responsive and within its limits.
+        """
+        from selenium.common.exceptions import WebDriverException
+
+        if self.uses >= maxUses:
+            return False
+        try:
+            heapBytes = self.webdriver.execute_script(
+                "return window.performance.memory.usedJSHeapSize;"
+            )
+        except WebDriverException:
+            return False
+        return heapBytes < maxHeapBytes
+
+    def quit(self):
+        """Shut down the browser, ignoring browsers that already crashed."""
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            self.webdriver.quit()
+        except WebDriverException:
+            pass
+
+
+class RendererPool:
+    """
+    A pool of headless Chrome instances for converting files to PDFs.
+
+    Browsers are checked out for one render at a time, and checked back in once the
+    render is done. Browsers that crashed, errored, served too many renders, or grew
+    too large are replaced by fresh ones on check-in. A browser that fails to launch
+    leaves its slot empty, and the slot is launched again by the next check-out, so
+    the pool never shrinks. All the blocking Selenium calls run on the pool's own
+    threads, so the pool can be used from an event loop without blocking it.
+
+    Args:
+        size: The number of browsers in the pool.
+        maxUses: The number of renders after which a browser is replaced.
+        maxHeapBytes: The JS heap size after which a browser is replaced.
+        driverPath: The path to the chromedriver binary. See
+            `src.converter.engine.createWebdriver`.
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        maxUses: int = 250,
+        maxHeapBytes: int = 256 * 1024 * 1024,
+        driverPath: str | None = None,
+    ):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.", size)
+
+        self.size = size
+        self.maxUses = maxUses
+        self.maxHeapBytes = maxHeapBytes
+        self.driverPath = driverPath
+
+        self._executor: ThreadPoolExecutor | None = None
+        # Empty slots, whose browser failed to launch, are None.
+        self._idle: asyncio.Queue[Renderer | None] | None = None
+        self._renderers: set[Renderer] = set()
+
+    async def __aenter__(self) -> "RendererPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.stop()
+
+    async def start(self):
+        """Launch the browsers of the pool."""
+        if self._idle is not None:
+            return
+        self._executor = ThreadPoolExecutor(self.size, thread_name_prefix="renderer")
+        self._idle = asyncio.Queue()
+        renderers = await asyncio.gather(
+            *(self._run(self._launch) for _ in range(self.size)),
+            return_exceptions=True,
+        )
+        for renderer in renderers:
+            if isinstance(renderer, BaseException):
+                logger.error("Failed to launch a renderer.", exc_info=renderer)
+                renderer = None
+            self._idle.put_nowait(renderer)
+
+    async def stop(self):
+        """Shut down every browser of the pool."""
+        if self._idle is None:
+            return
+        await asyncio.gather(
+            *(self._run(renderer.quit) for renderer in tuple(self._renderers))
+        )
+        self._renderers.clear()
+        self._executor.shutdown()
+        self._executor = None
+        self._idle = None
+
+    @asynccontextmanager
+    async def renderer(self) -> Renderer:
+        """
+        Check out a browser for the duration of the context.
+
+        The browser is health checked when it is returned, and replaced if it failed
+        a check or an error escaped the context. An empty slot is launched first, and
+        is returned empty if that fails.
+        """
+        if self._idle is None:
+            raise RuntimeError("The renderer pool has not been started.")
+
+        renderer = await self._idle.get()
+        if renderer is None:
+            try:
+                renderer = await self._run(self._launch)
+            except BaseException:
+                self._idle.put_nowait(None)
+                raise
+
+        healthy = False
+        try:
+            yield renderer
+            renderer.uses += 1
+            healthy = await self._use(
+                renderer, renderer.healthy, self.maxUses, self.maxHeapBytes
+            )
+        finally:
+            # Checking in outlives a cancelled caller, so the slot is always returned.
+            await asyncio.shield(self._checkIn(renderer, healthy))
+
+    async def convertToPdf(
+        self,
+        data: str,
+        mimetype: str,
+        width: int,
+        height: int,
+    ) -> str:
+        """
+        Convert a chrome preview-able file to a base-64 encoded pdf.
+
+        See `src.converter.render.convertToPdf` for the arguments.
+        """
+        async with self.renderer() as renderer:
+            return await self._use(
+                renderer,
+                convertToPdf,
+                data,
+                mimetype,
+                width,
+                height,
+                renderer.webdriver,
+            )
+
+    async def convertPagesToPdf(
+        self,
+        pages: list[str],
+        mimetype: str,
+        width: int,
+        height: int,
+    ) -> bytes:
+        """
+        Convert chrome preview-able files to a single multi-page pdf.
+
+        See `src.converter.render.convertPagesToPdf` for the arguments.
+        """
+        async with self.renderer() as renderer:
+            return await self._use(
+                renderer,
+                convertPagesToPdf,
+                pages,
+                mimetype,
+                width,
+                height,
+                renderer.webdriver,
+            )
+
+    async def convertDocumentToPdf(self, url: str, width: int, height: int) -> bytes:
+        """
+        Print a document served at a URL to a pdf.
+
+        See `src.converter.render.convertDocumentToPdf` for the arguments.
+        """
+        async with self.renderer() as renderer:
+            return await self._use(
+                renderer, convertDocumentToPdf, url, width, height, renderer.webdriver
+            )
+
+    async def convertDocumentToPng(
+        self, url: str, width: int, height: int, scale: float = 1
+    ) -> bytes:
+        """
+        Screenshot a document served at a URL to a png.
+
+        See `src.converter.render.convertDocumentToPng` for the arguments.
+        """
+        async with self.renderer() as renderer:
+            return await self._use(
+                renderer,
+                convertDocumentToPng,
+                url,
+                width,
+                height,
+                scale,
+                renderer.webdriver,
+            )
+
+    async def _checkIn(self, renderer: Renderer, healthy: bool):
+        """Return a browser to the pool, replacing it unless it is healthy."""
+        if renderer.pending is not None and not renderer.pending.done():
+            # A cancelled caller's render may still be using the browser.
+            await asyncio.wait([asyncio.wrap_future(renderer.pending)])
+        if not healthy:
+            try:
+                renderer = await self._recycle(renderer)
+            except Exception:
+                logger.exception("Failed to relaunch a renderer.")
+                renderer = None
+        self._idle.put_nowait(renderer)
+
+    async def _recycle(self, renderer: Renderer) -> Renderer:
+        """Replace a browser with a freshly launched one."""
+        logger.info("Recycling renderer after %d uses.", renderer.uses)
+        self._renderers.discard(renderer)
+        await self._run(renderer.quit)
+        return await self._run(self._launch)
+
+    def _launch(self) -> Renderer:
+        """Launch a browser and register it with the pool."""
+        renderer = Renderer(createWebdriver(self.driverPath))
+        self._renderers.add(renderer)
+        return renderer
+
+    async def _use(self, renderer: Renderer, func, *args):
+        """Run a blocking function with a browser, keeping track of the call."""
+        context = contextvars.copy_context()
+        renderer.pending = self._executor.submit(context.run, func, *args)
+        return await asyncio.wrap_future(renderer.pending)
+
+    async def _run(self, func, *args):
+        """Run a blocking function on the pool's threads, in the current context."""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, context.run, func, *args
+        )
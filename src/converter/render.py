@@ -1,7 +1,58 @@
-from src.converter.engine import webdriver_chrome
+import base64
+import functools
+import inspect
+from typing import TYPE_CHECKING
 
+from src.converter.engine import engine
+from src.flashcards.utils.tracing import tracer
 
-def convertToPdf(data: str, mimetype: str, width: int, height: int) -> str:
+if TYPE_CHECKING:
+    from selenium.webdriver import Chrome
+
+printOptions = {
+    "printBackground": False,
+    "landscape": False,
+    "displayHeaderFooter": False,
+    "scale": 1.5,
+    "paperWidth": 1.75,
+    "paperHeight": 2.5,
+    "marginTop": 0,
+    "marginBottom": 0,
+    "marginLeft": 0,
+    "marginRight": 0,
+}
+
+
+def conversion(function):
+    """
+    Time every call of a conversion as a "print" span.
+
+    Calls without a browser of their own take turns with the default engine's
+    browser, so conversions can run on several threads at once.
+    """
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with tracer.span("print", function=function.__name__):
+            arguments = signature.bind(*args, **kwargs)
+            if arguments.arguments.get("webdriver") is not None:
+                return function(*args, **kwargs)
+            with engine.use() as webdriver:
+                arguments.arguments["webdriver"] = webdriver
+                return function(*arguments.args, **arguments.kwargs)
+
+    return wrapper
+
+
+@conversion
+def convertToPdf(
+    data: str,
+    mimetype: str,
+    width: int,
+    height: int,
+    webdriver: "Chrome | None" = None,
+) -> str:
     """
     Convert a chrome preview-able file to a base-64 encoded pdf using Selenium.
 
@@ -10,21 +61,24 @@ def convertToPdf(data: str, mimetype: str, width: int, height: int) -> str:
         mimetype (str): The mimetype of the base64 data.
         width (float): The width of the preview-able file.
         height (float): The height of the preview-able file.
+        webdriver (Chrome): The browser to print with. The default engine's browser
+            is used if this is None.
 
     Returns:
         str: The base64 encoded pdf.
     """
     assert isinstance(width, (float, int)), f"Width must be num, not {type(width)}."
     assert isinstance(height, (float, int)), f"Height must be num, not {type(height)}."
-    webdriver_chrome.get(f"about:blank")
-    webdriver_chrome.execute_cdp_cmd(
+    webdriver = webdriver or engine.webdriver
+    webdriver.get(f"about:blank")
+    webdriver.execute_cdp_cmd(
         "Emulation.setVisibleSize",
         {
             "width": width,
             "height": height,
         },
     )
-    webdriver_chrome.execute_script(
+    webdriver.execute_script(
         "document.body.style.margin = '0';"
         "const content = document.createElement('img');"
         f"content.src = 'data:{mimetype};base64,{data}';"
@@ -32,19 +86,193 @@ def convertToPdf(data: str, mimetype: str, width: int, height: int) -> str:
         "content.style.height = '100%';"
         "document.body.appendChild(content);"
     )
-    pdf = webdriver_chrome.execute_cdp_cmd(
-        "Page.printToPDF",
+    pdf = webdriver.execute_cdp_cmd("Page.printToPDF", printOptions)
+    return pdf["data"]
+
+
+@conversion
+def convertPagesToPdf(
+    pages: list[str],
+    mimetype: str,
+    width: int,
+    height: int,
+    webdriver: "Chrome | None" = None,
+) -> bytes:
+    """
+    Convert chrome preview-able files to a single multi-page pdf using Selenium.
+
+    All the pages are laid out in one document, and printed at once.
+
+    Args:
+        pages (list[str]): Base64 encoded preview-able files, one per page.
+        mimetype (str): The mimetype of the base64 data.
+        width (float): The width of each preview-able file.
+        height (float): The height of each preview-able file.
+        webdriver (Chrome): The browser to print with. The default engine's browser
+            is used if this is None.
+
+    Returns:
+        bytes: The pdf.
+    """
+    assert isinstance(width, (float, int)), f"Width must be num, not {type(width)}."
+    assert isinstance(height, (float, int)), f"Height must be num, not {type(height)}."
+    webdriver = webdriver or engine.webdriver
+    webdriver.get(f"about:blank")
+    webdriver.execute_cdp_cmd(
+        "Emulation.setVisibleSize",
         {
-            "printBackground": False,
-            "landscape": False,
-            "displayHeaderFooter": False,
-            "scale": 1.5,
-            "paperWidth": 1.75,
-            "paperHeight": 2.5,
-            "marginTop": 0,
-            "marginBottom": 0,
-            "marginLeft": 0,
-            "marginRight": 0,
+            "width": width,
+            "height": height,
         },
     )
-    return pdf["data"]
+    webdriver.execute_script(
+        "document.body.style.margin = '0';"
+        "arguments[0].forEach((source, i) => {"
+        "    const content = document.createElement('img');"
+        "    content.src = source;"
+        "    content.style.display = 'block';"
+        "    content.style.width = '100%';"
+        "    if (i < arguments[0].length - 1) content.style.breakAfter = 'page';"
+        "    document.body.appendChild(content);"
+        "});",
+        [f"data:{mimetype};base64,{page}" for page in pages],
+    )
+    pdf = webdriver.execute_cdp_cmd("Page.printToPDF", printOptions)
+    return base64.b64decode(pdf["data"])
+
+
+@conversion
+def convertToPng(
+    data: str,
+    mimetype: str,
+    width: int,
+    height: int,
+    scale: float = 1,
+    webdriver: "Chrome | None" = None,
+) -> bytes:
+    """
+    Convert a chrome preview-able file to a png using Selenium.
+
+    Args:
+        data (str): Base64 encoded preview-able file.
+        mimetype (str): The mimetype of the base64 data.
+        width (float): The width of the preview-able file.
+        height (float): The height of the preview-able file.
+        scale (float): The number of png pixels per preview-able file pixel.
+        webdriver (Chrome): The browser to screenshot with. The default engine's
+            browser is used if this is None.
+
+    Returns:
+        bytes: The png.
+    """
+    assert isinstance(width, (float, int)), f"Width must be num, not {type(width)}."
+    assert isinstance(height, (float, int)), f"Height must be num, not {type(height)}."
+    webdriver = webdriver or engine.webdriver
+    webdriver.get(f"about:blank")
+    webdriver.execute_cdp_cmd(
+        "Emulation.setVisibleSize",
+        {
+            "width": width,
+            "height": height,
+        },
+    )
+    webdriver.execute_script(
+        "document.body.style.margin = '0';"
+        "const content = document.createElement('img');"
+        "content.src = arguments[0];"
+        "content.style.display = 'block';"
+        "content.style.width = '100%';"
+        "document.body.appendChild(content);",
+        f"data:{mimetype};base64,{data}",
+    )
+    png = webdriver.execute_cdp_cmd(
+        "Page.captureScreenshot",
+        {
+            "format": "png",
+            "clip": {"x": 0, "y": 0, "width": width, "height": height, "scale": scale},
+        },
+    )
+    return base64.b64decode(png["data"])
+
+
+@conversion
+def convertDocumentToPdf(
+    url: str,
+    width: int,
+    height: int,
+    webdriver: "Chrome | None" = None,
+) -> bytes:
+    """
+    Print a document served at a URL to a pdf using Selenium.
+
+    Unlike `convertPagesToPdf`, the document is fetched by the browser itself, so it
+    does not have to be passed to the browser as a base-64 string.
+
+    Args:
+        url (str): The URL of the document, such as one published by
+            `src.converter.assets.AssetServer`.
+        width (float): The width of each page of the document.
+        height (float): The height of each page of the document.
+        webdriver (Chrome): The browser to print with. The default engine's browser
+            is used if this is None.
+
+    Returns:
+        bytes: The pdf.
+    """
+    assert isinstance(width, (float, int)), f"Width must be num, not {type(width)}."
+    assert isinstance(height, (float, int)), f"Height must be num, not {type(height)}."
+    webdriver = webdriver or engine.webdriver
+    webdriver.execute_cdp_cmd(
+        "Emulation.setVisibleSize",
+        {
+            "width": width,
+            "height": height,
+        },
+    )
+    # Navigation returns once the document and everything it references has loaded.
+    webdriver.get(url)
+    pdf = webdriver.execute_cdp_cmd("Page.printToPDF", printOptions)
+    return base64.b64decode(pdf["data"])
+
+
+@conversion
+def convertDocumentToPng(
+    url: str,
+    width: int,
+    height: int,
+    scale: float = 1,
+    webdriver: "Chrome | None" = None,
+) -> bytes:
+    """
+    Screenshot a document served at a URL to a png using Selenium.
+
+    Args:
+        url (str): The URL of the document.
+        width (float): The width of the document.
+        height (float): The height of the document.
+        scale (float): The number of png pixels per document pixel.
+        webdriver (Chrome): The browser to screenshot with. The default engine's
+            browser is used if this is None.
+
+    Returns:
+        bytes: The png.
+    """
+    assert isinstance(width, (float, int)), f"Width must be num, not {type(width)}."
+    assert isinstance(height, (float, int)), f"Height must be num, not {type(height)}."
+    webdriver = webdriver or engine.webdriver
+    webdriver.execute_cdp_cmd(
+        "Emulation.setVisibleSize",
+        {
+            "width": width,
+            "height": height,
+        },
+    )
+    webdriver.get(url)
+    png = webdriver.execute_cdp_cmd(
+        "Page.captureScreenshot",
+        {
+            "format": "png",
+            "clip": {"x": 0, "y": 0, "width": width, "height": height, "scale": scale},
+        },
+    )
+    return base64.b64decode(png["data"])
@@ -0,0 +1,323 @@
+import io
+from dataclasses import dataclass
+from typing import BinaryIO, Literal
+
+from pypdf import PageObject, PdfReader, Transformation
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    IndirectObject,
+    NameObject,
+    PdfObject,
+    StreamObject,
+)
+
+__all__ = ("Layout", "DeckWriter", "sheetSizes")
+
+# Common sheet sizes, in points.
+sheetSizes = {
+    "letter": (612, 792),
+    "legal": (612, 1008),
+    "a4": (595, 842),
+    "a3": (842, 1191),
+}
+
+CATALOG_ID = 1
+PAGES_ID = 2
+
+
+@dataclass(frozen=True, slots=True)
+class Layout:
+    """
+    How the cards of a deck are arranged on the sheets of a PDF.
+
+    Attributes:
+        columns: The number of cards across a sheet.
+        rows: The number of cards down a sheet.
+        sheetSize: The size of the sheets in points, as a tuple of (width, height).
+            Sheets fit the grid of cards exactly, plus the margin, if this is None.
+        margin: The space around the grid of cards on sheets that fit the grid, in
+            points. Grids are centered on sheets of a given size.
+        gap: The space between cards, in points.
+        duplex: How sheets are flipped when printed on both sides. With "long" or
+            "short", every sheet of fronts is followed by a sheet of the matching
+            backs, mirrored so that each back prints behind its front when the sheet
+            is flipped along its long or short edge. With None, every page of every
+            card takes the next cell.
+    """
+
+    columns: int = 1
+    rows: int = 1
+    sheetSize: tuple[float, float] | None = None
+    margin: float = 0
+    gap: float = 0
+    duplex: Literal["long", "short"] | None = "long"
+
+    def __post_init__(self):
+        if self.columns < 1 or self.rows < 1:
+            raise ValueError("Layouts need at least one cell.", self.columns, self.rows)
+        if self.duplex not in ("long", "short", None):
+            raise ValueError("Unknown duplex mode.", self.duplex)
+
+    @property
+    def cells(self) -> int:
+        """The number of cards on a sheet."""
+        return self.columns * self.rows
+
+    def sheet(self, cardSize: tuple[float, float]) -> tuple[float, float]:
+        """The size of the sheets for cards of the given size."""
+        if self.sheetSize is not None:
+            return self.sheetSize
+        width, height = self._grid(cardSize)
+        return width + 2 * self.margin, height + 2 * self.margin
+
+    def position(
+        self, cell: int, cardSize: tuple[float, float], back: bool = False
+    ) -> tuple[float, float]:
+        """
+        The position of a cell on a sheet.
+
+        Args:
+            cell: The index of the cell, row by row from the top left.
+            cardSize: The size of the cards.
+            back: Whether the cell is on a sheet of backs, which mirrors the sheet of
+                fronts according to the duplex mode.
+
+        Returns:
+            The position of the bottom left corner of the cell, in points.
+        """
+        row, column = divmod(cell, self.columns)
+        if back and self.duplex == "long":
+            column = self.columns - 1 - column
+        elif back and self.duplex == "short":
+            row = self.rows - 1 - row
+
+        cardWidth, cardHeight = cardSize
+        sheetWidth, sheetHeight = self.sheet(cardSize)
+        gridWidth, gridHeight = self._grid(cardSize)
+        left = (sheetWidth - gridWidth) / 2 + column * (cardWidth + self.gap)
+        top = (sheetHeight - gridHeight) / 2 + row * (cardHeight + self.gap)
+        return left, sheetHeight - top - cardHeight
+
+    def _grid(self, cardSize: tuple[float, float]) -> tuple[float, float]:
+        """The size of the grid of cards, without the margin."""
+        cardWidth, cardHeight = cardSize
+        return (
+            self.columns * cardWidth + (self.columns - 1) * self.gap,
+            self.rows * cardHeight + (self.rows - 1) * self.gap,
+        )
+
+
+class DeckWriter:
+    """
+    A PDF of many cards, written to disk as cards are added.
+
+    Cards are laid out on sheets according to the layout. As soon as a sheet is
+    full, it is composed and its objects are written to the file, so only the cards
+    of the current sheet are ever held in memory, whatever the size of the deck. The
+    page tree and the cross-reference table are written when the writer is closed.
+
+    Args:
+        file: The path of the PDF, or a binary file to write it to.
+        layout: The layout of the cards.
+
+    Attributes:
+        cards: The number of cards added.
+        sheets: The number of sheets written.
+
+    Notes:
+        Links and other annotations of the cards are dropped, since they would point
+        into the cards' own documents.
+    """
+
+    def __init__(self, file: str | BinaryIO, layout: Layout = Layout()):
+        self.layout = layout
+        self.cards = 0
+        self.sheets = 0
+        self._ownsFile = isinstance(file, str)
+        self._file: BinaryIO = open(file, "wb") if self._ownsFile else file
+        self._start = self._file.tell() if not self._ownsFile else 0
+        self._offsets: list[int | None] = [None, None]
+        self._kids: list[int] = []
+        self._pending: list[list[PageObject]] = []
+        self._cardSize: tuple[float, float] | None = None
+        self._copies: dict[tuple[int, int, int], int] = {}
+        self._closed = False
+        self._file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self) -> "DeckWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, pdf: bytes | PdfReader):
+        """
+        Add a card to the deck.
+
+        Args:
+            pdf: The PDF of the card, such as the one returned by
+                `Flashcard.render`. Its first page is the front of the card, and its
+                second page, if any, is the back.
+        """
+        if self._closed:
+            raise ValueError("Cannot add cards to a closed deck writer.")
+        reader = pdf if isinstance(pdf, PdfReader) else PdfReader(io.BytesIO(pdf))
+        pages = list(reader.pages[:2])
+        if not pages:
+            raise ValueError("Cards need at least one page.")
+        if self._cardSize is None:
+            box = pages[0].mediabox
+            self._cardSize = (float(box.width), float(box.height))
+
+        # Each pending entry fills a cell of the next sheet: cards with their backs
+        # when printing duplex, or single pages otherwise.
+        if self.layout.duplex:
+            self._pending.append(pages)
+        else:
+            self._pending.extend([page] for page in pages)
+        self.cards += 1
+        if len(self._pending) >= self.layout.cells:
+            self._flushSheets()
+
+    def close(self):
+        """Write the remaining cards and finish the PDF."""
+        if self._closed:
+            return
+        self._flushSheets()
+        self._closed = True
+
+        self._beginObject(PAGES_ID)
+        kids = " ".join(f"{kid} 0 R" for kid in self._kids)
+        self._file.write(
+            f"<< /Type /Pages /Kids [ {kids} ] /Count {len(self._kids)} >>".encode()
+        )
+        self._endObject()
+        self._beginObject(CATALOG_ID)
+        self._file.write(f"<< /Type /Catalog /Pages {PAGES_ID} 0 R >>".encode())
+        self._endObject()
+
+        xref = self._tell()
+        lines = [f"xref\n0 {len(self._offsets) + 1}\n", "0000000000 65535 f \n"]
+        lines.extend(f"{offset:010} 00000 n \n" for offset in self._offsets)
+        lines.append(
+            f"trailer\n<< /Size {len(self._offsets) + 1} /Root {CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref}\n%%EOF\n"
+        )
+        self._file.write("".join(lines).encode())
+        self._file.flush()
+        if self._ownsFile:
+            self._file.close()
+
+    def _flushSheets(self):
+        """Compose and write the sheets of the pending cards."""
+        while self._pending:
+            cells = self._pending[: self.layout.cells]
+            del self._pending[: self.layout.cells]
+            self._writeSheet([pages[0] for pages in cells])
+            if self.layout.duplex:
+                self._writeSheet(
+                    [pages[1] if len(pages) > 1 else None for pages in cells],
+                    back=True,
+                )
+        self._file.flush()
+
+    def _writeSheet(self, pages: list[PageObject | None], back: bool = False):
+        """Compose a sheet from pages, one per cell, and write it."""
+        cardSize = self._cardSize
+        sheetWidth, sheetHeight = self.layout.sheet(cardSize)
+        sheet = PageObject.create_blank_page(width=sheetWidth, height=sheetHeight)
+        for cell, page in enumerate(pages):
+            if page is None:
+                continue
+            x, y = self.layout.position(cell, cardSize, back)
+            box = page.mediabox
+            sheet.merge_transformed_page(
+                page,
+                Transformation().translate(x - float(box.left), y - float(box.bottom)),
+            )
+
+        sheet.pop(NameObject("/Annots"), None)
+        sheet[NameObject("/Parent")] = IndirectObject(PAGES_ID, 0, None)
+        self._kids.append(self._writeObject(sheet))
+        self._copies.clear()
+        self.sheets += 1
+
+    def _writeObject(self, obj: PdfObject) -> int:
+        """Write an object and everything it references, returning its number."""
+        root = self._allocate()
+        queue = [(root, obj)]
+        while queue:
+            number, obj = queue.pop()
+            obj = self._copy(obj, queue)
+            self._beginObject(number)
+            obj.write_to_stream(self._file)
+            self._endObject()
+        return root
+
+    def _copy(self, obj: PdfObject, queue: list[tuple[int, PdfObject]]) -> PdfObject:
+        """
+        Copy an object, pointing its references at the objects of the output.
+
+        Referenced objects that have not been written yet are queued.
+        """
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is None:
+                return obj
+            key = (id(obj.pdf), obj.idnum, obj.generation)
+            if key not in self._copies:
+                self._copies[key] = self._allocate()
+                queue.append((self._copies[key], obj.get_object()))
+            return IndirectObject(self._copies[key], 0, None)
+
+        if isinstance(obj, StreamObject):
+            if isinstance(obj, EncodedStreamObject):
+                stream = EncodedStreamObject()
+                stream._data = obj._data
+                skipped = ("/Length",)
+            else:
+                stream = DecodedStreamObject()
+                stream.set_data(obj.get_data())
+                skipped = ("/Length", "/Filter", "/DecodeParms")
+            for key, value in obj.items():
+                if key not in skipped:
+                    stream[NameObject(key)] = self._copyReference(value, queue)
+            # Content streams composed by pypdf are left uncompressed.
+            if isinstance(stream, DecodedStreamObject):
+                stream = stream.flate_encode()
+            return stream
+
+        if isinstance(obj, DictionaryObject):
+            return DictionaryObject(
+                {key: self._copyReference(value, queue) for key, value in obj.items()}
+            )
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copyReference(value, queue) for value in obj)
+        return obj
+
+    def _copyReference(
+        self, obj: PdfObject, queue: list[tuple[int, PdfObject]]
+    ) -> PdfObject:
+        """Copy a value inside an object, making streams indirect as PDFs require."""
+        if isinstance(obj, StreamObject):
+            number = self._allocate()
+            queue.append((number, obj))
+            return IndirectObject(number, 0, None)
+        return self._copy(obj, queue)
+
+    def _allocate(self) -> int:
+        """Reserve the number of a new object."""
+        self._offsets.append(None)
+        return len(self._offsets)
+
+    def _beginObject(self, number: int):
+        self._offsets[number - 1] = self._tell()
+        self._file.write(f"{number} 0 obj\n".encode())
+
+    def _endObject(self):
+        self._file.write(b"\nendobj\n")
+
+    def _tell(self) -> int:
+        return self._file.tell() - self._start
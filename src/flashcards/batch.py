@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+
+from src.flashcards.generator import Generator, aiPrompts
+from src.flashcards.utils.openai import gptReq
+
+__all__ = ("batchFields", "genBatch")
+
+logger = logging.getLogger(__name__)
+
+# What to ask for each field, and the key of the field's count in the generation
+# config, if it has one.
+batchFields = {
+    "partOfSpeech": ("a single lowercase part of speech, such as \"noun\"", None),
+    "pronunciation": ("a pronunciation, separated phonetically by hyphens", None),
+    "offensive": ("true if the word is offensive, otherwise false", None),
+    "synonyms": ("a list of {count} synonyms", "synonyms"),
+    "antonyms": ("a list of {count} antonyms", "antonyms"),
+    "rhymes": ("a list of {count} words that rhyme with the word", "rhymes"),
+    "definitions": ("a list of {count} short definitions", "definitions"),
+    "sentences": ("a list of {count} short sentences using the word", "sentences"),
+    "inspirationalQuotes": (
+        "a list of {count} short inspirational quotes using the word",
+        "inspirationalQuotes",
+    ),
+    "imagePrompts": (
+        "a list of {count} brief bits of imagery, without humans or the word itself, "
+        "that capture a common occurrence of the word",
+        "images",
+    ),
+}
+
+# The generator fields that the batch fields provide, for the ones not named alike.
+generatorFields = {"imagePrompts": "images"}
+
+
+async def genBatch(
+    generators: list[Generator],
+    genKwargs: dict[str, dict[str, object]] | None = None,
+    fields: tuple[str, ...] = tuple(batchFields),
+) -> bool:
+    """
+    Generate several fields for several words with a single GPT request.
+
+    Each field is first filled from its cheaper sources, such as the lexicon and the
+    dictionary, and the batch only asks for the fields and counts still missing. The
+    results are stored in the respective generators, so that their field methods
+    only have to make up for what the batch did not provide. If the response cannot
+    be parsed, nothing is stored, and the fields are generated one by one as usual.
+
+    Args:
+        generators: The generators of the words to generate fields for. The first
+            generator's session, limits, cache and client are used for the request.
+        genKwargs: The generation config, which the number of items to generate for
+            each field is taken from.
+        fields: The fields to generate, from `batchFields`.
+
+    Returns:
+        Whether the batch was generated and stored, or was not needed.
+    """
+    if not generators:
+        return True
+    genKwargs = genKwargs or {}
+
+    counts = {}
+    for field in fields:
+        configKey = batchFields[field][1]
+        count = (genKwargs.get(configKey) or {}).get("count", 1) if configKey else 1
+        counts[generatorFields.get(field, field)] = count
+    shortfalls = await asyncio.gather(
+        *(generator.provideFromSources(counts) for generator in generators)
+    )
+
+    fieldLines = []
+    for field in fields:
+        generatorField = generatorFields.get(field, field)
+        count = max(shortfall[generatorField] for shortfall in shortfalls)
+        if count:
+            description = batchFields[field][0].format(count=count)
+            fieldLines.append(f"- \"{field}\": {description}")
+    if not fieldLines:
+        return True
+
+    words = [generator.word for generator in generators]
+    placeholders = {"words": json.dumps(words), "fields": "\n".join(fieldLines)}
+    gptReqData = {
+        **aiPrompts["batch"],
+        "messages": [
+            {**message, "content": message["content"].format(**placeholders)}
+            for message in aiPrompts["batch"]["messages"]
+        ],
+    }
+
+    requester = generators[0]
+    try:
+        async with requester.limits.provider("gpt"):
+            response = await gptReq(
+                gptReqData, requester.session, requester.cache, requester.openai
+            )
+        data = json.loads(_stripCodeFence(response))
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object.", data)
+    except Exception as error:
+        logger.warning("Falling back to per-field generation for %s: %r", words, error)
+        return False
+
+    # Models sometimes change the case of the words they were given.
+    data = {str(word).lower(): value for word, value in data.items()}
+    for generator in generators:
+        wordData = data.get(generator.word.lower())
+        if isinstance(wordData, dict):
+            generator._applyBatch(wordData)
+    return True
+
+
+def _stripCodeFence(text: str) -> str:
+    """Remove a markdown code fence around a response, if there is one."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text
@@ -0,0 +1,382 @@
+"""
+Build flashcards for a list of words, resuming where an earlier build stopped.
+
+Run from the src directory, for example:
+
+    python -m flashcards words.txt --output build --deck deck.pdf
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import IO, Iterator
+
+from src.converter.pool import RendererPool
+from src.converter.writer import DeckWriter, Layout, sheetSizes
+from src.flashcards.deck import Deck
+from src.flashcards.farm import RenderFarm
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.storage import CardReader, CardWriter, truncatePartialLine
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.cache import ResponseCache
+from src.flashcards.utils.lexicon import Lexicon
+from src.flashcards.utils.rhymes import RhymeIndex
+
+__all__ = ("Journal", "Progress", "build", "main")
+
+
+class Journal:
+    """
+    A checkpoint journal, recording each stage a word of a build has completed.
+
+    The journal is a JSON lines file, appended to and flushed as stages complete, so
+    a build that crashed can be resumed from what it records. A last line cut short
+    by a crash is removed.
+
+    Args:
+        path: The path of the journal, which is read if it exists.
+
+    Attributes:
+        stages: The last stage each word completed: "generated", "rendered",
+            "failed" if it failed to generate, or "renderFailed" if it was generated
+            but failed to render.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stages: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.stages[entry["word"]] = entry["stage"]
+        truncatePartialLine(path)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def record(self, word: str, stage: str, **details):
+        """
+        Record that a word completed a stage.
+
+        Args:
+            word: The word.
+            stage: The stage.
+            **details: Details of the stage, such as the error of a failure.
+        """
+        entry = {"word": word, "stage": stage, "time": time.time(), **details}
+        self._file.write(f"{json.dumps(entry, ensure_ascii=False)}\n")
+        self._file.flush()
+        self.stages[word] = stage
+
+    def close(self):
+        """Close the journal."""
+        self._file.close()
+
+
+class Progress:
+    """
+    Counts of a build's flashcards per stage, reported periodically.
+
+    Attributes:
+        generating: The number of flashcards being generated.
+        rendering: The number of flashcards being rendered.
+        done: The number of flashcards completed by this run.
+        skipped: The number of flashcards completed by earlier runs.
+        failed: The number of flashcards that failed.
+    """
+
+    def __init__(self):
+        self.generating = 0
+        self.rendering = 0
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self._start = time.perf_counter()
+
+    def __str__(self) -> str:
+        seconds = time.perf_counter() - self._start
+        rate = self.done / seconds if seconds else 0.0
+        return (
+            f"{self.done} done, {self.skipped} skipped, {self.failed} failed | "
+            f"{rate:.2f} cards/sec | "
+            f"in flight: generate {self.generating}, render {self.rendering}"
+        )
+
+    async def report(self, file: IO[str], interval: float = 1):
+        """Write the progress to a file every interval, until cancelled."""
+        ending = "\r" if file.isatty() else "\n"
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                file.write(f"{self}{ending}")
+                file.flush()
+        finally:
+            file.write(f"{self}\n")
+            file.flush()
+
+
+def readWords(file: IO[str]) -> Iterator[str]:
+    """Read words from a file, one per line, skipping blank lines and duplicates."""
+    seen = set()
+    for line in file:
+        word = line.strip()
+        if word and word not in seen:
+            seen.add(word)
+            yield word
+
+
+def pdfPath(output: str, word: str) -> str:
+    """The path a flashcard's PDF is written to, in the output directory."""
+    name = re.sub(r"[^\w-]+", "_", word)
+    if name != word:
+        # Keep names that had to be changed apart from each other.
+        name = f"{name}-{hashlib.sha256(word.encode('utf-8')).hexdigest()[:8]}"
+    return os.path.join(output, "pdfs", f"{name}.pdf")
+
+
+async def build(
+    words: Iterator[str],
+    deck: Deck,
+    output: str,
+    renderer: RendererPool | RenderFarm | None = None,
+    render: bool = True,
+    progress: Progress | None = None,
+) -> list[str]:
+    """
+    Generate and render flashcards, skipping what an earlier build completed.
+
+    Generated flashcards are saved to cards.jsonl in the output directory, and
+    rendered ones to the pdfs directory, as soon as they complete. Each completion
+    is recorded in the journal, journal.jsonl. Words the journal records as
+    generated, or as failing to render, are loaded and rendered without being
+    generated again, and words it records as done are skipped. Words that failed to
+    generate are generated again.
+
+    Args:
+        words: The words, which may be an arbitrarily long iterator.
+        deck: The deck to generate with, whose words are replaced by the pending
+            ones.
+        output: The output directory.
+        renderer: The renderer pool or render farm to render with. Flashcards are
+            rendered on a worker thread with the default engine if this is None.
+        render: Whether to render the flashcards, or only generate them.
+        progress: The progress to keep up to date, if any.
+
+    Returns:
+        All the words, in order, including the ones completed earlier.
+    """
+    progress = progress or Progress()
+    os.makedirs(os.path.join(output, "pdfs"), exist_ok=True)
+    doneStages = {"rendered"} if render else {"generated", "renderFailed"}
+    allWords = []
+    rendering = asyncio.Semaphore(renderer.size if renderer is not None else 1)
+
+    with (
+        Journal(os.path.join(output, "journal.jsonl")) as journal,
+        CardWriter(os.path.join(output, "cards.jsonl")) as cardWriter,
+    ):
+        # Flashcards generated by earlier builds are only loaded when needed.
+        toRender = {
+            word
+            for word, stage in journal.stages.items()
+            if stage in ("generated", "renderFailed")
+        }
+        generated = {}
+        if render and toRender:
+            generated = {
+                flashcard.word: flashcard
+                for flashcard in CardReader(cardWriter.path)
+                if flashcard.word in toRender
+            }
+
+        async def renderCard(flashcard: Flashcard):
+            try:
+                if isinstance(renderer, RenderFarm):
+                    pdf = await renderer.renderAsync(flashcard)
+                else:
+                    pdf = await flashcard.renderAsync(renderer)
+                await asyncio.to_thread(writeFile, pdfPath(output, flashcard.word), pdf)
+            except Exception as error:
+                journal.record(flashcard.word, "renderFailed", error=repr(error))
+                progress.failed += 1
+            else:
+                journal.record(flashcard.word, "rendered")
+                progress.done += 1
+            finally:
+                progress.rendering -= 1
+                rendering.release()
+
+        def pending() -> Iterator[str]:
+            for word in words:
+                allWords.append(word)
+                if word in generated:
+                    continue
+                if journal.stages.get(word) in doneStages:
+                    progress.skipped += 1
+                else:
+                    progress.generating += 1
+                    yield word
+
+        async with asyncio.TaskGroup() as taskGroup:
+
+            async def complete(flashcard: Flashcard):
+                if not render:
+                    progress.done += 1
+                    return
+                await rendering.acquire()
+                progress.rendering += 1
+                taskGroup.create_task(renderCard(flashcard))
+
+            for flashcard in generated.values():
+                await complete(flashcard)
+
+            deck.words = pending()
+            failures = 0
+            async for flashcard in deck.generate():
+                progress.generating -= 1
+                # Copying the images into the blob store would stall the renders.
+                await asyncio.to_thread(cardWriter.write, flashcard)
+                journal.record(flashcard.word, "generated")
+                for word, error in list(deck.failures.items())[failures:]:
+                    journal.record(word, "failed", error=repr(error))
+                    progress.generating -= 1
+                    progress.failed += 1
+                failures = len(deck.failures)
+                await complete(flashcard)
+            for word, error in list(deck.failures.items())[failures:]:
+                journal.record(word, "failed", error=repr(error))
+                progress.generating -= 1
+                progress.failed += 1
+    return allWords
+
+
+def writeFile(path: str, data: bytes):
+    """Write a file, so that it is never seen partially written."""
+    temporaryPath = f"{path}.tmp"
+    with open(temporaryPath, "wb") as f:
+        f.write(data)
+    os.replace(temporaryPath, path)
+
+
+def writeDeck(path: str, words: list[str], output: str, layout: Layout) -> int:
+    """
+    Lay the rendered flashcards of words out in one PDF, in order.
+
+    Words without a rendered flashcard, such as ones that failed, are left out.
+
+    Returns:
+        The number of flashcards written.
+    """
+    with DeckWriter(path, layout) as writer:
+        for word in words:
+            if os.path.exists(pdfPath(output, word)):
+                with open(pdfPath(output, word), "rb") as f:
+                    writer.add(f.read())
+    return writer.cards
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="flashcards", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument(
+        "words",
+        nargs="?",
+        default="-",
+        help="The file to read words from, one per line, or - for stdin.",
+    )
+    parser.add_argument("--style", choices=list(styles), default="watercolor")
+    parser.add_argument(
+        "--output",
+        default="build",
+        help="The directory to write flashcards and the checkpoint journal to.",
+    )
+    parser.add_argument(
+        "--deck", help="The PDF to lay every rendered flashcard out in, in order."
+    )
+    parser.add_argument("--columns", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=1)
+    parser.add_argument("--sheet", choices=list(sheetSizes))
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="The maximum number of flashcards being generated at once.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="The number of words whose text fields are generated together.",
+    )
+    renderers = parser.add_mutually_exclusive_group()
+    renderers.add_argument(
+        "--renderers", type=int, help="The number of browsers to render with."
+    )
+    renderers.add_argument(
+        "--processes", type=int, help="The number of processes to render with."
+    )
+    parser.add_argument(
+        "--no-render", action="store_true", help="Only generate the flashcards."
+    )
+    parser.add_argument("--cache", help="The response cache database to use.")
+    parser.add_argument("--lexicon", help="The offline lexicon to use.")
+    parser.add_argument("--rhymes", help="The offline rhyme index to use.")
+    parser.add_argument("--quiet", action="store_true", help="Hide the progress.")
+    args = parser.parse_args()
+    if args.deck and args.no_render:
+        parser.error("--deck needs the flashcards to be rendered.")
+
+    async def run() -> list[str]:
+        progress = Progress()
+        async with AsyncExitStack() as stack:
+            renderer = None
+            if args.renderers:
+                renderer = RendererPool(args.renderers)
+            elif args.processes:
+                renderer = RenderFarm(args.processes)
+            if renderer is not None:
+                await stack.enter_async_context(renderer)
+            deck = Deck(
+                (),
+                styles[args.style],
+                concurrency=args.concurrency,
+                batchSize=args.batch_size,
+                cache=ResponseCache(args.cache) if args.cache else None,
+                lexicon=Lexicon(args.lexicon) if args.lexicon else None,
+                rhymeIndex=RhymeIndex(args.rhymes) if args.rhymes else None,
+            )
+
+            if not args.quiet:
+                reporter = asyncio.create_task(progress.report(sys.stderr))
+                stack.callback(reporter.cancel)
+            if args.words == "-":
+                words = readWords(sys.stdin)
+            else:
+                file = stack.enter_context(open(args.words, encoding="utf-8"))
+                words = readWords(file)
+            return await build(
+                words, deck, args.output, renderer, not args.no_render, progress
+            )
+
+    words = asyncio.run(run())
+    if args.deck:
+        layout = Layout(args.columns, args.rows, sheetSizes.get(args.sheet))
+        writeDeck(args.deck, words, args.output, layout)
+
+
+if __name__ == "__main__":
+    main()
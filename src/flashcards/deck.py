@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator, BinaryIO, Iterable
+
+import aiohttp
+
+from src.converter.pool import RendererPool
+from src.converter.writer import DeckWriter, Layout
+from src.flashcards.batch import genBatch
+from src.flashcards.farm import RenderFarm
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.generator import Generator
+from src.flashcards.styles.styles import Style
+from src.flashcards.utils.cache import ResponseCache
+from src.flashcards.utils.images import ImageStore
+from src.flashcards.utils.lexicon import Lexicon
+from src.flashcards.utils.limits import Limits
+from src.flashcards.utils.openai import OpenAiClient
+from src.flashcards.utils.rhymes import RhymeIndex
+
+__all__ = ("Deck",)
+
+logger = logging.getLogger(__name__)
+
+
+class Deck:
+    """
+    A batch of flashcards of the same style, generated together.
+
+    All the flashcards of a deck share one session, so connections are reused across
+    words, and one set of provider limits, so the limits hold for the deck as a whole.
+
+    Attributes:
+        words: The words of the deck.
+        style: The style of the flashcards.
+        concurrency: The maximum number of flashcards being generated at once.
+        batchSize: The number of words whose text fields are generated together by a
+            single GPT request. Words are generated on their own if this is 1.
+        limits: The provider limits shared by every flashcard of the deck.
+        cache: The response cache shared by every flashcard of the deck, if any.
+        imageStore: The image store shared by every flashcard of the deck.
+        openaiKwargs: Keyword arguments for the OpenAI client shared by every
+            flashcard of the deck, such as its rate limits and budget.
+        apiUrls: The base URLs of the upstream APIs, keyed by source, for the ones
+            that should not use the defaults. See `generator.defaultApiUrls`.
+        lexicon: The offline lexicon consulted before the upstream APIs, if any.
+        rhymeIndex: The offline rhyme index consulted before the upstream APIs, if
+            any.
+        openai: The OpenAI client of the deck's current generation, if any.
+        failures: The words whose generation, or rendering when writing, failed,
+            mapped to the error raised.
+    """
+
+    def __init__(
+        self,
+        words: Iterable[str],
+        style: Style,
+        concurrency: int = 8,
+        batchSize: int = 1,
+        limits: Limits | None = None,
+        cache: ResponseCache | None = None,
+        imageStore: ImageStore | None = None,
+        openaiKwargs: dict[str, object] | None = None,
+        apiUrls: dict[str, str] | None = None,
+        lexicon: Lexicon | None = None,
+        rhymeIndex: RhymeIndex | None = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1.", concurrency)
+        if batchSize < 1:
+            raise ValueError("Batch size must be at least 1.", batchSize)
+
+        self.words = words
+        self.style = style
+        self.concurrency = concurrency
+        self.batchSize = batchSize
+        self.limits = limits or Limits()
+        self.cache = cache
+        self.imageStore = imageStore or ImageStore()
+        self.openaiKwargs = openaiKwargs or {}
+        self.apiUrls = apiUrls
+        self.lexicon = lexicon
+        self.rhymeIndex = rhymeIndex
+        self.openai: OpenAiClient | None = None
+        self.failures: dict[str, Exception] = {}
+
+    async def generate(self) -> AsyncIterator[Flashcard]:
+        """
+        Generate the flashcards of the deck.
+
+        Words are consumed lazily, so `words` may be an arbitrarily long iterable.
+        Flashcards are yielded as soon as they are generated, which is not necessarily
+        the order of `words`. Words that fail to generate are logged, recorded in
+        `failures`, and skipped.
+
+        Yields:
+            The generated flashcards.
+        """
+        words = iter(self.words)
+        finished: asyncio.Queue[Flashcard | None] = asyncio.Queue(self.concurrency)
+
+        # Connections are bounded by the provider limits instead of the connector.
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self.openai = OpenAiClient(session, **self.openaiKwargs)
+
+            async def generateCard(word: str, generator: Generator):
+                flashcard = Flashcard(word, self.style)
+                try:
+                    await flashcard.generate(generator=generator)
+                except Exception as error:
+                    logger.warning("Failed to generate %r: %r", word, error)
+                    self.failures[word] = error
+                    return
+                await finished.put(flashcard)
+
+            async def worker():
+                while batch := list(itertools.islice(words, self.batchSize)):
+                    generators = [
+                        Generator(
+                            word,
+                            session,
+                            limits=self.limits,
+                            cache=self.cache,
+                            imageStore=self.imageStore,
+                            openai=self.openai,
+                            apiUrls=self.apiUrls,
+                            lexicon=self.lexicon,
+                            rhymeIndex=self.rhymeIndex,
+                        )
+                        for word in batch
+                    ]
+                    if len(generators) > 1:
+                        await genBatch(generators, self.style.config)
+                    await asyncio.gather(
+                        *(
+                            generateCard(word, generator)
+                            for word, generator in zip(batch, generators)
+                        )
+                    )
+
+            async def closeWhenDone():
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    await finished.put(None)
+
+            workerCount = max(1, self.concurrency // self.batchSize)
+            workers = [asyncio.create_task(worker()) for _ in range(workerCount)]
+            closer = asyncio.create_task(closeWhenDone())
+            try:
+                while (flashcard := await finished.get()) is not None:
+                    yield flashcard
+            finally:
+                for task in (*workers, closer):
+                    task.cancel()
+                await asyncio.gather(*workers, closer, return_exceptions=True)
+
+    async def write(
+        self,
+        file: str | BinaryIO,
+        layout: Layout = Layout(),
+        pool: RendererPool | RenderFarm | None = None,
+    ) -> int:
+        """
+        Generate the flashcards of the deck and write them to a single PDF.
+
+        Each flashcard is rendered as soon as it is generated, while the next ones
+        keep generating, and its sheet is written to the file as soon as it is full,
+        so memory use does not grow with the size of the deck. As many flashcards
+        render at once as the pool has browsers. Flashcards are written in the order
+        they finish. Flashcards that fail to render are logged, recorded in
+        `failures`, and skipped, like those that fail to generate.
+
+        Args:
+            file: The path of the PDF, or a binary file to write it to.
+            layout: The layout of the flashcards on the sheets of the PDF.
+            pool: The renderer pool or render farm to render with. Flashcards are
+                rendered one at a time on a worker thread with the default engine if
+                this is None.
+
+        Returns:
+            The number of flashcards written.
+        """
+        rendering = asyncio.Semaphore(pool.size if pool is not None else 1)
+
+        async def renderCard(flashcard: Flashcard):
+            try:
+                if isinstance(pool, RenderFarm):
+                    pdf = await pool.renderAsync(flashcard)
+                else:
+                    pdf = await flashcard.renderAsync(pool)
+            except Exception as error:
+                logger.warning("Failed to render %r: %r", flashcard.word, error)
+                self.failures[flashcard.word] = error
+                return
+            finally:
+                rendering.release()
+            writer.add(pdf)
+
+        with DeckWriter(file, layout) as writer:
+            async with aclosing(self.generate()) as flashcards:
+                async with asyncio.TaskGroup() as taskGroup:
+                    async for flashcard in flashcards:
+                        await rendering.acquire()
+                        taskGroup.create_task(renderCard(flashcard))
+        return writer.cards
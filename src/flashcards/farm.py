@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from src.converter.engine import engine
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.structs import Image
+
+__all__ = ("RenderFarm",)
+
+
+class RenderFarm:
+    """
+    A pool of worker processes rendering flashcards to PDFs, one renderer each.
+
+    Every worker owns a browser of its own, launched on its first render, so
+    rendering scales with the number of cores instead of being bound to the one
+    browser of the default engine. Flashcards are sent to the workers as their word,
+    the name of their style, and their fields, so their styles must be ones of the
+    style registry, and their images must be readable by the workers.
+
+    Args:
+        processes: The number of worker processes. The number of CPUs is used if
+            this is None.
+        driverPath: The path to the chromedriver binary of the workers' browsers.
+            See `src.converter.engine.createWebdriver`.
+        window: The number of flashcards per process that `render` has in flight.
+    """
+
+    def __init__(
+        self,
+        processes: int | None = None,
+        driverPath: str | None = None,
+        window: int = 4,
+    ):
+        processes = processes or os.cpu_count() or 1
+        if processes < 1:
+            raise ValueError("The farm needs at least 1 process.", processes)
+        if window < 1:
+            raise ValueError("The window must be at least 1.", window)
+
+        self.processes = processes
+        self.driverPath = driverPath
+        self.window = window
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "RenderFarm":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    async def __aenter__(self) -> "RenderFarm":
+        self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await asyncio.to_thread(self.stop)
+
+    @property
+    def size(self) -> int:
+        """The number of flashcards rendered at once."""
+        return self.processes
+
+    def start(self):
+        """Start the worker processes, unless they are already running."""
+        if self._executor is None:
+            # Workers are spawned, since forking copies the parent's threads' locks.
+            self._executor = ProcessPoolExecutor(
+                self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initWorker,
+                initargs=(self.driverPath,),
+            )
+
+    def stop(self):
+        """Stop the worker processes, and their browsers, once they are done."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def submit(self, flashcard: Flashcard, **kwargs) -> Future[bytes]:
+        """
+        Start rendering a flashcard on a worker.
+
+        Args:
+            flashcard: The flashcard.
+            **kwargs: Keyword arguments to pass to the templates.
+
+        Returns:
+            The future of the PDF.
+        """
+        if self._executor is None:
+            raise RuntimeError("The render farm has not been started.")
+        if flashcard.style.name not in styles:
+            raise ValueError("Only registered styles can be rendered by a farm.")
+        return self._executor.submit(
+            _renderFlashcard,
+            flashcard.word,
+            flashcard.style.name,
+            flashcard.fields,
+            kwargs,
+        )
+
+    def render(self, flashcards: Iterable[Flashcard], **kwargs) -> Iterator[bytes]:
+        """
+        Render flashcards on the workers, in order.
+
+        Flashcards are taken in windows of `window` per process. The flashcards of
+        a window are handed out largest first, so a large flashcard taken last does
+        not keep the other workers idle at the end of the window. The PDFs are still
+        yielded in the order of the flashcards.
+
+        Args:
+            flashcards: The flashcards, which may be an arbitrarily long iterable.
+            **kwargs: Keyword arguments to pass to the templates.
+
+        Yields:
+            The PDFs.
+        """
+        flashcards = iter(flashcards)
+        windowSize = self.window * self.processes
+        while window := list(itertools.islice(flashcards, windowSize)):
+            futures: dict[int, Future[bytes]] = {}
+            for i in sorted(range(len(window)), key=lambda i: -_size(window[i])):
+                futures[i] = self.submit(window[i], **kwargs)
+            for i in range(len(window)):
+                yield futures[i].result()
+
+    async def renderAsync(self, flashcard: Flashcard, **kwargs) -> bytes:
+        """
+        Render a flashcard on a worker, without blocking the event loop.
+
+        Args:
+            flashcard: The flashcard.
+            **kwargs: Keyword arguments to pass to the templates.
+
+        Returns:
+            The PDF.
+        """
+        return await asyncio.wrap_future(self.submit(flashcard, **kwargs))
+
+
+def _size(flashcard: Flashcard) -> int:
+    """An estimate of the work of rendering a flashcard: the bytes it embeds."""
+    size = 0
+    for value in flashcard.fields.values():
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, Image):
+                size += os.path.getsize(item.path) if os.path.exists(item.path) else 0
+            else:
+                size += len(str(item))
+    return size
+
+
+def _initWorker(driverPath: str | None):
+    """Point the worker's default engine at the farm's chromedriver."""
+    engine.driverPath = driverPath
+
+
+def _renderFlashcard(
+    word: str, styleName: str, fields: dict[str, object], kwargs: dict[str, object]
+) -> bytes:
+    """Rebuild a flashcard sent to a worker, and render it."""
+    flashcard = Flashcard(word, styles[styleName])
+    flashcard.fields.update(fields)
+    return flashcard.render(**kwargs)
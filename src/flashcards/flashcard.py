@@ -1,20 +1,23 @@
 import asyncio
-import base64
-import io
 import json
+import os
 from contextlib import asynccontextmanager
-from typing import Iterable
+from typing import Callable, Iterable
 
 import aiohttp
 import jinja2
-from pypdf import PdfWriter
 
 from src.converter import convertToPdf
-from src.flashcards.generator import Generator
+from src.converter.assets import assets
+from src.converter.backends import ChromeBackend, getBackend
+from src.converter.pool import RendererPool
+from src.flashcards.generator import Generator, fingerprint, listFields
 from src.flashcards.graphics import icons
-from src.flashcards.styles.styles import Style
-from src.flashcards.utils.formatting import camelCaseToSnakeCase
+from src.flashcards.styles.styles import Style, styles
+from src.flashcards.utils.images import BlobStore
 from src.flashcards.utils.misc import strAsBase64
+from src.flashcards.utils.structs import Image
+from src.flashcards.utils.tracing import tracer
 
 fields = (
     "partOfSpeech",
@@ -29,6 +32,10 @@ fields = (
     "images",
 )
 
+# The version of the format flashcards are saved in, which is bumped whenever
+# flashcards saved by older versions would be loaded wrong.
+formatVersion = 1
+
 
 class Flashcard:
     def __init__(self, word: str, style: Style):
@@ -39,39 +46,167 @@ class Flashcard:
             word: The word.
             style: The style of the flashcard.
             fields: The fields of the flashcard.
+            fingerprints: The fingerprints of what each generated field was generated
+                from. See `generator.fingerprint`.
+            rawItems: The unformatted items of each generated list field, which the
+                field is topped up from when more items are asked for.
         """
         self.style = style
         self.fields = dict.fromkeys(fields)
+        self.fingerprints: dict[str, str] = {}
+        self.rawItems: dict[str, list] = {}
         self._word = word
 
     @property
     def word(self) -> str:
         return self._word
 
-    def render(self, *args, **kwargs) -> bytes:
+    def save(self, path: str):
+        """
+        Save the flashcard's generated content, to render it later or elsewhere.
+
+        The flashcard is saved as JSON, and its images are stored in the blobs
+        directory next to it. See `toDict`.
+
+        Args:
+            path: The path of the JSON file.
+        """
+        blobs = BlobStore(os.path.join(os.path.dirname(path), "blobs"))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.toDict(blobs), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "Flashcard":
+        """
+        Load a flashcard saved with `save`.
+
+        Args:
+            path: The path of the JSON file.
+
+        Returns:
+            The flashcard, ready to render.
+        """
+        blobs = BlobStore(os.path.join(os.path.dirname(path), "blobs"))
+        with open(path, encoding="utf-8") as f:
+            return cls.fromDict(json.load(f), blobs)
+
+    def toDict(self, blobs: BlobStore) -> dict:
+        """
+        The flashcard as JSON-serializable data.
+
+        The style is referred to by name, and images by the name of a copy of their
+        file in a blob store.
+
+        Args:
+            blobs: The blob store to store the images in.
+
+        Returns:
+            The version of the format, the word, the name of the style, the
+            fields, and their fingerprints.
+        """
+
+        def encode(value):
+            if isinstance(value, list):
+                return [encode(item) for item in value]
+            if isinstance(value, Image):
+                return {
+                    "$image": {
+                        "blob": blobs.put(value.path),
+                        "size": list(value.size),
+                        "prompt": value.prompt,
+                        "dalleTemplate": value.dalleTemplate,
+                    }
+                }
+            return value
+
+        return {
+            "version": formatVersion,
+            "word": self.word,
+            "style": self.style.name,
+            "fields": {field: encode(value) for field, value in self.fields.items()},
+            "fingerprints": self.fingerprints,
+            "rawItems": {
+                field: encode(items) for field, items in self.rawItems.items()
+            },
+        }
+
+    @classmethod
+    def fromDict(cls, data: dict, blobs: BlobStore) -> "Flashcard":
+        """
+        Make a flashcard from data made by `toDict`.
+
+        Args:
+            data: The data.
+            blobs: The blob store the images were stored in.
+
+        Returns:
+            The flashcard.
+
+        Raises:
+            ValueError: The data was saved by a newer version of the format.
+        """
+        if data.get("version", 0) > formatVersion:
+            raise ValueError("Unsupported flashcard format version.", data["version"])
+
+        def decode(value):
+            if isinstance(value, list):
+                return [decode(item) for item in value]
+            if isinstance(value, dict) and "$image" in value:
+                image = value["$image"]
+                return Image(
+                    blobs.path(image["blob"]),
+                    tuple(image["size"]),
+                    image["prompt"],
+                    image["dalleTemplate"],
+                )
+            return value
+
+        flashcard = cls(data["word"], styles[data["style"]])
+        for field, value in data["fields"].items():
+            flashcard.fields[field] = decode(value)
+        flashcard.fingerprints.update(data.get("fingerprints", {}))
+        for field, items in data.get("rawItems", {}).items():
+            flashcard.rawItems[field] = decode(items)
+        return flashcard
+
+    def render(self, **kwargs) -> bytes:
         """
         Render a flashcard to a PDF, and return the PDF as a bytes stream.
 
-        Calls renderFront and renderBack, and combines the results into a single PDF.
+        The front and the back are laid out as the two pages of one document, which
+        is rendered with the style's backend in a single pass. Images are referred to
+        as the backend prefers, which for the chrome backend is by URL.
 
         Args:
-            *args: Positional arguments to pass to renderFront and renderBack.
-            **kwargs: Keyword arguments to pass to renderFront and renderBack.
+            **kwargs: Keyword arguments to pass to the templates.
 
         Returns:
             bytes: The PDF as a bytes stream.
         """
-        front = base64.b64decode(self.renderFront(*args, **kwargs))
-        back = base64.b64decode(self.renderBack(*args, **kwargs))
+        backend = getBackend(self.style.backend)
+        with tracer.card(self.word), tracer.span("render"), assets.scope():
+            return backend.svgToPdf(
+                list(self._prerenderSides(backend.assetUrl, **kwargs)),
+                *self.style.size,
+            )
 
-        writer = PdfWriter()
-        writer.append(io.BytesIO(front))
-        writer.append(io.BytesIO(back))
+    def renderPng(self, back: bool = False, scale: float = 1, **kwargs) -> bytes:
+        """
+        Render a side of the flashcard to a PNG with the style's backend.
+
+        Args:
+            back: Whether to render the back instead of the front.
+            scale: The number of PNG pixels per flashcard pixel.
+            **kwargs: Keyword arguments to pass to the template.
 
-        bytes_stream = io.BytesIO()
-        writer.write(bytes_stream)
-        bytes_stream.seek(0)
-        return bytes_stream.read()
+        Returns:
+            bytes: The PNG.
+        """
+        backend = getBackend(self.style.backend)
+        template = self.style.back if back else self.style.front
+        with tracer.card(self.word), tracer.span("render", back=back), assets.scope():
+            svg = self._prerender(template, backend.assetUrl, **kwargs)
+            return backend.svgToPng(svg, *self.style.size, scale)
 
     def renderFront(self, **kwargs) -> str:
         """Render the front of the flashcard to a base-64 PDF."""
@@ -85,6 +220,79 @@ class Flashcard:
             strAsBase64(self._prerenderBack(**kwargs)), "image/svg+xml", *self.style.size,
         )
 
+    async def renderAsync(self, pool: RendererPool | None = None, **kwargs) -> bytes:
+        """
+        Render a flashcard to a PDF without blocking the event loop.
+
+        See `render` for details. Templating runs on a worker thread, and printing on
+        one of the pool's browsers, so flashcards can be generated while others
+        render. Without a pool, or for styles that do not use the chrome backend, the
+        whole render runs on a worker thread instead, taking turns with the default
+        engine's browser.
+
+        Args:
+            pool: The renderer pool to render with, if any.
+            **kwargs: Keyword arguments to pass to the templates.
+
+        Returns:
+            bytes: The PDF as a bytes stream.
+        """
+        if pool is None or self.style.backend != ChromeBackend.name:
+            return await asyncio.to_thread(self.render, **kwargs)
+        assetUrl = getBackend(self.style.backend).assetUrl
+        with tracer.card(self.word), tracer.span("render"), assets.scope():
+            sides = await asyncio.to_thread(self._prerenderSides, assetUrl, **kwargs)
+            with assets.pages(list(sides), *self.style.size) as url:
+                return await pool.convertDocumentToPdf(url, *self.style.size)
+
+    async def renderPngAsync(
+        self,
+        back: bool = False,
+        scale: float = 1,
+        pool: RendererPool | None = None,
+        **kwargs,
+    ) -> bytes:
+        """
+        Render a side of the flashcard to a PNG without blocking the event loop.
+
+        See `renderPng` and `renderAsync` for details.
+
+        Args:
+            back: Whether to render the back instead of the front.
+            scale: The number of PNG pixels per flashcard pixel.
+            pool: The renderer pool to render with, if any.
+            **kwargs: Keyword arguments to pass to the template.
+
+        Returns:
+            bytes: The PNG.
+        """
+        if pool is None or self.style.backend != ChromeBackend.name:
+            return await asyncio.to_thread(self.renderPng, back, scale, **kwargs)
+        assetUrl = getBackend(self.style.backend).assetUrl
+        template = self.style.back if back else self.style.front
+        with tracer.card(self.word), tracer.span("render", back=back), assets.scope():
+            svg = await asyncio.to_thread(self._prerender, template, assetUrl, **kwargs)
+            with assets.pages([svg], *self.style.size) as url:
+                return await pool.convertDocumentToPng(url, *self.style.size, scale)
+
+    async def renderFrontAsync(self, pool: RendererPool | None = None, **kwargs) -> str:
+        """Render the front of the flashcard to a base-64 PDF off the event loop."""
+        if pool is None:
+            return await asyncio.to_thread(self.renderFront, **kwargs)
+        svg = await asyncio.to_thread(self._prerenderFront, **kwargs)
+        return await pool.convertToPdf(
+            strAsBase64(svg), "image/svg+xml", *self.style.size,
+        )
+
+    async def renderBackAsync(self, pool: RendererPool | None = None, **kwargs) -> str:
+        """Render the back of the flashcard to a base-64 PDF off the event loop."""
+        if pool is None:
+            return await asyncio.to_thread(self.renderBack, **kwargs)
+        svg = await asyncio.to_thread(self._prerenderBack, **kwargs)
+        return await pool.convertToPdf(
+            strAsBase64(svg), "image/svg+xml", *self.style.size,
+        )
+
     def _prerenderBack(self, **kwargs) -> str:
         """Render the back of the flashcard to a templated SVG."""
         return self._prerender(self.style.back, **kwargs)
@@ -93,31 +301,84 @@ class Flashcard:
         """Render the front of the flashcard to a templated SVG."""
         return self._prerender(self.style.front, **kwargs)
 
-    def _prerender(self, template: jinja2.Template, **kwargs) -> str:
+    def _prerenderSides(
+        self, assetUrl: Callable[[str], str] | None = None, **kwargs
+    ) -> tuple[str, str]:
+        """
+        Render the front and the back of the flashcard to templated SVGs.
+
+        Files such as images are referred to by `assetUrl`, or inlined as data URIs
+        if it is None. See `Style.templateFields`.
+        """
+        with tracer.span("template"):
+            return self.style.render(
+                self.fields, assetUrl, **self._templateKwargs(assetUrl, **kwargs)
+            )
+
+    def _prerender(
+        self,
+        template: jinja2.Template,
+        assetUrl: Callable[[str], str] | None = None,
+        **kwargs,
+    ) -> str:
         """Render a side of the flashcard to a templated SVG."""
-        templateFields = {**kwargs, "WORD_1": self.word}
-        for fieldName, value in self.fields.items():
-            fieldName = camelCaseToSnakeCase(fieldName).upper()
-            if isinstance(value, list):
-                for i, item in enumerate(value, start=1):
-                    templateFields[f"{fieldName}_{i}"] = str(item)
-            else:
-                templateFields[f"{fieldName}_1"] = str(value)
-        templateFields["PART_OF_SPEECH_ICON_1"] = str(icons[self.fields["partOfSpeech"]])
-        return template.render(**templateFields)
+        with tracer.span("template"):
+            return template.render(
+                self.style.templateFields(
+                    self.fields, assetUrl, **self._templateKwargs(assetUrl, **kwargs)
+                )
+            )
+
+    def _templateKwargs(
+        self, assetUrl: Callable[[str], str] | None = None, **kwargs
+    ) -> dict[str, str]:
+        """The placeholder values that do not come from the flashcard's fields."""
+        icon = icons[self.fields["partOfSpeech"]]
+        return {
+            **kwargs,
+            "WORD_1": self.word,
+            "PART_OF_SPEECH_ICON_1": (
+                assetUrl(icon.path) if assetUrl is not None else str(icon)
+            ),
+        }
 
     @asynccontextmanager
-    async def generator(self) -> Generator:
-        async with aiohttp.ClientSession() as session:
-            yield Generator(self.word, session)
+    async def generator(
+        self,
+        session: aiohttp.ClientSession | None = None,
+        **generatorKwargs,
+    ) -> Generator:
+        """
+        A generator for the flashcard's word.
+
+        Args:
+            session: The session to make requests with. A new session is opened (and
+                closed afterwards) if this is None.
+            **generatorKwargs: Keyword arguments to pass to the generator, such as
+                its limits and cache.
+        """
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                yield Generator(self.word, session, **generatorKwargs)
+        else:
+            yield Generator(self.word, session, **generatorKwargs)
 
     async def _generate(
         self,
         genFields: list[str] | None = None,
         genKwargs: dict[str, dict[str, object]] | None = None,
+        session: aiohttp.ClientSession | None = None,
+        generator: Generator | None = None,
+        regenerate: bool = False,
+        **generatorKwargs,
     ) -> None:
         """
-        Generate the flashcard.
+        Generate the flashcard, incrementally.
+
+        A field is generated anew if it has no value yet, or its fingerprint changed
+        since it was generated. List fields that are up to date but hold fewer items
+        than asked for only have the missing items generated, and are appended to.
+        Other fields are left as they are.
 
         Args:
             genFields: The fields to generate data for the flashcard. All fields are
@@ -125,33 +386,107 @@ class Flashcard:
             genKwargs: Extra keyword arguments to pass to the respective generator and
                 fetchers for given fields. No extra keyword arguments are passed if this
                 is None.
-
-        Notes:
-            This method clears the current fields of the flashcard.
+            session: The session to make requests with. A new session is used if this
+                is None.
+            generator: The generator to generate with, such as one already holding
+                data from a batched generation. A new generator is made with session
+                and generatorKwargs if this is None.
+            regenerate: Whether to generate every field anew, up to date or not.
+            **generatorKwargs: Keyword arguments to pass to the generator, such as
+                its limits and cache.
         """
         genFields = genFields or fields
         genKwargs = dict.fromkeys(fields, {}) | (genKwargs or {})
 
-        async with self.generator() as generator:
-            # fmt: off
-            tasks = []
-            async with asyncio.TaskGroup() as taskGroup:
-                for field in genFields:
-                    async def fieldGen(_field=field):
-                        self.fields[_field] = await getattr(generator, _field)(
+        fingerprints = {
+            field: fingerprint(field, genKwargs[field]) for field in genFields
+        }
+        seeds = {}
+        for field in genFields:
+            value = self.fields.get(field)
+            stale = self.fingerprints.get(field) != fingerprints[field]
+            if regenerate or stale or value is None:
+                continue
+            if field in listFields and len(value) < genKwargs[field].get("count", 1):
+                # Fields saved without their unformatted items are generated anew.
+                if field in self.rawItems:
+                    seeds[field] = self.rawItems[field]
+            else:
+                del fingerprints[field]
+        if not fingerprints:
+            return
+
+        with tracer.card(self.word), tracer.span("generate"):
+            if generator is not None:
+                await self._generateWith(generator, fingerprints, genKwargs, seeds)
+            else:
+                async with self.generator(session, **generatorKwargs) as generator:
+                    await self._generateWith(generator, fingerprints, genKwargs, seeds)
+
+    async def _generateWith(
+        self,
+        generator: Generator,
+        fingerprints: dict[str, str],
+        genKwargs: dict[str, dict[str, object]],
+        seeds: dict[str, list],
+    ) -> None:
+        """
+        Generate the given fields concurrently with a generator.
+
+        Args:
+            generator: The generator.
+            fingerprints: The fingerprints of the fields to generate.
+            genKwargs: The keyword arguments to generate each field with.
+            seeds: The unformatted items of the fields that are only topped up.
+        """
+        for field, items in seeds.items():
+            generator.seed(field, items)
+        generator.prefetch(fingerprints)
+        # fmt: off
+        tasks = []
+        async with asyncio.TaskGroup() as taskGroup:
+            for field in fingerprints:
+                async def fieldGen(_field=field):
+                    with tracer.span("field", field=_field):
+                        value = await getattr(generator, _field)(
                             **genKwargs[_field],
                         )
-                    tasks.append(taskGroup.create_task(fieldGen()))
-            # fmt: on
+                        self.fields[_field] = value
+                        if _field in listFields:
+                            # The value is these items, formatted, in order.
+                            items = generator.items(_field)
+                            self.rawItems[_field] = items[:len(value)]
+                        self.fingerprints[_field] = fingerprints[_field]
+                tasks.append(taskGroup.create_task(fieldGen()))
+        # fmt: on
 
-    async def generate(self):
+    async def generate(
+        self,
+        session: aiohttp.ClientSession | None = None,
+        generator: Generator | None = None,
+        regenerate: bool = False,
+        **generatorKwargs,
+    ):
         """
         Generate all the needed fields for the flashcard.
 
+        Args:
+            session: The session to make requests with. A new session is used if this
+                is None.
+            generator: The generator to generate with. See `_generate`.
+            regenerate: Whether to generate every field anew. Only the fields whose
+                fingerprint changed, or that are short of items, are generated if
+                this is False. See `_generate`.
+            **generatorKwargs: Keyword arguments to pass to the generator, such as
+                its limits and cache.
+
         Notes:
-            * This method clears the current fields of the flashcard.
-            * This method utilizes the styles' configuration for generation.
+            This method utilizes the styles' configuration for generation.
         """
         await self._generate(
             genKwargs=self.style.config,
+            session=session,
+            generator=generator,
+            regenerate=regenerate,
+            **generatorKwargs,
         )
@@ -1,30 +1,126 @@
 import asyncio
+import base64
+import hashlib
 import json
+import logging
+from typing import Awaitable, Callable, Iterable, Mapping
 
 import aiohttp
 from unidecode import unidecode
 
 from src import keys
 from src.flashcards.utils import formatting
-from src.flashcards.utils.openai import gptReq, dalleReq
+from src.flashcards.utils.cache import ResponseCache
+from src.flashcards.utils.images import ImageStore, sharedImageStore
+from src.flashcards.utils.lexicon import Lexicon
+from src.flashcards.utils.limits import Limits
+from src.flashcards.utils.openai import OpenAiClient, gptReq, dalleReq
+from src.flashcards.utils.rhymes import RhymeIndex
 from src.flashcards.utils.structs import Image
+from src.flashcards.utils.tracing import tracer
 
 # fmt: off
 BASIC_WEBSTER_THESAURUS = "https://www.dictionaryapi.com/api/v3/references/thesaurus/json"
-ADVANCED_WEBSTER_THESAURUS = "https://www.dictionaryapi.com/api/v3/references/ithesaurus/json/"
+ADVANCED_WEBSTER_THESAURUS = "https://www.dictionaryapi.com/api/v3/references/ithesaurus/json"
 RHYMEZONE_API = "https://api.datamuse.com/words"
 RHYMEBRAIN_API = "https://rhymebrain.com/talk?function=getRhymes"
 DICTIONARY_API = "https://api.dictionaryapi.dev/api/v2/entries/en"
 # fmt: on
 
+# The base URLs of the upstream APIs, keyed by source. Generators may be pointed at
+# other URLs, such as local stand-ins of the APIs.
+defaultApiUrls = {
+    "basicThesaurus": BASIC_WEBSTER_THESAURUS,
+    "advancedThesaurus": ADVANCED_WEBSTER_THESAURUS,
+    "rhymezone": RHYMEZONE_API,
+    "rhymebrain": RHYMEBRAIN_API,
+    "dictionary": DICTIONARY_API,
+}
+
 with open("flashcards/prompts.json") as f:
     aiPrompts = json.load(f)
 
+logger = logging.getLogger(__name__)
+
+# The sources each field can be filled from, cheapest first. Every source is
+# fetched at most once per word and fills all the fields it has data for. The
+# offline indexes come first, and GPT is the last resort of every field, and is
+# only asked for what the sources left out.
+fieldSources = {
+    "partOfSpeech": ("lexicon", "dictionary"),
+    "pronunciation": ("lexicon",),
+    "offensive": ("lexicon", "basicThesaurus", "advancedThesaurus"),
+    "synonyms": ("lexicon", "dictionary", "basicThesaurus", "advancedThesaurus"),
+    "antonyms": ("lexicon", "dictionary", "basicThesaurus", "advancedThesaurus"),
+    "sentences": ("lexicon", "dictionary"),
+    "definitions": ("lexicon", "dictionary"),
+    "inspirationalQuotes": (),
+    "rhymes": ("rhymeIndex", "lexicon", "rhymezone"),
+    "images": (),
+}
+
+# The offline sources, which are skipped if the generator was not given them.
+localSources = frozenset(("lexicon", "rhymeIndex"))
+
+# The fields holding several items, whose GPT fallbacks take a count.
+listFields = frozenset(
+    (
+        "synonyms",
+        "antonyms",
+        "sentences",
+        "definitions",
+        "inspirationalQuotes",
+        "rhymes",
+        "images",
+    )
+)
+
+# The prompts the fields are generated with, for the fields not named like theirs.
+fieldPrompts = {"rhymes": "rhyming", "images": "dallePrompt"}
+
+# The DALL-E model images are generated with, and their size.
+dalleModel = "dall-e-2"
+dalleSize = (1024, 1024)
+
+# What the fields' upstream requests are made with, besides their prompts.
+fieldRequests = {"images": {"model": dalleModel, "size": list(dalleSize)}}
+
+
+def fingerprint(field: str, genKwargs: dict[str, object] | None = None) -> str:
+    """
+    A fingerprint of what a field is generated from.
+
+    The fingerprint covers the field's generation config, the prompt and model its
+    GPT fallback uses, and the DALL-E model and size for images, so it changes
+    whenever generating the field anew could give a different result. The count of
+    list fields is left out, since asking for more items only needs the missing ones
+    to be generated.
+
+    Args:
+        field: The field.
+        genKwargs: The keyword arguments the field is generated with.
+
+    Returns:
+        The fingerprint.
+    """
+    config = {key: value for key, value in (genKwargs or {}).items() if key != "count"}
+    prompt = aiPrompts.get(fieldPrompts.get(field, field))
+    normalized = json.dumps(
+        [field, config, prompt, fieldRequests.get(field)],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
 
 class Generator:
     """
     A generator for flashcard fields.
 
+    Generators not given an OpenAI client or image store share the ones of every
+    other such generator, so their rate limits, budget and image generations hold
+    across all of them.
+
     Methods:
         partOfSpeech: The part of speech of the word.
         pronunciation: The pronunciation of the word.
@@ -38,13 +134,32 @@ class Generator:
         images: Images of the word.
     """
 
-    def __init__(self, word: str, session: aiohttp.ClientSession):
+    def __init__(
+        self,
+        word: str,
+        session: aiohttp.ClientSession,
+        limits: Limits | None = None,
+        cache: ResponseCache | None = None,
+        imageStore: ImageStore | None = None,
+        openai: OpenAiClient | None = None,
+        apiUrls: dict[str, str] | None = None,
+        lexicon: Lexicon | None = None,
+        rhymeIndex: RhymeIndex | None = None,
+    ):
         self.word = word
         self.session = session
+        self.limits = limits or Limits()
+        self.cache = cache
+        self.imageStore = imageStore or sharedImageStore
+        # The shared client is picked by the requests, since it is per event loop.
+        self.openai = openai
+        self.apiUrls = {**defaultApiUrls, **(apiUrls or {})}
+        self.lexicon = lexicon
+        self.rhymeIndex = rhymeIndex
 
         self._partOfSpeech = None
         self._pronunciation = None
-        self._offensive = False
+        self._offensive = None
         self._synonyms = []
         self._antonyms = []
         self._sentences = []
@@ -52,12 +167,10 @@ class Generator:
         self._inspirationalQuotes = []
         self._rhymes = []
         self._images = []
+        self._imagePrompts = []
 
-        self._basic_thesaurus_api_fetched = False
-        self._advanced_thesaurus_api_fetched = False
-        self._rhyming_api1_fetched = False
-        self._rhyming_api2_fetched = False
-        self._dictionary_api_fetched = False
+        # The single fetch of each upstream source, shared by every field using it.
+        self._sources: dict[str, asyncio.Future[dict]] = {}
 
     async def partOfSpeech(self, abbreviate: bool = False):
         """
@@ -69,8 +182,7 @@ class Generator:
         Returns:
             The part of speech of the    word
         """
-        if not self._partOfSpeech:
-            await self._genPartOfSpeech()
+        await self._provide("partOfSpeech")
         partOfSpeech = self._partOfSpeech.lower()
         if abbreviate:
             return {
@@ -98,8 +210,7 @@ class Generator:
         Returns:
             The pronunciation of the word.
         """
-        if not self._pronunciation:
-            await self._genPronunciation()
+        await self._provide("pronunciation")
 
         pronunciation = unidecode(self._pronunciation)
         if lowercase:
@@ -118,15 +229,7 @@ class Generator:
         Returns:
             Synonyms of the word.
         """
-        if not self._synonyms:
-            if not self._basic_thesaurus_api_fetched:
-                await self._fetchBasicThesaurusData()
-        if not self._synonyms:
-            if not self._advanced_thesaurus_api_fetched:
-                await self._fetchAdvancedThesaurusData()
-        if not self._synonyms or len(self._synonyms) < count:
-            synonymCount = len(self._synonyms) if self._synonyms is not None else 0
-            await self._genSynonyms(count - synonymCount)
+        await self._provide("synonyms", count)
 
         if capitalize:
             return [formatting.capitalize(syn) for syn in self._synonyms]
@@ -143,14 +246,7 @@ class Generator:
         Returns:
             Antonyms of the word.
         """
-        if not self._antonyms:
-            if not self._basic_thesaurus_api_fetched:
-                await self._fetchBasicThesaurusData()
-        if not self._antonyms:
-            if not self._advanced_thesaurus_api_fetched:
-                await self._fetchAdvancedThesaurusData()
-        if not self._antonyms or len(self._antonyms) < count:
-            await self._genAntonyms(count - len(self._antonyms))
+        await self._provide("antonyms", count)
         return self._antonyms
 
     async def sentences(
@@ -172,10 +268,7 @@ class Generator:
         Returns:
             Sentences using the word.
         """
-        if not self._sentences:
-            await self._fetchDictionaryData()
-        if len(self._sentences) < count:
-            await self._genSentences(count - len(self._sentences))
+        await self._provide("sentences", count)
         sentences = self._sentences[:count]
 
         if boldTag:
@@ -205,10 +298,7 @@ class Generator:
             punctuate: Whether to punctuate the definitions.
             capitaize: Whether to capitalize the definitions.
         """
-        if not self._definitions:
-            await self._fetchDictionaryData()
-        if len(self._definitions) < count:
-            await self._genDefinitions(count - len(self._definitions))
+        await self._provide("definitions", count)
         definitions = self._definitions[:count]
 
         if punctuate:
@@ -235,8 +325,7 @@ class Generator:
             capitalize: Whether to capitalize the inspirational quotes.
             punctuate: Whether to punctuate the inspirational quotes.
         """
-        if not self._inspirationalQuotes:
-            await self._genInspirationalQuotes(count)
+        await self._provide("inspirationalQuotes", count)
 
         inspirationalQuotes = self._inspirationalQuotes[:count]
         if capitalize:
@@ -247,18 +336,21 @@ class Generator:
 
         return list(inspirationalQuotes)
 
-    async def rhymes(self, count: int = 1):
+    async def rhymes(self, count: int = 1, capitalize: bool = False):
         """
         Words that rhyme with the word.
 
         Args:
             count: The number of rhymes to return.
+            capitalize: Whether to capitalize the rhymes.
         """
-        if not self._rhymes:
-            await self._genRhymes(count)
-        else:
-            self._rhymes.extend(await self._genRhymes(count - len(self._rhymes)))
-        return self._rhymes
+        await self._provide("rhymes", count)
+        rhymes = self._rhymes[:count]
+
+        if capitalize:
+            return [formatting.capitalize(rhyme) for rhyme in rhymes]
+
+        return rhymes
 
     async def images(self, count: int = 1, dalleTemplate=None):
         """
@@ -271,39 +363,242 @@ class Generator:
                 single {prompt} placeholder, the prompt will be generated automatically
                 generated and slotted into the template.
         """
-        if not self._images:
-            await self._genImages(count, dalleTemplate=dalleTemplate)
-        if len(self._images) < count:
-            await self._genImages(
-                count - len(self._images), dalleTemplate=dalleTemplate
-            )
+        await self._provide("images", count, dalleTemplate=dalleTemplate)
         return self._images[:count]
 
     async def offensive(self) -> bool:
         """Whether the word is offensive or not."""
-        if self._offensive is None:
-            await self._fetchBasicThesaurusData()
-        if self._offensive is None:
-            await self._fetchAdvancedThesaurusData()
-        if self._offensive is None:
-            await self._genOffensive()
+        await self._provide("offensive")
         return self._offensive
 
+    def seed(self, field: str, items: list):
+        """
+        Start a list field off with items generated before.
+
+        Only the items the field is still short of are generated then, and the field
+        method returns the items it was seeded with first. Items the field already
+        holds, such as from a batched generation, follow the seeds.
+
+        Args:
+            field: The field, from `listFields`.
+            items: The unformatted items, as returned by `items`.
+        """
+        current = getattr(self, f"_{field}")
+        seeded = list(items)
+        if field == "images":
+            seeded.extend(current)
+        else:
+            self._merge(seeded, current)
+        current[:] = seeded
+
+    def items(self, field: str) -> list:
+        """
+        The unformatted items of a list field, in the order its method returns them.
+
+        Args:
+            field: The field, from `listFields`.
+
+        Returns:
+            The items generated so far.
+        """
+        return list(getattr(self, f"_{field}"))
+
+    def prefetch(self, fields: Iterable[str]):
+        """
+        Start fetching the cheapest source of each of the given fields.
+
+        The fetches run in the background, so that the sources every field starts
+        with are fetched in parallel instead of one after the other.
+
+        Args:
+            fields: The fields that are going to be generated.
+        """
+        for field in fields:
+            sources = list(filter(self._hasSource, fieldSources.get(field, ())))
+            if sources:
+                self._startSource(sources[0])
+
+    async def provideFromSources(self, counts: Mapping[str, int]) -> dict[str, int]:
+        """
+        Fill fields from their sources only, without falling back to GPT.
+
+        Batched generation runs this first, so that the batch only asks GPT for what
+        the cheaper sources cannot provide.
+
+        Args:
+            counts: The number of items each field needs, keyed by field.
+
+        Returns:
+            The number of items each field is still short of.
+        """
+        self.prefetch(counts)
+        return dict(
+            zip(
+                counts,
+                await asyncio.gather(
+                    *(
+                        self._provideFromSources(field, count)
+                        for field, count in counts.items()
+                    )
+                ),
+            )
+        )
+
+    async def _provide(self, field: str, count: int = 1, **genKwargs):
+        """
+        Fill a field from its sources, in cost order, until it holds enough.
+
+        Sources that fail are skipped. GPT is only asked for what is still missing
+        once every source has been tried.
+
+        Args:
+            field: The field to fill.
+            count: The number of items the field needs.
+            **genKwargs: Keyword arguments to pass to the field's GPT fallback.
+        """
+        missing = await self._provideFromSources(field, count)
+        if missing:
+            genField = getattr(self, f"_gen{field[0].upper()}{field[1:]}")
+            if field in listFields:
+                await genField(missing, **genKwargs)
+            else:
+                await genField(**genKwargs)
+
+    async def _provideFromSources(self, field: str, count: int = 1) -> int:
+        """
+        Fill a field from its sources, in cost order, until it holds enough.
+
+        Returns:
+            The number of items the field is still short of.
+        """
+        for source in filter(self._hasSource, fieldSources[field]):
+            if not self._missing(field, count):
+                break
+            try:
+                await self._fetchSource(source)
+            except Exception as error:
+                logger.debug("Source %s failed for %r: %r", source, self.word, error)
+        return self._missing(field, count)
+
+    def _hasSource(self, source: str) -> bool:
+        """Whether a source is available, which offline ones are if they were given."""
+        return source not in localSources or getattr(self, source) is not None
+
+    def _missing(self, field: str, count: int = 1) -> int:
+        """The number of items a field is short of."""
+        value = getattr(self, f"_{field}")
+        if field in listFields:
+            return max(0, count - len(value))
+        return int(value is None)
+
+    def _sourceFetchers(self) -> dict[str, Callable[[], Awaitable[dict]]]:
+        """The functions that fetch and store the data of each upstream source."""
+        return {
+            "lexicon": self._lookupLexiconData,
+            "rhymeIndex": self._lookupRhymeIndexData,
+            "dictionary": self._requestDictionaryData,
+            "basicThesaurus": lambda: self._fetchThesaurusData(
+                self.apiUrls["basicThesaurus"], keys.BASIC_WEBSTER_THESAURUS
+            ),
+            "advancedThesaurus": lambda: self._fetchThesaurusData(
+                self.apiUrls["advancedThesaurus"], keys.ADVANCED_WEBSTER_THESAURUS
+            ),
+            "rhymezone": lambda: self._fetchRhymeData(
+                self.apiUrls["rhymezone"], "datamuse"
+            ),
+            "rhymebrain": lambda: self._fetchRhymeData(
+                self.apiUrls["rhymebrain"], "rhymebrain"
+            ),
+        }
+
+    def _startSource(self, source: str) -> asyncio.Future[dict]:
+        """
+        Start fetching an upstream source, unless it was already started.
+
+        Args:
+            source: The name of the upstream source.
+
+        Returns:
+            The fetch, shared by every user of the source.
+        """
+        if source not in self._sources:
+            future = asyncio.ensure_future(self._sourceFetchers()[source]())
+            # Failures are reported to whoever awaits the source, if anyone does.
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._sources[source] = future
+        return self._sources[source]
+
+    async def _fetchSource(self, source: str) -> dict:
+        """
+        Fetch data from an upstream source at most once.
+
+        The first caller starts the fetch, and every caller, concurrent or later,
+        awaits that same fetch and gets its result (or error).
+
+        Args:
+            source: The name of the upstream source.
+
+        Returns:
+            The source's data.
+        """
+        # Cancelling one caller must not cancel the fetch the others await.
+        return await asyncio.shield(self._startSource(source))
+
+    def _merge(self, items: list[str], newItems: Iterable[str]) -> list[str]:
+        """
+        Add items to a field's items, skipping blanks, duplicates and the word itself.
+
+        Args:
+            items: The field's items, which are added to in place.
+            newItems: The items to add.
+
+        Returns:
+            The items that were added.
+        """
+        seen = {item.lower() for item in items} | {self.word.lower()}
+        added = []
+        for item in newItems:
+            if item and item.lower() not in seen:
+                seen.add(item.lower())
+                items.append(item)
+                added.append(item)
+        return added
+
+    async def _lookupLexiconData(self):
+        """Look the word up in the offline lexicon and store its data."""
+        entry = self.lexicon.lookup(self.word)
+        if entry is None:
+            return {}
+
+        self._partOfSpeech = self._partOfSpeech or entry.partOfSpeech
+        self._pronunciation = self._pronunciation or entry.pronunciation
+        if self._offensive is None:
+            self._offensive = entry.offensive
+        return {
+            "partOfSpeech": entry.partOfSpeech,
+            "pronunciation": entry.pronunciation,
+            "offensive": entry.offensive,
+            # Lowercased like the dictionary API's data.
+            **{
+                field: self._merge(
+                    getattr(self, f"_{field}"), map(str.lower, getattr(entry, field))
+                )
+                for field in ("definitions", "sentences", "synonyms", "antonyms")
+            },
+            "rhymes": self._merge(self._rhymes, entry.rhymes),
+        }
+
+    async def _lookupRhymeIndexData(self):
+        """Look the word's rhymes up in the offline rhyme index and store them."""
+        return {"rhymes": self._merge(self._rhymes, self.rhymeIndex.rhymes(self.word))}
+
     async def _fetchBasicThesaurusData(self):
         """Fetch data from the basic thesaurus API and store it."""
-        fetchedData = await self._fetchThesaurusData(
-            BASIC_WEBSTER_THESAURUS, keys.BASIC_WEBSTER_THESAURUS
-        )
-        self._basic_thesaurus_api_fetched = True
-        return fetchedData
+        return await self._fetchSource("basicThesaurus")
 
     async def _fetchAdvancedThesaurusData(self):
         """Fetch data from the advanced thesaurus API and store it."""
-        fetchedData = await self._fetchThesaurusData(
-            ADVANCED_WEBSTER_THESAURUS, keys.ADVANCED_WEBSTER_THESAURUS
-        )
-        self._advanced_thesaurus_api_fetched = True
-        return fetchedData
+        return await self._fetchSource("advancedThesaurus")
 
     async def _fetchThesaurusData(self, apiUrl: str, key: str):
         """
@@ -313,63 +608,79 @@ class Generator:
             apiUrl: The URL of the thesaurus API.
             key: The API key for the specific thesaurus API.
         """
-        async with self.session.get(
-            f"{apiUrl}/{self.word}", params={"key": key}
-        ) as resp:
-            data = await resp.json()
-            synonyms = [synonym.lower() for synonym in data[0]["meta"]["syns"][0]]
-            antonyms = [antonym.lower() for antonym in data[0]["meta"]["ants"][0]]
-            self._synonyms.extend(synonyms)
-            self._antonyms.extend(antonyms)
-        return {"synonyms": synonyms, "antonyms": antonyms}
+        data = await self._getJson(
+            "webster", f"{apiUrl}/{self.word}", {"apiUrl": apiUrl}, {"key": key}
+        )
+        # Unknown words get a list of spelling suggestions instead of entries.
+        if not data or not isinstance(data[0], dict):
+            return {"synonyms": [], "antonyms": [], "offensive": None}
+
+        meta = data[0]["meta"]
+        synonyms = [synonym.lower() for synonym in next(iter(meta["syns"]), [])]
+        antonyms = [antonym.lower() for antonym in next(iter(meta["ants"]), [])]
+        synonyms = self._merge(self._synonyms, synonyms)
+        antonyms = self._merge(self._antonyms, antonyms)
+        offensive = meta.get("offensive")
+        if self._offensive is None and offensive is not None:
+            self._offensive = offensive
+        return {"synonyms": synonyms, "antonyms": antonyms, "offensive": offensive}
 
     async def _fetchRhymezoneData(self):
         """Fetch rhyming words with RhymeZone API."""
-        rhymes = await self._fetchRhymeData(RHYMEZONE_API)["rhymes"]
-        self._rhymezoneApiFetched = True
-        return {"rhymes": rhymes}
+        return await self._fetchSource("rhymezone")
 
     async def _fetchRhymebrainData(self):
         """Fetch rhyming words with Datamuse API."""
-        rhymes = await self._fetchRhymeData(RHYMEBRAIN_API)["rhymes"]
-        self._rhymebrainApiFetched = True
-        return {"rhymes": rhymes}
+        return await self._fetchSource("rhymebrain")
+
+    async def _fetchRhymeData(self, apiUrl: str, provider: str):
+        """
+        Fetch rhyming words with a rhyming API, best first, and store them.
 
-    async def _fetchRhymeData(self, apiUrl: str):
-        """Fetch rhyming words with a rhyming API."""
-        async with self.session.get(apiUrl) as resp:
-            rhymes = [word["word"].lower() for word in await resp.json()]
-        self._rhymes.extend(rhymes)
+        Args:
+            apiUrl: The URL of the rhyming API.
+            provider: The provider of the API, "datamuse" or "rhymebrain".
+        """
+        if provider == "datamuse":
+            params = {"rel_rhy": self.word}
+        else:
+            params = {"word": self.word}
+        data = await self._getJson(provider, apiUrl, {"apiUrl": apiUrl}, params)
+        data = sorted(data, key=lambda word: word.get("score", 0), reverse=True)
+        rhymes = self._merge(self._rhymes, [word["word"].lower() for word in data])
         return {"rhymes": rhymes}
 
     async def _fetchDictionaryData(self):
         """Fetch various facets of word data from a dictionary API."""
+        return await self._fetchSource("dictionary")
+
+    async def _requestDictionaryData(self):
+        """Request and store word data from the dictionary API."""
         origin = None
         definitions = []
         sentences = []
         synonyms = []
         antonyms = []
-        async with self.session.get(f"{DICTIONARY_API}/{self.word}") as resp:
-            data = (await resp.json())[0]
-            if "origin" in data:
-                origin = data["origin"].lower()
-            partOfSpeech = data["meanings"][0]["partOfSpeech"].lower()
-            for entry in data["meanings"]:
-                for meaning in entry["definitions"]:
-                    definitions.append(meaning["definition"].lower())
-                    synonyms.extend(map(lambda item: item.lower(), meaning["synonyms"]))
-                    antonyms.extend(map(lambda item: item.lower(), meaning["antonyms"]))
-                    if "example" in meaning and len(meaning["example"]).split(" ") < 14:
-                        sentences.append(meaning["example"].lower())
+        url = f"{self.apiUrls['dictionary']}/{self.word}"
+        data = (await self._getJson("dictionary", url))[0]
+        if "origin" in data:
+            origin = data["origin"].lower()
+        partOfSpeech = data["meanings"][0]["partOfSpeech"].lower()
+        for entry in data["meanings"]:
+            for meaning in entry["definitions"]:
+                definitions.append(meaning["definition"].lower())
+                synonyms.extend(map(lambda item: item.lower(), meaning["synonyms"]))
+                antonyms.extend(map(lambda item: item.lower(), meaning["antonyms"]))
+                if "example" in meaning and len(meaning["example"].split(" ")) < 14:
+                    sentences.append(meaning["example"].lower())
 
         if origin:
             self._origin = origin
-        self._partOfSpeech = partOfSpeech
-        self._definitions.extend(definitions)
-        self._sentences.extend(sentences)
-        self._synonyms.extend(synonyms)
-        self._antonyms.extend(antonyms)
-        self._dictionary_api_fetched = True
+        self._partOfSpeech = self._partOfSpeech or partOfSpeech
+        definitions = self._merge(self._definitions, definitions)
+        sentences = self._merge(self._sentences, sentences)
+        synonyms = self._merge(self._synonyms, synonyms)
+        antonyms = self._merge(self._antonyms, antonyms)
 
         return {
             "origin": origin,
@@ -384,41 +695,35 @@ class Generator:
         """Generate synonyms using GPT."""
         synonyms = await self._genTextField("synonyms", {"count": count})
         synonyms = [synonym.strip() for synonym in synonyms.split("\n")]
-        synonyms = filter(lambda synonym: synonym != self.word, synonyms)
-        synonyms = map(lambda synonym: synonym.lower(), synonyms)
-        self._synonyms.extend(synonyms)
+        synonyms = self._merge(self._synonyms, map(str.lower, synonyms))
         return {"synonyms": synonyms}
 
     async def _genAntonyms(self, count: int):
         """Generate antonyms using GPT."""
         antonyms = await self._genTextField("antonyms", {"count": count})
         antonyms = [antonym.strip() for antonym in antonyms.split("\n")]
-        antonyms = filter(lambda antonym: antonym != self.word, antonyms)
-        antonyms = map(lambda antonym: antonym.lower(), antonyms)
-        self._antonyms.extend(antonyms)
+        antonyms = self._merge(self._antonyms, map(str.lower, antonyms))
         return {"antonyms": antonyms}
 
     async def _genRhymes(self, count: int):
         """Generate rhyming words using GPT."""
         rhymes = await self._genTextField("rhyming", {"count": count})
         rhymes = [rhyme.strip() for rhyme in rhymes.split("\n")]
-        rhymes = filter(lambda rhyme: rhyme != self.word, rhymes)
-        rhymes = map(lambda rhyme: rhyme.lower(), rhymes)
-        self._rhymes.extend(rhymes)
+        rhymes = self._merge(self._rhymes, map(str.lower, rhymes))
         return {"rhymes": rhymes}
 
     async def _genDefinitions(self, count: int = 1):
         """Generate word definitions using GPT."""
         definitions = await self._genTextField("definitions", {"count": count})
         definitions = [definition.strip()[3:] for definition in definitions.split("\n")]
-        self._definitions.extend(definitions)
+        definitions = self._merge(self._definitions, definitions)
         return {"definitions": definitions}
 
     async def _genSentences(self, count: int = 1):
         """Generate sentence(s) using the word using GPT."""
         sentences = await self._genTextField("sentences", {"count": count})
         sentences = [sentence.strip() for sentence in sentences.split("\n")]
-        self._sentences.extend(sentences)
+        sentences = self._merge(self._sentences, sentences)
         return {"sentences": sentences}
 
     async def _genPronunciation(self):
@@ -435,7 +740,7 @@ class Generator:
         """Generate inspirational quote(s) using GPT."""
         quotes = await self._genTextField("inspirationalQuotes", {"count": count})
         quotes = [quote.strip()[1:-1] for quote in quotes.split("\n")]
-        self._inspirationalQuotes.extend(quotes)
+        quotes = self._merge(self._inspirationalQuotes, quotes)
         return {"inspirationalQuotes": quotes}
 
     async def _genOrigin(self):
@@ -460,41 +765,89 @@ class Generator:
                 prompt itself will be used as the template. The template should
                 contain the word to generate images for as {word}.
         """
-        imagePrompts = await self._genTextField("dallePrompt", {"count": count+2})
-        imagePrompts = [
-            prompt.strip()[3:]
-            for prompt in imagePrompts.split("\n")
-        ]
-        imagePrompts = filter(bool, imagePrompts)
-        if dalleTemplate:
-            imagePrompts = [dalleTemplate.format(PROMPT=prompt) for prompt in imagePrompts]
-
-        # fmt: off
-        b64Images: list[str] = []
-        async with asyncio.TaskGroup() as taskGroup:
-            for imagePrompt in imagePrompts:
-                async def imageGen():
+        # Prompts may have been provided ahead of time by a batched generation.
+        imagePrompts = self._imagePrompts[:count]
+        del self._imagePrompts[:count]
+        if len(imagePrompts) < count:
+            generatedPrompts = await self._genTextField(
+                "dallePrompt", {"count": count - len(imagePrompts) + 2}
+            )
+            generatedPrompts = [
+                prompt.strip()[3:]
+                for prompt in generatedPrompts.split("\n")
+            ]
+            imagePrompts.extend(
+                list(filter(bool, generatedPrompts))[:count - len(imagePrompts)]
+            )
+        size = dalleSize
+
+        async def imageGen(imagePrompt: str) -> Image:
+            async def dalleGen() -> bytes:
+                async with self.limits.provider("dalle"):
                     dalleData = await dalleReq(
                         {
-                            "prompt": imagePrompt,
+                            "prompt": (
+                                dalleTemplate.format(PROMPT=imagePrompt)
+                                if dalleTemplate else imagePrompt
+                            ),
+                            "model": dalleModel,
                             "n": 1,
-                            "size": "1024x1024",
+                            "size": f"{size[0]}x{size[1]}",
                             "response_format": "b64_json",
                         },
                         self.session,
+                        client=self.openai,
                     )
-                    b64Images.append(dalleData)
-                taskGroup.create_task(imageGen())
-        # fmt: on
+                return base64.b64decode(dalleData)
 
-        images = []
-        for i, image in enumerate(b64Images):
-            image = Image(image, (1024, 1024), imagePrompts[i], dalleTemplate)
-            images.append(image)
+            path = await self.imageStore.fetch(
+                ImageStore.key(imagePrompt, dalleTemplate, size, dalleModel), dalleGen
+            )
+            return Image(path, size, imagePrompt, dalleTemplate)
+
+        async with asyncio.TaskGroup() as taskGroup:
+            tasks = [
+                taskGroup.create_task(imageGen(imagePrompt))
+                for imagePrompt in imagePrompts
+            ]
 
+        images = [task.result() for task in tasks]
         self._images.extend(images)
         return {"images": images}
 
+    def _applyBatch(self, data: dict):
+        """
+        Store field data generated ahead of time for several words at once.
+
+        Values that are missing or of the wrong type are ignored, so that the
+        respective fields are generated on their own later on.
+
+        Args:
+            data: The generated data, keyed by field name.
+        """
+
+        def strings(value) -> list[str]:
+            if not isinstance(value, list):
+                return []
+            return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+
+        for field in ("synonyms", "antonyms", "rhymes"):
+            words = map(str.lower, strings(data.get(field)))
+            self._merge(getattr(self, f"_{field}"), words)
+        for field in ("definitions", "sentences", "inspirationalQuotes"):
+            self._merge(getattr(self, f"_{field}"), strings(data.get(field)))
+        self._imagePrompts.extend(strings(data.get("imagePrompts")))
+
+        # Values the sources already provided are kept, since they are preferred.
+        partOfSpeech = data.get("partOfSpeech")
+        if self._partOfSpeech is None and isinstance(partOfSpeech, str):
+            self._partOfSpeech = partOfSpeech.strip().lower() or None
+        pronunciation = data.get("pronunciation")
+        if self._pronunciation is None and isinstance(pronunciation, str):
+            self._pronunciation = pronunciation.strip() or None
+        if self._offensive is None and isinstance(data.get("offensive"), bool):
+            self._offensive = data["offensive"]
+
     async def _genTextField(self, field: str, placeholders: dict = None):
         """
         Generate text data using GPT.
@@ -507,10 +860,52 @@ class Generator:
             The generated text data.
         """
         placeholders = placeholders or {}
-        gptReqData = aiPrompts[field]
-        for i, message in enumerate(gptReqData["messages"]):
-            gptReqData["messages"][i]["content"] = message["content"].format(
-                word=self.word,
-                **placeholders,
-            )
-        return await gptReq(gptReqData, self.session)
+        gptReqData = {
+            **aiPrompts[field],
+            "messages": [
+                {
+                    **message,
+                    "content": message["content"].format(word=self.word, **placeholders),
+                }
+                for message in aiPrompts[field]["messages"]
+            ],
+        }
+        async with self.limits.provider("gpt"):
+            return await gptReq(gptReqData, self.session, self.cache, self.openai)
+
+    async def _getJson(
+        self,
+        provider: str,
+        url: str,
+        request: dict | None = None,
+        params: dict | None = None,
+    ):
+        """
+        Fetch JSON data from an upstream API, through the limits and the cache.
+
+        Args:
+            provider: The name of the provider of the API.
+            url: The URL to fetch.
+            request: What identifies the request in the cache, besides the provider
+                and the word. Secrets such as API keys must be left out.
+            params: The query parameters of the request.
+
+        Returns:
+            The JSON data.
+        """
+
+        async def fetch():
+            async with self.limits.provider(provider):
+                with tracer.span("http", provider=provider, url=url) as span:
+                    async with self.session.get(url, params=params) as resp:
+                        span.set(status=resp.status)
+                        if resp.status == 429 or resp.status >= 500:
+                            resp.raise_for_status()
+                        span.set(bytes=len(await resp.read()))
+                        return await resp.json()
+
+        if self.cache is None:
+            return await fetch()
+        return await self.cache.fetch(
+            provider, {"word": self.word.strip().lower(), **(request or {})}, fetch
+        )
@@ -0,0 +1,372 @@
+"""
+Serve flashcards over HTTP, rendering them on demand.
+
+Run from the src directory, for example:
+
+    python -m flashcards.service --port 8080 --renderers 4
+
+Flashcards are then served at /cards/{style}/{word}.pdf and /cards/{style}/{word}.png,
+where PNGs take the optional side (front or back) and scale query parameters.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+import aiohttp
+from aiohttp import web
+
+from src.converter.pool import RendererPool
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.generator import Generator
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.cache import ResponseCache
+from src.flashcards.utils.images import ImageStore
+from src.flashcards.utils.lexicon import Lexicon
+from src.flashcards.utils.limits import Limits
+from src.flashcards.utils.openai import OpenAiClient
+from src.flashcards.utils.rhymes import RhymeIndex
+
+__all__ = ("FlashcardService", "LruCache", "main")
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The media type of each format flashcards are served in.
+mediaTypes = {"pdf": "application/pdf", "png": "image/png"}
+
+
+class LruCache(Generic[T]):
+    """
+    An in-memory cache that evicts the least recently used entries.
+
+    Args:
+        maxEntries: The number of entries above which entries are evicted.
+        maxBytes: The total size of the entries above which entries are evicted, if
+            any. An entry larger than this is not kept at all.
+        sizeOf: The size of an entry, in bytes, which is needed with maxBytes.
+
+    Attributes:
+        bytes: The total size of the entries, if they are sized.
+    """
+
+    def __init__(
+        self,
+        maxEntries: int,
+        maxBytes: int | None = None,
+        sizeOf: Callable[[T], int] | None = None,
+    ):
+        if maxBytes is not None and sizeOf is None:
+            raise ValueError("Caches limited in bytes need to size their entries.")
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.sizeOf = sizeOf
+        self.bytes = 0
+        self._entries: OrderedDict[Hashable, T] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: T | None = None) -> T | None:
+        """Get an entry, marking it as the most recently used."""
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: Hashable, value: T):
+        """Store an entry, evicting the least recently used ones if over size."""
+        if key in self._entries:
+            self._evict(key)
+        size = self.sizeOf(value) if self.sizeOf is not None else 0
+        if self.maxBytes is not None and size > self.maxBytes:
+            # Keeping it would evict everything else.
+            return
+        self._entries[key] = value
+        self.bytes += size
+        while len(self._entries) > self.maxEntries or (
+            self.maxBytes is not None and self.bytes > self.maxBytes
+        ):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Hashable):
+        value = self._entries.pop(key)
+        if self.sizeOf is not None:
+            self.bytes -= self.sizeOf(value)
+
+
+class FlashcardService:
+    """
+    A long-running HTTP service generating and rendering flashcards on demand.
+
+    Every flashcard shares one session, OpenAI client and set of provider limits,
+    and renders with a pool of browsers kept warm between requests. Concurrent
+    requests for the same flashcard share one generation, and concurrent requests
+    for the same rendering share one render. Generated flashcards and rendered files
+    are kept in LRU caches, and files are served with ETags, so clients can
+    revalidate them for free.
+
+    Args:
+        renderers: The number of browsers to render with. Flashcards are rendered on
+            a worker thread with the default engine if this is 0.
+        cacheSize: The number of flashcards, and of rendered files, to cache.
+        cacheBytes: The total size of the rendered files to cache, in bytes.
+        cache: The response cache of the upstream APIs, if any.
+        imageStore: The store of generated images.
+        lexicon: The offline lexicon consulted before the upstream APIs, if any.
+        rhymeIndex: The offline rhyme index consulted before the upstream APIs, if
+            any.
+        apiUrls: The base URLs of the upstream APIs, keyed by source, for the ones
+            that should not use the defaults. See `generator.defaultApiUrls`.
+        openaiKwargs: Keyword arguments for the OpenAI client, such as its base URL
+            and rate limits.
+
+    Attributes:
+        stats: The number of generations, renders, cache hits and coalesced
+            requests served.
+    """
+
+    def __init__(
+        self,
+        renderers: int = 2,
+        cacheSize: int = 256,
+        cacheBytes: int = 256 * 1024 * 1024,
+        cache: ResponseCache | None = None,
+        imageStore: ImageStore | None = None,
+        lexicon: Lexicon | None = None,
+        rhymeIndex: RhymeIndex | None = None,
+        apiUrls: dict[str, str] | None = None,
+        openaiKwargs: dict[str, object] | None = None,
+    ):
+        self.renderers = renderers
+        self.cache = cache
+        self.imageStore = imageStore or ImageStore()
+        self.lexicon = lexicon
+        self.rhymeIndex = rhymeIndex
+        self.apiUrls = apiUrls
+        self.openaiKwargs = openaiKwargs or {}
+        self.limits = Limits()
+        self.stats: Counter[str] = Counter()
+
+        self.session: aiohttp.ClientSession | None = None
+        self.openai: OpenAiClient | None = None
+        self.pool: RendererPool | None = None
+        self._flashcards: LruCache[Flashcard] = LruCache(cacheSize)
+        self._files: LruCache[tuple[bytes, str]] = LruCache(
+            cacheSize, cacheBytes, lambda file: len(file[0])
+        )
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def app(self) -> web.Application:
+        """The web application of the service, which starts and stops it."""
+        app = web.Application()
+        app.add_routes(
+            [
+                web.get("/health", self._health),
+                web.get("/cards/{style}/{word}.{format}", self._card),
+            ]
+        )
+        app.on_startup.append(lambda _: self.start())
+        app.on_cleanup.append(lambda _: self.stop())
+        return app
+
+    async def start(self):
+        """Open the shared session, and launch the renderer pool."""
+        if self.session is not None:
+            return
+        # Connections are bounded by the provider limits instead of the connector.
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        self.openai = OpenAiClient(self.session, **self.openaiKwargs)
+        if self.renderers:
+            self.pool = RendererPool(self.renderers)
+            await self.pool.start()
+
+    async def stop(self):
+        """Close the shared session, and shut the renderer pool down."""
+        if self.pool is not None:
+            await self.pool.stop()
+            self.pool = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def flashcard(self, word: str, styleName: str) -> Flashcard:
+        """
+        A generated flashcard, from the cache or generated once for every caller.
+
+        Args:
+            word: The word.
+            styleName: The name of the style.
+
+        Returns:
+            The flashcard.
+        """
+        key = (word, styleName)
+        flashcard = self._flashcards.get(key)
+        if flashcard is not None:
+            return flashcard
+
+        async def generate() -> Flashcard:
+            flashcard = Flashcard(word, styles[styleName])
+            await flashcard.generate(
+                generator=Generator(
+                    word,
+                    self.session,
+                    limits=self.limits,
+                    cache=self.cache,
+                    imageStore=self.imageStore,
+                    openai=self.openai,
+                    apiUrls=self.apiUrls,
+                    lexicon=self.lexicon,
+                    rhymeIndex=self.rhymeIndex,
+                )
+            )
+            self.stats["generations"] += 1
+            self._flashcards.put(key, flashcard)
+            return flashcard
+
+        return await self._coalesce(("generate", *key), generate)
+
+    async def render(
+        self,
+        word: str,
+        styleName: str,
+        format: str = "pdf",
+        back: bool = False,
+        scale: float = 1,
+    ) -> tuple[bytes, str]:
+        """
+        A rendered flashcard, from the cache or rendered once for every caller.
+
+        Args:
+            word: The word.
+            styleName: The name of the style.
+            format: The format, "pdf" for both sides, or "png" for one.
+            back: Whether to render the back instead of the front, for PNGs.
+            scale: The number of PNG pixels per flashcard pixel, for PNGs.
+
+        Returns:
+            The file, and its ETag.
+        """
+        key = (word, styleName, format, back, scale)
+        if (cached := self._files.get(key)) is not None:
+            self.stats["cacheHits"] += 1
+            return cached
+
+        async def render() -> tuple[bytes, str]:
+            flashcard = await self.flashcard(word, styleName)
+            if format == "pdf":
+                data = await flashcard.renderAsync(self.pool)
+            else:
+                data = await flashcard.renderPngAsync(back, scale, self.pool)
+            self.stats["renders"] += 1
+            rendered = (data, f'"{hashlib.sha256(data).hexdigest()}"')
+            self._files.put(key, rendered)
+            return rendered
+
+        return await self._coalesce(("render", *key), render)
+
+    async def _coalesce(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run work once for every concurrent caller with the same key.
+
+        Callers that are cancelled, such as by a client disconnecting, do not cancel
+        the work the others await.
+        """
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.ensure_future(factory())
+        self._inflight[key] = future
+
+        def done(_):
+            del self._inflight[key]
+            # Failures are reported to whoever awaits the work, if anyone does.
+            future.cancelled() or future.exception()
+
+        future.add_done_callback(done)
+        return await asyncio.shield(future)
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", **self.stats})
+
+    async def _card(self, request: web.Request) -> web.Response:
+        styleName = request.match_info["style"]
+        word = request.match_info["word"].strip()
+        format = request.match_info["format"]
+        if styleName not in styles or format not in mediaTypes:
+            raise web.HTTPNotFound()
+        if not word or len(word) > 64:
+            raise web.HTTPBadRequest(text="Words must be 1 to 64 characters long.")
+
+        side = request.query.get("side", "front")
+        try:
+            scale = float(request.query.get("scale", 1))
+        except ValueError:
+            scale = 0
+        if side not in ("front", "back") or not 0 < scale <= 4:
+            raise web.HTTPBadRequest(text="Invalid side or scale.")
+
+        try:
+            data, etag = await self.render(
+                word, styleName, format, side == "back", scale
+            )
+        except Exception:
+            # Errors may hold upstream URLs and local paths, so they are only logged.
+            logger.exception("Failed to render %r in %s.", word, styleName)
+            raise web.HTTPBadGateway(text="Failed to generate or render the flashcard.")
+
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+        ifNoneMatch = request.headers.get("If-None-Match", "")
+        matches = {tag.strip() for tag in ifNoneMatch.split(",")}
+        if etag in matches or "*" in matches:
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=data, content_type=mediaTypes[format], headers=headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="service", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--renderers",
+        type=int,
+        default=2,
+        help="The number of browsers to render with, or 0 for the default engine.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="The number of flashcards, and of rendered files, to cache.",
+    )
+    parser.add_argument(
+        "--cache-megabytes",
+        type=int,
+        default=256,
+        help="The total size of the rendered files to cache.",
+    )
+    parser.add_argument("--cache", help="The response cache database to use.")
+    parser.add_argument("--lexicon", help="The offline lexicon to use.")
+    parser.add_argument("--rhymes", help="The offline rhyme index to use.")
+    args = parser.parse_args()
+
+    service = FlashcardService(
+        args.renderers,
+        args.cache_size,
+        args.cache_megabytes * 1024 * 1024,
+        cache=ResponseCache(args.cache) if args.cache else None,
+        lexicon=Lexicon(args.lexicon) if args.lexicon else None,
+        rhymeIndex=RhymeIndex(args.rhymes) if args.rhymes else None,
+    )
+    web.run_app(service.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
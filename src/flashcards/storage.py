@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+from typing import Iterator
+
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.utils.images import BlobStore
+
+__all__ = ("CardReader", "CardWriter", "truncatePartialLine")
+
+logger = logging.getLogger(__name__)
+
+
+class CardWriter:
+    """
+    Saves generated flashcards in bulk, as JSON lines, to render them later.
+
+    Each line is a flashcard in the format of `Flashcard.toDict`, and images are
+    stored once each in the blobs directory next to the file. Lines are flushed as
+    they are written, so the flashcards written before a crash can still be read. A
+    last line cut short by a crash is removed before appending, so it is not merged
+    with the next flashcard.
+
+    Args:
+        path: The path of the JSON lines file, which is appended to.
+
+    Attributes:
+        cards: The number of flashcards written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.cards = 0
+        self.blobs = BlobStore(os.path.join(os.path.dirname(path), "blobs"))
+        truncatePartialLine(path)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __enter__(self) -> "CardWriter":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def write(self, flashcard: Flashcard):
+        """Save a flashcard."""
+        line = json.dumps(flashcard.toDict(self.blobs), ensure_ascii=False)
+        self._file.write(f"{line}\n")
+        self._file.flush()
+        self.cards += 1
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+
+class CardReader:
+    """
+    Loads flashcards saved with `CardWriter`, in the order they were written.
+
+    A last line cut short, such as by a crash while it was written, is skipped.
+
+    Args:
+        path: The path of the JSON lines file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.blobs = BlobStore(os.path.join(os.path.dirname(path), "blobs"))
+
+    def __iter__(self) -> Iterator[Flashcard]:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    if line.endswith("\n"):
+                        raise
+                    logger.warning("Skipping truncated flashcard in %s.", self.path)
+                    continue
+                yield Flashcard.fromDict(data, self.blobs)
+
+
+def truncatePartialLine(path: str, chunkSize: int = 64 * 1024):
+    """Cut a file back to its last newline, removing a line cut short by a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - chunkSize)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            logger.warning("Removing a truncated last line from %s.", path)
+            f.truncate(position)
@@ -1,14 +1,39 @@
+import functools
 import json
-from dataclasses import dataclass
+import math
+import os
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import dataclass, field
 
 import jinja2
+import jinja2.meta
 
-__all__ = ("styles",)
+from src.flashcards.utils.formatting import camelCaseToSnakeCase
+from src.flashcards.utils.images import resample
+from src.flashcards.utils.structs import Image
 
-jinjaEnv = jinja2.Environment(
-    loader=jinja2.PackageLoader("flashcards", "styles"),
-    autoescape=jinja2.select_autoescape(),
-)
+__all__ = ("styles", "Style", "StyleRegistry")
+
+stylesPath = os.path.dirname(os.path.abspath(__file__))
+bytecodeCachePath = os.path.join(".cache", "jinja")
+
+
+@functools.cache
+def jinjaEnv() -> jinja2.Environment:
+    """The environment styles' templates are compiled in, created on first use."""
+    os.makedirs(bytecodeCachePath, exist_ok=True)
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(stylesPath),
+        autoescape=jinja2.select_autoescape(),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(bytecodeCachePath),
+        auto_reload=False,
+    )
+
+
+@functools.cache
+def placeholderPrefix(fieldName: str) -> str:
+    """The prefix of the template placeholders of a field, e.g. PART_OF_SPEECH."""
+    return camelCaseToSnakeCase(fieldName).upper()
 
 
 @dataclass(frozen=True, slots=True)
@@ -22,6 +47,11 @@ class Style:
         back: The back template of the flashcard.
         size: The size of the flashcard, as a tuple of (width, height).
         config: The configuration of the style.
+        backend: The name of the backend to render the style with.
+        variables: The placeholders used by the style's templates.
+        imageOptions: How images are resampled before they are embedded, with the
+            resolution to fit the card at ("dpi"), and the "format" and "quality" to
+            recompress to. Images are embedded as they are if this is empty.
     """
 
     name: str
@@ -29,6 +59,12 @@ class Style:
     back: jinja2.Template
     size: tuple[int, int]
     config: dict[str, dict]
+    backend: str = "chrome"
+    variables: frozenset[str] = frozenset()
+    imageOptions: dict[str, object] = field(default_factory=dict)
+    _slots: dict[str, tuple[str, ...]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
 
     @classmethod
     def fromName(cls, name: str) -> "Style":
@@ -41,17 +77,164 @@ class Style:
         Returns:
             The style.
         """
-        with open(f"flashcards/styles/{name}/config.json") as f:
+        with open(os.path.join(stylesPath, name, "config.json")) as f:
             styleConfig = json.load(f)
+        renderConfig = styleConfig.get("render", {})
+
+        env = jinjaEnv()
+        variables = set()
+        for side in ("front", "back"):
+            source = env.loader.get_source(env, f"{name}/{side}.svg")[0]
+            variables |= jinja2.meta.find_undeclared_variables(env.parse(source))
+
         return cls(
             name=name,
-            front=jinjaEnv.get_template(f"{name}/front.svg"),
-            back=jinjaEnv.get_template(f"{name}/back.svg"),
+            front=env.get_template(f"{name}/front.svg"),
+            back=env.get_template(f"{name}/back.svg"),
             size=(styleConfig["size"]["width"], styleConfig["size"]["height"]),
             config=styleConfig["generation"],
+            backend=renderConfig.get("backend", "chrome"),
+            variables=frozenset(variables),
+            imageOptions=renderConfig.get("images", {}),
+        )
+
+    @property
+    def imageSize(self) -> tuple[int, int]:
+        """
+        The largest size images are embedded at, in pixels.
+
+        This is the size of the whole card at the resolution of the image options,
+        with one unit of the card's size being a point (1/72 inch).
+        """
+        dpi = self.imageOptions.get("dpi", 300)
+        return math.ceil(self.size[0] * dpi / 72), math.ceil(self.size[1] * dpi / 72)
+
+    def slots(self, fieldName: str) -> tuple[str, ...]:
+        """
+        The placeholders the templates have for a field, in item order.
+
+        For example, a style showing three synonyms has ("SYNONYMS_1", "SYNONYMS_2",
+        "SYNONYMS_3") for "synonyms". Fields that the templates do not show have no
+        placeholders. The result is computed once per field.
+
+        Args:
+            fieldName: The name of the field.
+
+        Returns:
+            The placeholders.
+        """
+        if fieldName not in self._slots:
+            prefix = placeholderPrefix(fieldName)
+            slots = []
+            while f"{prefix}_{len(slots) + 1}" in self.variables:
+                slots.append(f"{prefix}_{len(slots) + 1}")
+            self._slots[fieldName] = tuple(slots)
+        return self._slots[fieldName]
+
+    def templateFields(
+        self,
+        fields: dict[str, object],
+        assetUrl: Callable[[str], str] | None = None,
+        **kwargs,
+    ) -> dict[str, str]:
+        """
+        The placeholder values of the templates for the given fields.
+
+        Only the items that the templates show are converted to strings. Images are
+        resampled according to the image options first.
+
+        Args:
+            fields: The values of the fields, keyed by field name. Values that are
+                lists fill a placeholder per item.
+            assetUrl: Gives the URL to refer to an image file by, such as
+                `Backend.assetUrl`. Images are inlined as data URIs if this is None.
+            **kwargs: Extra placeholder values, which are overridden by fields.
+
+        Returns:
+            The placeholder values.
+        """
+        templateFields = dict(kwargs)
+        for fieldName, value in fields.items():
+            slots = self.slots(fieldName)
+            if slots:
+                items = value if isinstance(value, list) else (value,)
+                templateFields.update(
+                    (slot, self._placeholderValue(item, assetUrl))
+                    for slot, item in zip(slots, items)
+                )
+        return templateFields
+
+    def render(
+        self,
+        fields: dict[str, object],
+        assetUrl: Callable[[str], str] | None = None,
+        **kwargs,
+    ) -> tuple[str, str]:
+        """
+        Render both sides of the style.
+
+        The placeholder values are computed once and shared by both sides.
+
+        Args:
+            fields: The values of the fields. See `templateFields`.
+            assetUrl: Gives the URL to refer to an image file by. See
+                `templateFields`.
+            **kwargs: Extra placeholder values. See `templateFields`.
+
+        Returns:
+            The rendered front and back.
+        """
+        templateFields = self.templateFields(fields, assetUrl, **kwargs)
+        return self.front.render(templateFields), self.back.render(templateFields)
+
+    def _placeholderValue(
+        self, value: object, assetUrl: Callable[[str], str] | None = None
+    ) -> str:
+        """Convert an item of a field to the value of its placeholder."""
+        if not isinstance(value, Image):
+            return str(value)
+        if self.imageOptions:
+            value = resample(
+                value,
+                self.imageSize,
+                self.imageOptions.get("format", "jpeg"),
+                self.imageOptions.get("quality", 85),
+            )
+        return assetUrl(value.path) if assetUrl is not None else str(value)
+
+
+class StyleRegistry(Mapping[str, Style]):
+    """
+    The available styles, keyed by name.
+
+    Styles are the directories of the styles directory that have a config.json.
+    Each style is only loaded, and its templates compiled, when it is first used.
+
+    Args:
+        path: The directory to discover styles in.
+    """
+
+    def __init__(self, path: str = stylesPath):
+        self.path = path
+        self._styles: dict[str, Style] = {}
+
+    def __getitem__(self, name: str) -> Style:
+        if name not in self._styles:
+            if name not in self:
+                raise KeyError(name)
+            self._styles[name] = Style.fromName(name)
+        return self._styles[name]
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and os.path.isfile(
+            os.path.join(self.path, name, "config.json")
         )
 
+    def __iter__(self) -> Iterator[str]:
+        return iter(sorted(name for name in os.listdir(self.path) if name in self))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
 
-styles = {
-    "watercolor": Style.fromName("watercolor"),
-}
+styles = StyleRegistry()
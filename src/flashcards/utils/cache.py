@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+__all__ = ("CacheMissError", "ResponseCache")
+
+_missing = object()
+
+
+class CacheMissError(Exception):
+    """
+    Raised when an offline cache does not hold a requested response.
+    """
+
+    pass
+
+
+class ResponseCache:
+    """
+    A persistent cache of upstream API responses.
+
+    Responses are stored in an SQLite database, keyed by the endpoint they came from
+    and the normalized request that produced them, so identical requests made by
+    later runs are answered from disk.
+
+    Args:
+        path: The path of the database file.
+        ttl: The number of seconds responses stay fresh for, or None to keep them
+            until they are evicted.
+        maxBytes: The total size of the stored responses above which the least
+            recently used ones are evicted.
+        offline: Whether the cache is read-only. Offline caches never store
+            responses, and raise CacheMissError instead of fetching missing ones.
+
+    Attributes:
+        hits: The number of hits for each endpoint.
+        misses: The number of misses for each endpoint.
+    """
+
+    def __init__(
+        self,
+        path: str = ".cache/responses.sqlite",
+        ttl: float | None = 30 * 24 * 60 * 60,
+        maxBytes: int = 1024 * 1024 * 1024,
+        offline: bool = False,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.maxBytes = maxBytes
+        self.offline = offline
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, endpoint TEXT, value BLOB, size INTEGER, "
+            "expires REAL, accessed REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    @staticmethod
+    def key(endpoint: str, request: object) -> str:
+        """
+        The key of a request.
+
+        Args:
+            endpoint: The name of the endpoint the request is made to.
+            request: The JSON-serializable request. Mappings are compared regardless
+                of their key order.
+
+        Returns:
+            The key.
+        """
+        normalized = json.dumps(
+            [endpoint, request], sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, endpoint: str, request: object, default: object = None) -> object:
+        """
+        Get a stored response, without counting a hit or a miss.
+
+        Args:
+            endpoint: The name of the endpoint the request is made to.
+            request: The JSON-serializable request.
+            default: The value to return if no fresh response is stored.
+
+        Returns:
+            The response.
+        """
+        key = self.key(endpoint, request)
+        row = self._db.execute(
+            "SELECT value, expires FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+
+        value, expires = row
+        now = time.time()
+        if expires is not None and expires < now:
+            if not self.offline:
+                self._delete(key)
+            return default
+
+        if not self.offline:
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(value)
+
+    def set(self, endpoint: str, request: object, value: object):
+        """
+        Store a response.
+
+        Args:
+            endpoint: The name of the endpoint the request is made to.
+            request: The JSON-serializable request.
+            value: The JSON-serializable response.
+        """
+        if self.offline:
+            raise RuntimeError("Cannot store responses in an offline cache.")
+
+        key = self.key(endpoint, request)
+        value = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        expires = now + self.ttl if self.ttl is not None else None
+
+        self._delete(key)
+        self._db.execute(
+            "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (key, endpoint, value, len(value), expires, now),
+        )
+        self._size += len(value)
+        self._evict()
+
+    async def fetch(
+        self,
+        endpoint: str,
+        request: object,
+        fetcher: Callable[[], Awaitable[object]],
+    ) -> object:
+        """
+        Get a response from the cache, or fetch and store it on a miss.
+
+        Args:
+            endpoint: The name of the endpoint the request is made to.
+            request: The JSON-serializable request.
+            fetcher: Fetches the JSON-serializable response of the request.
+
+        Returns:
+            The response.
+
+        Raises:
+            CacheMissError: The cache is offline and the response is not stored.
+        """
+        value = self.get(endpoint, request, _missing)
+        if value is not _missing:
+            self.hits[endpoint] += 1
+            return value
+
+        self.misses[endpoint] += 1
+        if self.offline:
+            raise CacheMissError(endpoint, request)
+
+        value = await fetcher()
+        self.set(endpoint, request, value)
+        return value
+
+    def clear(self):
+        """Remove every stored response."""
+        self._db.execute("DELETE FROM responses")
+        self._size = 0
+
+    def _delete(self, key: str):
+        """Remove a stored response."""
+        row = self._db.execute(
+            "DELETE FROM responses WHERE key = ? RETURNING size", (key,)
+        ).fetchone()
+        if row is not None:
+            self._size -= row[0]
+
+    def _evict(self):
+        """Remove expired responses, then least recently used ones until in size."""
+        if self._size <= self.maxBytes:
+            return
+
+        self._db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed")
+        evicted = []
+        for key, size in rows:
+            if self._size <= self.maxBytes:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
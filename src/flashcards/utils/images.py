@@ -0,0 +1,244 @@
+import asyncio
+import dataclasses
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from typing import Awaitable, Callable
+
+import PIL.Image
+
+from src.flashcards.utils.structs import Image
+
+__all__ = ("BlobStore", "ImageStore", "imageFormats", "resample", "sharedImageStore")
+
+# The file extension of each format images can be recompressed to.
+imageFormats = {"jpeg": "jpg", "webp": "webp", "png": "png"}
+
+
+class ImageStore:
+    """
+    A persistent store of generated images.
+
+    Images are stored as files named after the hash of what they were generated
+    from, so an image is only ever generated once for the same prompt, template and
+    size. Concurrent requests for the same image on the same event loop share a
+    single generation.
+
+    Args:
+        path: The directory to store the images in.
+    """
+
+    def __init__(self, path: str = ".cache/images"):
+        self.root = path
+        self._inflight: dict[
+            tuple[asyncio.AbstractEventLoop, str], asyncio.Future[str]
+        ] = {}
+
+    @staticmethod
+    def key(
+        prompt: str,
+        dalleTemplate: str | None,
+        size: tuple[int, int],
+        model: str | None = None,
+    ) -> str:
+        """
+        The key of an image.
+
+        Args:
+            prompt: The prompt the image was generated from.
+            dalleTemplate: The template the prompt was slotted into, if any.
+            size: The size of the image.
+            model: The model the image was generated with, if known.
+
+        Returns:
+            The key.
+        """
+        normalized = json.dumps([prompt, dalleTemplate, list(size), model])
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def path(self, key: str, extension: str = "png") -> str:
+        """The path an image is stored at."""
+        return os.path.join(self.root, key[:2], f"{key}.{extension}")
+
+    def has(self, key: str, extension: str = "png") -> bool:
+        """Whether an image is stored."""
+        return os.path.exists(self.path(key, extension))
+
+    def get(self, key: str, extension: str = "png") -> bytes:
+        """Read a stored image."""
+        with open(self.path(key, extension), "rb") as f:
+            return f.read()
+
+    def put(self, key: str, data: bytes, extension: str = "png") -> str:
+        """
+        Store an image.
+
+        Args:
+            key: The key of the image.
+            data: The encoded image.
+            extension: The file extension of the image's format.
+
+        Returns:
+            The path the image was stored at.
+        """
+        path = self.path(key, extension)
+        _writeAtomically(path, data)
+        return path
+
+    async def fetch(self, key: str, generator: Callable[[], Awaitable[bytes]]) -> str:
+        """
+        Get the path of a stored image, generating and storing it if it is missing.
+
+        Args:
+            key: The key of the image.
+            generator: Generates the encoded PNG image.
+
+        Returns:
+            The path the image is stored at.
+        """
+        if self.has(key):
+            return self.path(key)
+        loop = asyncio.get_running_loop()
+        if (loop, key) in self._inflight:
+            return await asyncio.shield(self._inflight[loop, key])
+
+        future = loop.create_future()
+        self._inflight[loop, key] = future
+        try:
+            path = self.put(key, await generator())
+        except BaseException as error:
+            future.set_exception(error)
+            future.exception()  # Mark as retrieved when nobody else awaits it.
+            raise
+        else:
+            future.set_result(path)
+            return path
+        finally:
+            del self._inflight[loop, key]
+
+
+# The store of generated images used by everything not given one of its own.
+sharedImageStore = ImageStore()
+
+
+class BlobStore:
+    """
+    A store of files named after the hash of their contents.
+
+    Saved flashcards refer to their images by name in a blob store, so that they can
+    be moved and shared along with it, and images shared by several flashcards are
+    only stored once.
+
+    Args:
+        path: The directory to store the files in.
+    """
+
+    def __init__(self, path: str):
+        self.root = path
+
+    def path(self, name: str) -> str:
+        """The path a file is stored at."""
+        return os.path.join(self.root, name)
+
+    def put(self, path: str) -> str:
+        """
+        Store a copy of a file, unless an identical one is stored.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The name of the stored file.
+        """
+        key = _hashFile(path)
+        name = f"{key[:2]}/{key}{os.path.splitext(path)[1]}"
+
+        storedPath = self.path(name)
+        if not os.path.exists(storedPath):
+            os.makedirs(os.path.dirname(storedPath), exist_ok=True)
+            temporaryPath = _temporaryPath(storedPath)
+            try:
+                os.link(path, temporaryPath)
+            except OSError:
+                shutil.copyfile(path, temporaryPath)
+            os.replace(temporaryPath, storedPath)
+        return name
+
+
+def resample(
+    image: Image,
+    maxSize: tuple[int, int],
+    format: str = "jpeg",
+    quality: int = 85,
+    store: ImageStore | None = None,
+) -> Image:
+    """
+    Downscale and recompress an image, for embedding it at a given size.
+
+    The image is shrunk to fit within the maximum size, keeping its aspect ratio, but
+    never enlarged. The result is stored in the resampled directory of the image
+    store, named after the hash of the original and the size, format and quality, so
+    every image is only resampled once for them, and the original's directory, such
+    as the blob store of a saved deck, is left as it is.
+
+    Args:
+        image: The image.
+        maxSize: The maximum size of the result in pixels, as (width, height).
+        format: The format of the result, from `imageFormats`.
+        quality: The quality of the result, from 1 to 100. Ignored for PNGs.
+        store: The image store to keep the result in. `sharedImageStore` is used if
+            this is None.
+
+    Returns:
+        The resampled image.
+    """
+    if format not in imageFormats:
+        raise ValueError("Unknown image format.", format)
+    width, height = image.size
+    scale = min(1, maxSize[0] / width, maxSize[1] / height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    store = store or sharedImageStore
+    normalized = json.dumps([_hashFile(image.path), list(size), format, quality])
+    key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    extension = imageFormats[format]
+    path = os.path.join(store.root, "resampled", key[:2], f"{key}.{extension}")
+    if not os.path.exists(path):
+        with PIL.Image.open(image.path) as source:
+            resized = source.resize(size, PIL.Image.LANCZOS)
+        # JPEGs have no transparency, so it is flattened onto white.
+        if format == "jpeg" and resized.mode not in ("RGB", "L"):
+            background = PIL.Image.new("RGB", resized.size, "white")
+            background.paste(resized, mask=resized.convert("RGBA").getchannel("A"))
+            resized = background
+
+        data = io.BytesIO()
+        resized.save(data, format.upper(), quality=quality, optimize=True)
+        _writeAtomically(path, data.getvalue())
+    return dataclasses.replace(image, path=path, size=size)
+
+
+def _hashFile(path: str) -> str:
+    """The SHA-256 hash of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _writeAtomically(path: str, data: bytes):
+    """Write a file, so that readers never see it partially written."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporaryPath = _temporaryPath(path)
+    with open(temporaryPath, "wb") as f:
+        f.write(data)
+    os.replace(temporaryPath, path)
+
+
+def _temporaryPath(path: str) -> str:
+    """A path to write a file at before moving it into place, unique per thread."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from typing import IO, Iterable, Iterator
+
+__all__ = ("LexiconEntry", "Lexicon", "readEntries", "readWiktextract", "dumpFormats")
+
+# The parts of speech of Wiktextract dumps, mapped to the ones generators use.
+wiktextractPartsOfSpeech = {
+    "noun": "noun",
+    "verb": "verb",
+    "adj": "adjective",
+    "adv": "adverb",
+    "pron": "pronoun",
+    "prep": "preposition",
+    "conj": "conjunction",
+    "intj": "interjection",
+    "abbrev": "abbreviation",
+}
+
+# The sense tags of Wiktextract dumps that mark a word as offensive.
+offensiveTags = frozenset(("offensive", "vulgar", "derogatory", "slur", "ethnic"))
+
+# The fields of an entry holding several items.
+itemFields = ("definitions", "sentences", "synonyms", "antonyms")
+
+
+@dataclass(slots=True)
+class LexiconEntry:
+    """
+    What a lexicon holds about a word.
+
+    Attributes:
+        word: The word, lowercased.
+        partOfSpeech: The part of speech of the word's first entry, if known.
+        pronunciation: The pronunciation of the word, if known.
+        offensive: Whether the word is offensive, if known.
+        rhyme: The part of the word's pronunciation that rhyming words share, if
+            known.
+        definitions: Definitions of the word.
+        sentences: Sentences using the word.
+        synonyms: Synonyms of the word.
+        antonyms: Antonyms of the word.
+        rhymes: Words that rhyme with the word.
+    """
+
+    word: str
+    partOfSpeech: str | None = None
+    pronunciation: str | None = None
+    offensive: bool | None = None
+    rhyme: str | None = None
+    definitions: list[str] = field(default_factory=list)
+    sentences: list[str] = field(default_factory=list)
+    synonyms: list[str] = field(default_factory=list)
+    antonyms: list[str] = field(default_factory=list)
+    rhymes: list[str] = field(default_factory=list)
+
+
+class Lexicon:
+    """
+    An offline index of word data, built once from bulk dictionary dumps.
+
+    The index is an SQLite database, opened read-only, so looking a word up takes a
+    couple of indexed queries instead of a round trip to an upstream API. Words that
+    appear in several entries of a dump, such as once per part of speech, have their
+    data merged, in dump order.
+
+    Args:
+        path: The path of the database file, as made by `build`.
+        maxRhymes: The maximum number of rhymes looked up for a word.
+    """
+
+    def __init__(self, path: str = ".cache/lexicon.sqlite", maxRhymes: int = 50):
+        self.path = path
+        self.maxRhymes = maxRhymes
+        # The index is only written by `build`, so it can be shared across threads.
+        self._db = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def __enter__(self) -> "Lexicon":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __contains__(self, word: str) -> bool:
+        row = self._db.execute(
+            "SELECT 1 FROM words WHERE word = ?", (word.strip().lower(),)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def lookup(self, word: str) -> LexiconEntry | None:
+        """
+        Look a word up.
+
+        Args:
+            word: The word, in any case.
+
+        Returns:
+            The word's data, or None if the lexicon does not hold the word.
+        """
+        word = word.strip().lower()
+        row = self._db.execute(
+            "SELECT partOfSpeech, pronunciation, offensive, rhyme "
+            "FROM words WHERE word = ?",
+            (word,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        partOfSpeech, pronunciation, offensive, rhyme = row
+        entry = LexiconEntry(
+            word,
+            partOfSpeech,
+            pronunciation,
+            None if offensive is None else bool(offensive),
+            rhyme,
+        )
+        items = self._db.execute(
+            "SELECT field, value FROM items WHERE word = ? ORDER BY rowid", (word,)
+        )
+        for itemField, value in items:
+            getattr(entry, itemField).append(value)
+        if rhyme is not None:
+            entry.rhymes = [
+                rhymingWord
+                for (rhymingWord,) in self._db.execute(
+                    "SELECT word FROM words WHERE rhyme = ? AND word != ? "
+                    "ORDER BY rowid LIMIT ?",
+                    (rhyme, word, self.maxRhymes),
+                )
+            ]
+        return entry
+
+    @classmethod
+    def build(
+        cls,
+        entries: Iterable[LexiconEntry],
+        path: str = ".cache/lexicon.sqlite",
+        **kwargs,
+    ) -> "Lexicon":
+        """
+        Build a lexicon, replacing the one at the path, if any.
+
+        Entries are streamed into a temporary database that replaces the old one
+        once complete, so lexicons in use are never seen half built.
+
+        Args:
+            entries: The entries to index, such as from `readWiktextract`.
+            path: The path of the database file.
+            **kwargs: Keyword arguments to pass to the lexicon.
+
+        Returns:
+            The built lexicon.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        buildPath = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(buildPath):
+            os.remove(buildPath)
+
+        db = sqlite3.connect(buildPath)
+        try:
+            db.executescript(
+                "PRAGMA journal_mode=OFF;"
+                "PRAGMA synchronous=OFF;"
+                "CREATE TABLE words ("
+                "word TEXT PRIMARY KEY, partOfSpeech TEXT, pronunciation TEXT, "
+                "offensive INTEGER, rhyme TEXT);"
+                "CREATE TABLE items (word TEXT, field TEXT, value TEXT);"
+            )
+            for entry in entries:
+                cls._insert(db, entry)
+            db.executescript(
+                "CREATE INDEX items_word ON items (word);"
+                "CREATE INDEX words_rhyme ON words (rhyme);"
+                "ANALYZE;"
+            )
+            db.commit()
+            db.execute("VACUUM")
+        finally:
+            db.close()
+        os.replace(buildPath, path)
+        return cls(path, **kwargs)
+
+    @staticmethod
+    def _insert(db: sqlite3.Connection, entry: LexiconEntry):
+        """Add an entry, merging it into the word's data if the word is indexed."""
+        word = entry.word.strip().lower()
+        if not word:
+            return
+        db.execute(
+            "INSERT INTO words VALUES (?, ?, ?, ?, ?) ON CONFLICT (word) DO UPDATE SET "
+            "partOfSpeech = COALESCE(partOfSpeech, excluded.partOfSpeech), "
+            "pronunciation = COALESCE(pronunciation, excluded.pronunciation), "
+            "offensive = COALESCE(MAX(offensive, excluded.offensive), offensive, "
+            "excluded.offensive), "
+            "rhyme = COALESCE(rhyme, excluded.rhyme)",
+            (
+                word,
+                entry.partOfSpeech,
+                entry.pronunciation,
+                entry.offensive,
+                entry.rhyme,
+            ),
+        )
+        db.executemany(
+            "INSERT INTO items VALUES (?, ?, ?)",
+            (
+                (word, itemField, value)
+                for itemField in itemFields
+                for value in getattr(entry, itemField)
+                if value
+            ),
+        )
+
+
+def readEntries(file: IO[str]) -> Iterator[LexiconEntry]:
+    """
+    Read entries from JSON lines with the attributes of `LexiconEntry`.
+
+    This is the format to convert other dumps to. Unknown attributes are ignored.
+
+    Args:
+        file: The dump.
+
+    Yields:
+        The entries.
+    """
+    names = set(LexiconEntry.__dataclass_fields__) - {"rhymes"}
+    for line in file:
+        if line.strip():
+            data = json.loads(line)
+            yield LexiconEntry(**{k: v for k, v in data.items() if k in names})
+
+
+def readWiktextract(file: IO[str], language: str = "en") -> Iterator[LexiconEntry]:
+    """
+    Read entries from a Wiktextract dump, such as the ones of kaikki.org.
+
+    Args:
+        file: The dump, with one JSON object per line.
+        language: The code of the language whose words to read.
+
+    Yields:
+        The entries, one per word and part of speech.
+    """
+    for line in file:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        if data.get("lang_code") != language or " " in data.get("word", " "):
+            continue
+
+        entry = LexiconEntry(
+            data["word"], wiktextractPartsOfSpeech.get(data.get("pos")), offensive=False
+        )
+        for sound in data.get("sounds", ()):
+            # enPR spells sounds with letters, like the pronunciations GPT gives.
+            if "enpr" in sound:
+                entry.pronunciation = entry.pronunciation or sound["enpr"]
+            elif "rhymes" in sound:
+                entry.rhyme = entry.rhyme or sound["rhymes"]
+
+        entry.synonyms.extend(item["word"] for item in data.get("synonyms", ()))
+        entry.antonyms.extend(item["word"] for item in data.get("antonyms", ()))
+        for sense in data.get("senses", ()):
+            if offensiveTags.intersection(sense.get("tags", ())):
+                entry.offensive = True
+            if "form-of" in sense.get("tags", ()):
+                continue
+            entry.definitions.extend(sense.get("glosses", ())[-1:])
+            entry.sentences.extend(
+                example["text"]
+                for example in sense.get("examples", ())
+                if "text" in example and len(example["text"].split(" ")) < 14
+            )
+            entry.synonyms.extend(item["word"] for item in sense.get("synonyms", ()))
+            entry.antonyms.extend(item["word"] for item in sense.get("antonyms", ()))
+        yield entry
+
+
+# The readers of the supported dump formats, keyed by name.
+dumpFormats = {"entries": readEntries, "wiktextract": readWiktextract}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="lexicon", description="Build the offline lexicon from bulk dumps."
+    )
+    parser.add_argument("dumps", nargs="+", help="The dumps to index, in order.")
+    parser.add_argument("--format", choices=list(dumpFormats), default="wiktextract")
+    parser.add_argument("--output", default=".cache/lexicon.sqlite")
+    args = parser.parse_args()
+
+    def entries() -> Iterator[LexiconEntry]:
+        for dump in args.dumps:
+            with open(dump, encoding="utf-8") as f:
+                yield from dumpFormats[args.format](f)
+
+    with Lexicon.build(entries(), args.output) as lexicon:
+        print(f"Indexed {len(lexicon)} words in {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+__all__ = ("providers", "Limits")
+
+providers = (
+    "dictionary",
+    "webster",
+    "datamuse",
+    "rhymebrain",
+    "gpt",
+    "dalle",
+)
+
+
+class Limits:
+    """
+    Concurrency limits for the upstream providers used during generation.
+
+    A single instance is meant to be shared between every generator of a batch, so
+    that the limits apply across all the words being generated at once.
+
+    Args:
+        **limits: The maximum number of concurrent requests for each provider, keyed
+            by provider name (see `providers`). Providers that are omitted or given
+            None are not limited.
+    """
+
+    def __init__(self, **limits: int | None):
+        unknownProviders = set(limits) - set(providers)
+        if unknownProviders:
+            raise ValueError("Unknown providers.", sorted(unknownProviders))
+
+        self.limits = {provider: limits.get(provider) for provider in providers}
+        self._semaphores = {
+            provider: asyncio.Semaphore(limit)
+            for provider, limit in self.limits.items()
+            if limit is not None
+        }
+
+    @asynccontextmanager
+    async def provider(self, name: str):
+        """
+        Hold a slot of a provider for the duration of the context.
+
+        Args:
+            name: The name of the provider.
+        """
+        if name not in self.limits:
+            raise ValueError("Unknown provider.", name)
+
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            yield
+        else:
+            async with semaphore:
+                yield
@@ -1,9 +1,34 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+import weakref
+
 import aiohttp
 
 from src import keys
+from src.flashcards.utils.cache import ResponseCache
+from src.flashcards.utils.tracing import Span, tracer
+
+OPENAI_API = "https://api.openai.com/v1"
+CHAT_COMPLETIONS_API = f"{OPENAI_API}/chat/completions"
+DALLE_API = f"{OPENAI_API}/images/generations"
+
+# Approximate prices, in dollars per 1000 tokens (prompt, completion) or per image.
+TOKEN_PRICES = {
+    "gpt-3.5-turbo": (0.0015, 0.002),
+}
+IMAGE_PRICES = {
+    "256x256": 0.016,
+    "512x512": 0.018,
+    "1024x1024": 0.02,
+}
 
-CHAT_COMPLETIONS_API = "https://api.openai.com/v1/chat/completions"
-DALLE_API = "https://api.openai.com/v1/images/generations"
+# The providers of the endpoints, as named by limits and spans.
+providers = {"/chat/completions": "gpt", "/images/generations": "dalle"}
+
+logger = logging.getLogger(__name__)
 
 
 class OpenAiApiReqError(Exception):
@@ -14,47 +39,405 @@ class OpenAiApiReqError(Exception):
     pass
 
 
-async def gptReq(reqData: dict, session: aiohttp.ClientSession) -> str:
+class BudgetExceededError(OpenAiApiReqError):
+    """
+    Raised when a request is attempted after the budget has been spent.
+    """
+
+    pass
+
+
+class TokenBucket:
+    """
+    A token bucket, continuously refilled up to its capacity.
+
+    Args:
+        capacity: The number of tokens the bucket holds when full.
+        period: The number of seconds it takes to refill an empty bucket.
+    """
+
+    def __init__(self, capacity: float, period: float = 60):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """The number of tokens currently in the bucket."""
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, amount: float = 1):
+        """
+        Take tokens from the bucket, waiting for it to refill if needed.
+
+        Requests larger than the capacity wait for a full bucket.
+
+        Args:
+            amount: The number of tokens to take.
+        """
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters first come, first served.
+        async with self._lock:
+            while (missing := amount - self.tokens) > 0:
+                await asyncio.sleep(missing / self.rate)
+            self._tokens -= amount
+
+    def refund(self, amount: float):
+        """
+        Return tokens to the bucket, or take more if the amount is negative.
+
+        Args:
+            amount: The number of tokens to return.
+        """
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+
+class Budget:
+    """
+    The money spent on OpenAI requests.
+
+    Args:
+        limit: The number of dollars after which requests are refused, or None to
+            only track spend.
+
+    Attributes:
+        spent: The number of dollars spent.
+        promptTokens: The number of prompt tokens used.
+        completionTokens: The number of completion tokens used.
+        images: The number of images generated.
+    """
+
+    def __init__(self, limit: float | None = None):
+        self.limit = limit
+        self.spent = 0.0
+        self.promptTokens = 0
+        self.completionTokens = 0
+        self.images = 0
+
+    @property
+    def exceeded(self) -> bool:
+        """Whether the limit has been reached."""
+        return self.limit is not None and self.spent >= self.limit
+
+    def check(self):
+        """Raise BudgetExceededError if the limit has been reached."""
+        if self.exceeded:
+            raise BudgetExceededError(
+                f"Spent ${self.spent:.4f} of the ${self.limit:.4f} budget."
+            )
+
+    def chargeTokens(self, model: str, promptTokens: int, completionTokens: int):
+        """Record the tokens used by a chat completion."""
+        promptPrice, completionPrice = TOKEN_PRICES.get(
+            model, TOKEN_PRICES["gpt-3.5-turbo"]
+        )
+        self.promptTokens += promptTokens
+        self.completionTokens += completionTokens
+        self.spent += (
+            promptTokens * promptPrice + completionTokens * completionPrice
+        ) / 1000
+
+    def chargeImages(self, size: str, count: int = 1):
+        """Record generated images."""
+        self.images += count
+        self.spent += IMAGE_PRICES.get(size, IMAGE_PRICES["1024x1024"]) * count
+
+
+class OpenAiClient:
+    """
+    A client for the OpenAI API that stays within rate limits.
+
+    Requests wait for room in token buckets for requests, tokens and images per
+    minute. Rate limited (429), failed (5xx) and dropped requests are retried with
+    jittered exponential backoff, waiting at least as long as the API's Retry-After
+    header asks. One client is meant to be shared by everything using the same API
+    key, so that its limits hold across all of them, which `sharedClient` provides
+    for those not given one.
+
+    Args:
+        session: The aiohttp session, unless every request passes its own.
+        baseUrl: The base URL of the API, which may point to a local stand-in.
+        apiKey: The API key. keys.OPENAI is used if this is None.
+        requestsPerMinute: The chat completion requests allowed per minute.
+        tokensPerMinute: The chat completion tokens allowed per minute.
+        imagesPerMinute: The images allowed per minute.
+        maxRetries: The number of times a request is retried before giving up.
+        backoffBase: The number of seconds the first retry waits for at most.
+        backoffMax: The number of seconds any retry waits for at most, besides
+            Retry-After.
+        budget: The budget to track spend in and to enforce.
+
+    Attributes:
+        retries: The number of retries made.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession | None,
+        baseUrl: str = OPENAI_API,
+        apiKey: str | None = None,
+        requestsPerMinute: float = 3500,
+        tokensPerMinute: float = 90000,
+        imagesPerMinute: float = 50,
+        maxRetries: int = 6,
+        backoffBase: float = 1,
+        backoffMax: float = 60,
+        budget: Budget | None = None,
+    ):
+        self.session = session
+        self.baseUrl = baseUrl.rstrip("/")
+        self.apiKey = apiKey
+        self.requests = TokenBucket(requestsPerMinute)
+        self.tokens = TokenBucket(tokensPerMinute)
+        self.images = TokenBucket(imagesPerMinute)
+        self.maxRetries = maxRetries
+        self.backoffBase = backoffBase
+        self.backoffMax = backoffMax
+        self.budget = budget or Budget()
+        self.retries = 0
+
+    async def gpt(
+        self, reqData: dict, session: aiohttp.ClientSession | None = None
+    ) -> str:
+        """
+        Use GPT to generate text.
+
+        Args:
+            reqData: The request data.
+            session: The aiohttp session to make the request with, if not the
+                client's.
+
+        Returns:
+            The generated text.
+        """
+        estimate = self._estimateTokens(reqData)
+        await self.tokens.acquire(estimate)
+
+        data = await self._post(
+            "/chat/completions", reqData, self.requests, session=session
+        )
+        try:
+            content = data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise OpenAiApiReqError(data)
+
+        usage = data.get("usage") or {}
+        if "total_tokens" in usage:
+            self.tokens.refund(estimate - usage["total_tokens"])
+        self.budget.chargeTokens(
+            reqData.get("model", ""),
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+        )
+        return content
+
+    async def dalle(
+        self, reqData: dict, session: aiohttp.ClientSession | None = None
+    ) -> str:
+        """
+        Use DALLE to generate an image.
+
+        Args:
+            reqData: The request data.
+            session: The aiohttp session to make the request with, if not the
+                client's.
+
+        Returns:
+            The generated image.
+        """
+        data = await self._post(
+            "/images/generations", reqData, self.images, reqData.get("n", 1), session
+        )
+        try:
+            image = data["data"][0]["b64_json"]
+        except (KeyError, IndexError, TypeError):
+            raise OpenAiApiReqError(data)
+
+        self.budget.chargeImages(reqData.get("size", "1024x1024"), len(data["data"]))
+        return image
+
+    async def _post(
+        self,
+        path: str,
+        reqData: dict,
+        bucket: TokenBucket,
+        cost: float = 1,
+        session: aiohttp.ClientSession | None = None,
+    ) -> dict:
+        """
+        Post a request to the API, retrying it while it is rate limited or failing.
+
+        Args:
+            path: The path of the endpoint.
+            reqData: The request data.
+            bucket: The bucket every attempt takes from.
+            cost: The number of tokens every attempt takes from the bucket.
+            session: The aiohttp session to post with, if not the client's.
+
+        Returns:
+            The response data.
+        """
+        session = session or self.session
+        if session is None:
+            raise ValueError("Requests need a session if the client has none.")
+        with tracer.span("http", provider=providers.get(path, path), url=path) as span:
+            return await self._attempt(path, reqData, bucket, cost, session, span)
+
+    async def _attempt(
+        self,
+        path: str,
+        reqData: dict,
+        bucket: TokenBucket,
+        cost: float,
+        session: aiohttp.ClientSession,
+        span: Span,
+    ) -> dict:
+        """Make the attempts of `_post`, recording them in its span."""
+        apiKey = self.apiKey if self.apiKey is not None else keys.OPENAI
+        for attempt in range(self.maxRetries + 1):
+            span.set(retries=attempt)
+            self.budget.check()
+            await bucket.acquire(cost)
+            retryAfter = None
+            try:
+                async with session.post(
+                    f"{self.baseUrl}{path}",
+                    headers={"Authorization": f"Bearer {apiKey}"},
+                    json=reqData,
+                ) as resp:
+                    span.set(status=resp.status, bytes=len(await resp.read()))
+                    if resp.status != 429 and resp.status < 500:
+                        try:
+                            return await resp.json()
+                        except (aiohttp.ContentTypeError, ValueError):
+                            raise OpenAiApiReqError(await resp.text())
+
+                    error = OpenAiApiReqError(resp.status, await resp.text())
+                    if "insufficient_quota" in str(error):
+                        raise error
+                    retryAfter = self._parseRetryAfter(resp.headers.get("Retry-After"))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as clientError:
+                error = OpenAiApiReqError(repr(clientError))
+
+            if attempt == self.maxRetries:
+                raise error
+
+            delay = random.uniform(
+                0, min(self.backoffMax, self.backoffBase * 2**attempt)
+            )
+            if retryAfter is not None:
+                delay += retryAfter
+            self.retries += 1
+            logger.info("Retrying %s in %.2fs after %s", path, delay, error)
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _parseRetryAfter(value: str | None) -> float | None:
+        """Parse a Retry-After header, in either seconds or HTTP-date form."""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retryAt = email.utils.parsedate_to_datetime(value).timestamp()
+            return max(0.0, retryAt - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _estimateTokens(reqData: dict) -> int:
+        """Estimate the tokens a chat completion counts against the limits."""
+        promptCharacters = sum(
+            len(message.get("content", "")) for message in reqData.get("messages", ())
+        )
+        # Roughly four characters per token, plus the completion's allowance.
+        return promptCharacters // 4 + reqData.get("max_tokens", 256)
+
+
+# The shared client of each event loop, whose rate limits wait on the loop.
+_sharedClients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def sharedClient() -> OpenAiClient:
+    """
+    The client shared by every request not given a client of its own.
+
+    There is one per event loop, with the default settings and no session, so
+    requests made with it pass their own session while sharing its limits and budget.
+
+    Returns:
+        The shared client of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _sharedClients:
+        _sharedClients[loop] = OpenAiClient(None)
+    return _sharedClients[loop]
+
+
+async def gptReq(
+    reqData: dict,
+    session: aiohttp.ClientSession,
+    cache: ResponseCache | None = None,
+    client: OpenAiClient | None = None,
+) -> str:
     """
     Use GPT to generate text.
 
     Args:
         reqData: The request data.
         session: The aiohttp session.
+        cache: The cache to reuse responses to identical requests from.
+        client: The client to make the request with. The shared client is used with
+            the session if this is None.
 
     Returns:
         The generated text.
     """
-
-    async with session.post(
-        CHAT_COMPLETIONS_API,
-        headers={"Authorization": f"Bearer {keys.OPENAI}"},
-        json=reqData,
-    ) as resp:
-        try:
-            return (await resp.json())["choices"][0]["message"]["content"]
-        except KeyError:
-            raise OpenAiApiReqError(await resp.text())
+    if cache is not None:
+        return await cache.fetch(
+            "gpt", reqData, lambda: gptReq(reqData, session, client=client)
+        )
+    if client is None:
+        return await sharedClient().gpt(reqData, session)
+    return await client.gpt(reqData)
 
 
-async def dalleReq(reqData: dict, session: aiohttp.ClientSession) -> str:
+async def dalleReq(
+    reqData: dict,
+    session: aiohttp.ClientSession,
+    cache: ResponseCache | None = None,
+    client: OpenAiClient | None = None,
+) -> str:
     """
     Use DALLE to generate an image.
 
     Args:
         reqData: The request data.
         session: The aiohttp session.
+        cache: The cache to reuse responses to identical requests from.
+        client: The client to make the request with. The shared client is used with
+            the session if this is None.
 
     Returns:
         The generated image.
     """
-
-    async with session.post(
-        DALLE_API,
-        headers={"Authorization": f"Bearer {keys.OPENAI}"},
-        json=reqData,
-    ) as resp:
-        try:
-            return (await resp.json())["data"][0]["b64_json"]
-        except KeyError:
-            raise OpenAiApiReqError(await resp.text())
+    if cache is not None:
+        return await cache.fetch(
+            "dalle", reqData, lambda: dalleReq(reqData, session, client=client)
+        )
+    if client is None:
+        return await sharedClient().dalle(reqData, session)
+    return await client.dalle(reqData)
@@ -0,0 +1,253 @@
+import argparse
+import heapq
+import os
+import re
+import sqlite3
+from typing import IO, Iterable, Iterator
+
+__all__ = ("RhymeIndex", "rhymePart", "readCmudict", "readFrequencies")
+
+# The phones of CMUdict that are vowels end with a stress digit.
+_vowel = re.compile(r"[A-Z]+([012])")
+
+
+def rhymePart(phones: Iterable[str]) -> str | None:
+    """
+    The part of a pronunciation that rhyming words share.
+
+    This is the last vowel with primary stress and everything after it. Words
+    without primary stress use their last vowel with secondary stress, and failing
+    that, their last vowel.
+
+    Args:
+        phones: The ARPAbet phones of the pronunciation, such as ["K", "AE1", "T"].
+
+    Returns:
+        The rhyme part, without stress marks, such as "AE T", or None if the
+        pronunciation has no vowels.
+    """
+    phones = list(phones)
+    vowels = [
+        (i, match[1])
+        for i, phone in enumerate(phones)
+        if (match := _vowel.fullmatch(phone))
+    ]
+    if not vowels:
+        return None
+    for stress in ("1", "2", "0"):
+        stressed = [i for i, vowelStress in vowels if vowelStress == stress]
+        if stressed:
+            return " ".join(phone.rstrip("012") for phone in phones[stressed[-1] :])
+
+
+def readCmudict(file: IO[str]) -> Iterator[tuple[str, list[str]]]:
+    """
+    Read the pronunciations of the CMU Pronouncing Dictionary.
+
+    Alternative pronunciations, such as "tomato(2)", are read as the word's, and
+    comments and words with other characters than letters and apostrophes are
+    skipped.
+
+    Args:
+        file: The dictionary, such as cmudict.dict.
+
+    Yields:
+        The words, lowercased, and their phones.
+    """
+    for line in file:
+        line = line.split("#", 1)[0].strip()
+        if not line or line.startswith(";;;"):
+            continue
+        word, *phones = line.split()
+        word = re.sub(r"\(\d+\)$", "", word).lower()
+        if re.fullmatch(r"[a-z][a-z']*", word):
+            yield word, phones
+
+
+def readFrequencies(file: IO[str]) -> Iterator[tuple[str, int]]:
+    """
+    Read a word frequency list, with a word and its count per line.
+
+    Args:
+        file: The list, such as a unigram count file, separated by whitespace.
+
+    Yields:
+        The words, lowercased, and their counts.
+    """
+    for line in file:
+        parts = line.split()
+        if len(parts) >= 2 and parts[-1].isdigit():
+            yield parts[0].lower(), int(parts[-1])
+
+
+class RhymeIndex:
+    """
+    An offline index of rhyming words, keyed by the rhyme parts of pronunciations.
+
+    Every rhyme part lists its words by frequency, so looking a word up reads the
+    first few words of the list of its rhyme part, however long the list is. Words
+    pronounced exactly like the word, such as homophones, are not rhymes.
+
+    Args:
+        path: The path of the database file, as made by `build`.
+    """
+
+    def __init__(self, path: str = ".cache/rhymes.sqlite"):
+        self.path = path
+        # The index is only written by `build`, so it can be shared across threads.
+        self._db = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def __enter__(self) -> "RhymeIndex":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __contains__(self, word: str) -> bool:
+        row = self._db.execute(
+            "SELECT 1 FROM pronunciations WHERE word = ?", (word.strip().lower(),)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def rhymes(self, word: str, count: int = 25) -> list[str]:
+        """
+        Words that rhyme with a word, most frequent first.
+
+        Args:
+            word: The word, in any case.
+            count: The maximum number of rhymes.
+
+        Returns:
+            The rhymes, which are empty if the index does not hold the word.
+        """
+        word = word.strip().lower()
+        rhymeParts = self._db.execute(
+            "SELECT DISTINCT rhyme FROM pronunciations WHERE word = ?", (word,)
+        ).fetchall()
+        # The words pronounced like the word, including the word itself.
+        homophones = {
+            homophone
+            for (homophone,) in self._db.execute(
+                "SELECT homophones.word FROM pronunciations AS own "
+                "JOIN pronunciations AS homophones ON homophones.phones = own.phones "
+                "WHERE own.word = ?",
+                (word,),
+            )
+        }
+        candidates = heapq.merge(
+            *(
+                self._db.execute(
+                    "SELECT frequency, word FROM rhymes WHERE rhyme = ? "
+                    "ORDER BY frequency DESC, word LIMIT ?",
+                    (rhymePart, count + len(homophones)),
+                )
+                for (rhymePart,) in rhymeParts
+            ),
+            key=lambda row: (-row[0], row[1]),
+        )
+        rhymes = []
+        for _, rhyme in candidates:
+            if len(rhymes) == count:
+                break
+            if rhyme not in homophones and rhyme not in rhymes:
+                rhymes.append(rhyme)
+        return rhymes
+
+    @classmethod
+    def build(
+        cls,
+        pronunciations: Iterable[tuple[str, list[str]]],
+        frequencies: Iterable[tuple[str, int]] = (),
+        path: str = ".cache/rhymes.sqlite",
+    ) -> "RhymeIndex":
+        """
+        Build a rhyme index, replacing the one at the path, if any.
+
+        Args:
+            pronunciations: The words and their phones, such as from `readCmudict`.
+            frequencies: The counts of words, such as from `readFrequencies`, which
+                rhymes are ranked by. Words without a count rank last.
+            path: The path of the database file.
+
+        Returns:
+            The built index.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        buildPath = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(buildPath):
+            os.remove(buildPath)
+
+        db = sqlite3.connect(buildPath)
+        try:
+            db.executescript(
+                "PRAGMA journal_mode=OFF;"
+                "PRAGMA synchronous=OFF;"
+                "CREATE TABLE frequencies (word TEXT PRIMARY KEY, frequency INTEGER);"
+                "CREATE TABLE pronunciations (word TEXT, phones TEXT, rhyme TEXT);"
+            )
+            db.executemany(
+                "INSERT INTO frequencies VALUES (?, ?) ON CONFLICT (word) DO UPDATE "
+                "SET frequency = frequency + excluded.frequency",
+                frequencies,
+            )
+            db.executemany(
+                "INSERT INTO pronunciations VALUES (?, ?, ?)",
+                (
+                    (word, " ".join(phones), rhyme)
+                    for word, phones in pronunciations
+                    if (rhyme := rhymePart(phones)) is not None
+                ),
+            )
+            db.executescript(
+                "CREATE TABLE words AS SELECT DISTINCT word FROM pronunciations;"
+                "CREATE TABLE rhymes AS SELECT DISTINCT rhyme, word, COALESCE(("
+                "SELECT frequency FROM frequencies "
+                "WHERE frequencies.word = pronunciations.word), 0) AS frequency "
+                "FROM pronunciations;"
+                "DROP TABLE frequencies;"
+                "CREATE INDEX pronunciations_word ON pronunciations (word);"
+                "CREATE INDEX pronunciations_phones ON pronunciations (phones);"
+                "CREATE INDEX rhymes_rhyme ON rhymes (rhyme, frequency DESC, word);"
+                "ANALYZE;"
+            )
+            db.commit()
+            db.execute("VACUUM")
+        finally:
+            db.close()
+        os.replace(buildPath, path)
+        return cls(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="rhymes", description="Build the offline rhyme index."
+    )
+    parser.add_argument("cmudict", help="The CMU Pronouncing Dictionary.")
+    parser.add_argument(
+        "--frequencies", help="A word frequency list to rank rhymes by."
+    )
+    parser.add_argument("--output", default=".cache/rhymes.sqlite")
+    args = parser.parse_args()
+
+    def frequencies() -> Iterator[tuple[str, int]]:
+        if args.frequencies:
+            with open(args.frequencies, encoding="utf-8") as f:
+                yield from readFrequencies(f)
+
+    with open(args.cmudict, encoding="latin-1") as f:
+        with RhymeIndex.build(readCmudict(f), frequencies(), args.output) as index:
+            print(f"Indexed {len(index)} words in {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,36 @@
+import mimetypes
 from dataclasses import dataclass, field
 
+from src.flashcards.utils.misc import fileAsBase64
+
 
 @dataclass(slots=True, frozen=True)
 class Image:
     """
-    Image dataclass for storing image data.
+    Image dataclass for referencing stored image data.
 
     Attributes:
-        base64 (str): Base64 encoded image.
+        path (str): Path of the image on disk.
         size (tuple[int, int]): Size of the image.
         prompt (str): Prompt for the image.
         dalleTemplate (str): Dalle template that the prompt was slotted into. This should
             include a {prompt} placeholder.
     """
 
-    base64: str = field(repr=False)
+    path: str
     size: tuple[int, int]
     prompt: str
     dalleTemplate: str = field(repr=False)
 
+    @property
+    def base64(self) -> str:
+        """Base64 encoded image, read from disk."""
+        return fileAsBase64(self.path)
+
+    @property
+    def mimetype(self) -> str:
+        """The mimetype of the image, from its file extension."""
+        return mimetypes.guess_type(self.path)[0] or "image/png"
+
     def __str__(self) -> str:
-        return f"data:image/png;base64,{self.base64}"
+        return f"data:{self.mimetype};base64,{self.base64}"
@@ -0,0 +1,261 @@
+import contextvars
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import IO, Iterator, Protocol
+
+__all__ = (
+    "Span",
+    "Hook",
+    "SpanCollector",
+    "JsonLinesExporter",
+    "Tracer",
+    "tracer",
+)
+
+currentCard: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "currentCard", default=None
+)
+currentSpan: contextvars.ContextVar[int | None] = contextvars.ContextVar(
+    "currentSpan", default=None
+)
+
+
+@dataclass(slots=True)
+class Span:
+    """
+    A timed operation.
+
+    Attributes:
+        name: What was done, such as "field", "http", "template" or "print".
+        id: The number of the span, unique within the process.
+        parent: The id of the span this one happened within, if any.
+        card: The word of the flashcard the span was for, if any.
+        start: When the span started, in seconds since the epoch.
+        duration: How long the span took, in seconds.
+        attributes: Details of the span, such as the field, the provider, or the
+            status of a response.
+        error: The error that ended the span, if any.
+    """
+
+    name: str
+    id: int
+    parent: int | None
+    card: str | None
+    start: float
+    duration: float = 0.0
+    attributes: dict[str, object] = field(default_factory=dict)
+    error: str | None = None
+
+    def set(self, **attributes):
+        """Add details to the span."""
+        self.attributes.update(attributes)
+
+
+class Hook(Protocol):
+    """Receives every span once it has ended."""
+
+    def __call__(self, span: Span) -> None:
+        ...
+
+
+class SpanCollector:
+    """
+    A hook that keeps spans in memory.
+
+    Attributes:
+        spans: The spans received, in the order they ended.
+    """
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def __call__(self, span: Span):
+        self.spans.append(span)
+
+    def clear(self):
+        """Forget the spans received."""
+        self.spans.clear()
+
+    def summary(self, card: str) -> dict[str, dict[str, float]]:
+        """
+        Where the time of a flashcard went.
+
+        Spans are grouped by name and by their most telling detail: the field of
+        field spans, and the provider of HTTP spans.
+
+        Args:
+            card: The word of the flashcard.
+
+        Returns:
+            The number of spans and their total and longest duration in seconds,
+            keyed by group, such as "field:synonyms" or "http:gpt".
+        """
+        summary = defaultdict(lambda: {"count": 0, "seconds": 0.0, "max": 0.0})
+        for span in self.spans:
+            if span.card != card:
+                continue
+            detail = span.attributes.get("field") or span.attributes.get("provider")
+            group = summary[f"{span.name}:{detail}" if detail else span.name]
+            group["count"] += 1
+            group["seconds"] += span.duration
+            group["max"] = max(group["max"], span.duration)
+        return dict(summary)
+
+    def summaries(self) -> dict[str, dict[str, dict[str, float]]]:
+        """The summary of every flashcard with spans, keyed by word."""
+        cards = dict.fromkeys(span.card for span in self.spans if span.card)
+        return {card: self.summary(card) for card in cards}
+
+
+class JsonLinesExporter:
+    """
+    A hook that writes spans to a file, as one JSON object per line.
+
+    Args:
+        file: The path of the file, which is appended to, or a text file to write to.
+    """
+
+    def __init__(self, file: str | IO[str]):
+        self._ownsFile = isinstance(file, str)
+        self._file = open(file, "a") if self._ownsFile else file
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "JsonLinesExporter":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __call__(self, span: Span):
+        line = json.dumps(asdict(span), default=str)
+        with self._lock:
+            self._file.write(f"{line}\n")
+
+    def close(self):
+        """Flush the file, and close it if it was opened by the exporter."""
+        with self._lock:
+            self._file.flush()
+            if self._ownsFile:
+                self._file.close()
+
+
+class _NoSpan:
+    """The span of a disabled tracer, which records nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+    def set(self, **attributes):
+        pass
+
+
+_noSpan = _NoSpan()
+
+
+class Tracer:
+    """
+    Times operations and hands the spans to hooks.
+
+    Tracing is disabled while there are no hooks, in which case `span` does nothing
+    besides returning a shared placeholder. Spans are attributed to the flashcard of
+    the surrounding `card` context, and nested within the surrounding span, across
+    tasks and threads started with a copy of the context.
+    """
+
+    def __init__(self):
+        self.hooks: list[Hook] = []
+        self._ids = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any hook receives spans."""
+        return bool(self.hooks)
+
+    def addHook(self, hook: Hook):
+        """Start handing spans to a hook."""
+        self.hooks.append(hook)
+
+    def removeHook(self, hook: Hook):
+        """Stop handing spans to a hook."""
+        self.hooks.remove(hook)
+
+    @contextmanager
+    def hooked(self, hook: Hook) -> Iterator[Hook]:
+        """Hand spans to a hook for the duration of the context."""
+        self.addHook(hook)
+        try:
+            yield hook
+        finally:
+            self.removeHook(hook)
+
+    @contextmanager
+    def card(self, word: str) -> Iterator[None]:
+        """Attribute the spans of the context to a flashcard."""
+        token = currentCard.set(word)
+        try:
+            yield
+        finally:
+            currentCard.reset(token)
+
+    def span(self, name: str, **attributes) -> "_NoSpan | _ActiveSpan":
+        """
+        Time the operation of the context.
+
+        Args:
+            name: What is being done.
+            **attributes: Details of the span. More can be added with `Span.set`
+                on the value of the context.
+
+        Returns:
+            The context, whose value is the span.
+        """
+        if not self.hooks:
+            return _noSpan
+        return _ActiveSpan(self, name, attributes)
+
+    def _end(self, span: Span):
+        for hook in tuple(self.hooks):
+            hook(span)
+
+
+class _ActiveSpan:
+    """The context of a span being timed."""
+
+    __slots__ = ("_tracer", "_span", "_token", "_started")
+
+    def __init__(self, tracer: Tracer, name: str, attributes: dict[str, object]):
+        self._tracer = tracer
+        self._span = Span(
+            name,
+            next(tracer._ids),
+            currentSpan.get(),
+            currentCard.get(),
+            time.time(),
+            attributes=attributes,
+        )
+
+    def __enter__(self) -> Span:
+        self._token = currentSpan.set(self._span.id)
+        self._started = time.perf_counter()
+        return self._span
+
+    def __exit__(self, excType, exc, _):
+        self._span.duration = time.perf_counter() - self._started
+        currentSpan.reset(self._token)
+        if exc is not None:
+            self._span.error = repr(exc)
+        self._tracer._end(self._span)
+        return None
+
+
+tracer = Tracer()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The package is imported as src, and reads its data relative to the src directory.
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+os.chdir(os.path.join(root, "src"))
@@ -0,0 +1,55 @@
+import asyncio
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.converter.assets import AssetServer
+
+
+@pytest.fixture
+def server():
+    server = AssetServer()
+    yield server
+    server.stop()
+
+
+def fetch(url: str) -> bytes:
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def testFilesAreUnpublishedWithTheirScope(server, tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"image")
+    with server.scope():
+        url = server.publishFile(str(path))
+        with server.scope():
+            assert server.publishFile(str(path)) == url
+        # Still published by the outer scope.
+        assert fetch(url) == b"image"
+    with pytest.raises(urllib.error.HTTPError):
+        fetch(url)
+    assert not server._files and not server._fileTokens
+
+
+def testScopesCoverWorkerThreads(server, tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"image")
+
+    async def render():
+        with server.scope():
+            url = await asyncio.to_thread(server.publishFile, str(path))
+            assert fetch(url) == b"image"
+
+    asyncio.run(render())
+    assert not server._files
+
+
+def testFilesOutsideScopesStayPublished(server, tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"image")
+    url = server.publishFile(str(path))
+    with server.scope():
+        server.publishFile(str(path))
+    assert fetch(url) == b"image"
@@ -0,0 +1,99 @@
+import io
+import re
+
+import pytest
+
+from src.converter.backends import ChromeBackend, VectorBackend
+from src.converter.engine import engine
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.images import sharedImageStore
+from src.flashcards.utils.structs import Image
+
+PIL = pytest.importorskip("PIL.Image")
+ImageChops = pytest.importorskip("PIL.ImageChops")
+pypdf = pytest.importorskip("pypdf")
+
+# The mean difference per channel, out of 255, tolerated between the backends, which
+# rasterize and pick fallback fonts differently.
+tolerance = 8
+
+
+@pytest.fixture(scope="module")
+def vector():
+    try:
+        VectorBackend._cairosvg()
+    except ImportError as error:
+        pytest.skip(str(error))
+    return VectorBackend()
+
+
+@pytest.fixture(scope="module")
+def chrome():
+    try:
+        engine.start()
+    except Exception as error:
+        pytest.skip(f"Chrome is unavailable: {error!r}")
+    yield ChromeBackend()
+    engine.stop()
+
+
+@pytest.fixture(scope="module")
+def sides(tmp_path_factory):
+    """The watercolor sides of a flashcard, as the vector backend can draw them."""
+    imagePath = "flashcards/graphics/examples/wordImage.png"
+    with PIL.open(imagePath) as image:
+        size = image.size
+    flashcard = Flashcard("example", styles["watercolor"])
+    flashcard.fields.update(
+        {
+            "images": [Image(imagePath, size, "an example", "{PROMPT}")],
+            "inspirationalQuotes": ["Examples teach."],
+            "partOfSpeech": "noun",
+            "pronunciation": "ɪɡˈzæmpəl",
+            "sentences": ["An <b>Example</b> helps.", "One more.", "And a third."],
+            "synonyms": ["Sample", "Model", "Instance", "Case", "Pattern", "Ideal"],
+        }
+    )
+    # Images are resampled into a store of the test's own.
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(
+            sharedImageStore, "root", str(tmp_path_factory.mktemp("images"))
+        )
+        svgs = flashcard._prerenderSides(VectorBackend().assetUrl)
+    # CairoSVG does not lay out HTML, so the foreignObject text is left out of both.
+    return [
+        re.sub(r"<foreignObject.*?</foreignObject>", "", svg, flags=re.DOTALL)
+        for svg in svgs
+    ]
+
+
+def meanDifference(first: bytes, second: bytes) -> float:
+    with PIL.open(io.BytesIO(first)) as a, PIL.open(io.BytesIO(second)) as b:
+        a, b = a.convert("RGB"), b.convert("RGB")
+        assert a.size == b.size
+        histogram = ImageChops.difference(a, b).histogram()
+    pixels = a.size[0] * a.size[1] * 3
+    return sum(value * (i % 256) for i, value in enumerate(histogram)) / pixels
+
+
+@pytest.mark.parametrize("side", [0, 1], ids=["front", "back"])
+def testPngParity(vector, chrome, sides, side):
+    size = styles["watercolor"].size
+    difference = meanDifference(
+        vector.svgToPng(sides[side], *size, scale=2),
+        chrome.svgToPng(sides[side], *size, scale=2),
+    )
+    assert difference < tolerance
+
+
+def testPdfParity(vector, chrome, sides):
+    size = styles["watercolor"].size
+    pdfs = [
+        pypdf.PdfReader(io.BytesIO(backend.svgToPdf(sides, *size)))
+        for backend in (vector, chrome)
+    ]
+    for pdf in pdfs:
+        assert len(pdf.pages) == 2
+        for page in pdf.pages:
+            assert [round(float(x)) for x in page.mediabox[2:]] == list(size)
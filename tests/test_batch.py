@@ -0,0 +1,58 @@
+import asyncio
+
+import aiohttp
+
+from src.benchmarks.stubs import StubServer
+from src.flashcards.batch import genBatch
+from src.flashcards.generator import Generator
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.lexicon import Lexicon, LexiconEntry
+from src.flashcards.utils.openai import OpenAiClient
+
+
+def entry(word: str) -> LexiconEntry:
+    return LexiconEntry(
+        word,
+        partOfSpeech="noun",
+        pronunciation=word,
+        offensive=False,
+        definitions=[f"{word} definition {i}" for i in range(3)],
+        sentences=[f"A {word} in sentence {i}." for i in range(3)],
+        synonyms=[f"{word}-synonym-{i}" for i in range(6)],
+        antonyms=[f"{word}-antonym"],
+        rhymes=[f"{word}-rhyme-{i}" for i in range(4)],
+    )
+
+
+def testBatchOnlyAsksForWhatSourcesLack(tmp_path):
+    path = str(tmp_path / "lexicon.sqlite")
+    lexicon = Lexicon.build(map(entry, ("cat", "dog")), path)
+    batches = []
+
+    async def run():
+        async with StubServer(0) as stubs, aiohttp.ClientSession() as session:
+            completeBatch = stubs._completeBatch
+            stubs._completeBatch = lambda words, fields: (
+                batches.append(fields) or completeBatch(words, fields)
+            )
+            openai = OpenAiClient(session, baseUrl=stubs.openaiUrl, apiKey="stub")
+            generators = [
+                Generator(
+                    word,
+                    session,
+                    openai=openai,
+                    apiUrls=stubs.apiUrls,
+                    lexicon=lexicon,
+                )
+                for word in ("cat", "dog")
+            ]
+            assert await genBatch(generators, styles["watercolor"].config)
+            assert await generators[0].definitions(3) == entry("cat").definitions
+            assert await generators[1].partOfSpeech() == "noun"
+            return stubs.requests
+
+    requests = asyncio.run(run())
+    assert len(batches) == 1
+    asked = {line.split('"')[1] for line in batches[0].splitlines()}
+    assert asked == {"inspirationalQuotes", "imagePrompts"}
+    assert requests["dictionary"] == requests["webster"] == 0
@@ -0,0 +1,69 @@
+import asyncio
+import io
+import json
+import os
+import sys
+
+import pytest
+
+from src.benchmarks.stubs import StubServer
+from src.flashcards import cli
+from src.flashcards.deck import Deck
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.images import ImageStore
+
+words = ["apple", "bird", "cloud"]
+
+
+def build(tmp_path, renderAsync, monkeypatch) -> tuple[list[str], int]:
+    """Build the words against the stubs, returning them and the upstream requests."""
+    monkeypatch.setattr(Flashcard, "renderAsync", renderAsync)
+
+    async def run():
+        async with StubServer(0) as stubs:
+            deck = Deck(
+                (),
+                styles["watercolor"],
+                imageStore=ImageStore(str(tmp_path / "images")),
+                apiUrls=stubs.apiUrls,
+                openaiKwargs={"baseUrl": stubs.openaiUrl, "apiKey": "stub"},
+            )
+            built = await cli.build(iter(words), deck, str(tmp_path / "build"))
+            return built, sum(stubs.requests.values())
+
+    return asyncio.run(run())
+
+
+def testResumingAfterFailedRendersOnlyRenders(tmp_path, monkeypatch):
+    async def failing(self, pool=None, **kwargs):
+        raise RuntimeError("The browser crashed.")
+
+    async def rendering(self, pool=None, **kwargs):
+        return f"PDF of {self.word}".encode()
+
+    built, requests = build(tmp_path, failing, monkeypatch)
+    assert built == words and requests > 0
+    journal = cli.Journal(str(tmp_path / "build" / "journal.jsonl"))
+    journal.close()
+    assert journal.stages == {word: "renderFailed" for word in words}
+
+    built, requests = build(tmp_path, rendering, monkeypatch)
+    assert built == words and requests == 0
+    with open(tmp_path / "build" / "cards.jsonl", encoding="utf-8") as f:
+        assert sorted(json.loads(line)["word"] for line in f) == words
+    for word in words:
+        with open(cli.pdfPath(str(tmp_path / "build"), word), "rb") as f:
+            assert f.read() == f"PDF of {word}".encode()
+
+
+def testDeckNeedsRendering(monkeypatch, capsys):
+    monkeypatch.setattr(
+        sys, "argv", ["flashcards", "-", "--deck", "deck.pdf", "--no-render"]
+    )
+    monkeypatch.setattr(sys, "stdin", io.StringIO("apple\n"))
+    with pytest.raises(SystemExit) as exit:
+        cli.main()
+    assert exit.value.code == 2
+    assert "--deck" in capsys.readouterr().err
+    assert not os.path.exists("deck.pdf")
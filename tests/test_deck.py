@@ -0,0 +1,44 @@
+import asyncio
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+from src.benchmarks.stubs import StubServer
+from src.converter.writer import Layout
+from src.flashcards.deck import Deck
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.images import ImageStore
+
+
+def testFailedRendersAreSkipped(monkeypatch, tmp_path):
+    async def renderAsync(self, pool=None, **kwargs):
+        if self.word == "bad":
+            raise RuntimeError("The browser crashed.")
+        writer = PdfWriter()
+        writer.add_blank_page(100, 60)
+        writer.add_blank_page(100, 60)
+        file = io.BytesIO()
+        writer.write(file)
+        return file.getvalue()
+
+    monkeypatch.setattr(Flashcard, "renderAsync", renderAsync)
+    words = ["apple", "bad", "bird", "cloud"]
+    path = str(tmp_path / "deck.pdf")
+
+    async def run():
+        async with StubServer(0) as stubs:
+            deck = Deck(
+                words,
+                styles["watercolor"],
+                imageStore=ImageStore(str(tmp_path / "images")),
+                apiUrls=stubs.apiUrls,
+                openaiKwargs={"baseUrl": stubs.openaiUrl, "apiKey": "stub"},
+            )
+            return deck, await deck.write(path, Layout(duplex=None))
+
+    deck, written = asyncio.run(run())
+    assert written == 3
+    assert list(deck.failures) == ["bad"]
+    assert isinstance(deck.failures["bad"], RuntimeError)
+    assert len(PdfReader(path, strict=True).pages) == 6
@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import PIL.Image
+
+from src.flashcards.utils.images import (
+    BlobStore,
+    ImageStore,
+    _writeAtomically,
+    resample,
+)
+from src.flashcards.utils.structs import Image
+
+
+def testConcurrentWritesOfTheSameFile(tmp_path):
+    path = str(tmp_path / "image.jpg")
+    with ThreadPoolExecutor(8) as executor:
+        for future in [
+            executor.submit(_writeAtomically, path, b"data") for _ in range(200)
+        ]:
+            future.result()
+    with open(path, "rb") as f:
+        assert f.read() == b"data"
+
+
+def testConcurrentPutsOfTheSameBlob(tmp_path):
+    source = tmp_path / "image.png"
+    source.write_bytes(b"image")
+    blobs = BlobStore(str(tmp_path / "blobs"))
+    with ThreadPoolExecutor(8) as executor:
+        names = set(executor.map(lambda _: blobs.put(str(source)), range(200)))
+    assert len(names) == 1
+    with open(blobs.path(names.pop()), "rb") as f:
+        assert f.read() == b"image"
+
+
+def testResampleIntoTheStore(tmp_path, monkeypatch):
+    # Saved decks keep their images in a blob store, which may be read-only.
+    sourceDir = tmp_path / "blobs"
+    sourceDir.mkdir()
+    sourcePath = str(sourceDir / "source.png")
+    PIL.Image.new("RGBA", (400, 200), (255, 0, 0, 128)).save(sourcePath)
+    image = Image(sourcePath, (400, 200), "a prompt", "{PROMPT}")
+    store = ImageStore(str(tmp_path / "images"))
+
+    resampled = resample(image, (100, 100), "jpeg", 70, store)
+    assert resampled.size == (100, 50)
+    assert resampled.prompt == image.prompt
+    assert resampled.path.startswith(os.path.join(store.root, "resampled", ""))
+    with PIL.Image.open(resampled.path) as result:
+        assert (result.format, result.size) == ("JPEG", (100, 50))
+    assert os.listdir(sourceDir) == ["source.png"]
+
+    # Images are never enlarged, and each format is stored apart.
+    webp = resample(image, (1000, 1000), "webp", 70, store)
+    assert webp.size == (400, 200) and webp.path.endswith(".webp")
+    assert resample(image, (100, 100), "jpeg", 50, store).path != resampled.path
+
+    def open(*args, **kwargs):
+        raise AssertionError("The cached image should be reused.")
+
+    monkeypatch.setattr(PIL.Image, "open", open)
+    assert resample(image, (100, 100), "jpeg", 70, store) == resampled
+    assert os.listdir(sourceDir) == ["source.png"]
@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.benchmarks.stubs import StubServer
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.styles.styles import styles
+from src.flashcards.utils.images import sharedImageStore
+from src.flashcards.utils.openai import (
+    Budget,
+    BudgetExceededError,
+    OpenAiApiReqError,
+    OpenAiClient,
+    sharedClient,
+)
+
+completion = {
+    "choices": [{"message": {"content": "Hello."}}],
+    "usage": {"prompt_tokens": 1000, "completion_tokens": 1000, "total_tokens": 2000},
+}
+reqData = {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "Hi"}]}
+
+
+def serve(responses: list[web.Response], test):
+    """Run a test against a server answering with the responses, in order."""
+
+    async def chatCompletions(request: web.Request) -> web.Response:
+        times.append(time.monotonic())
+        return responses.pop(0)
+
+    times = []
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/chat/completions", chatCompletions)
+        async with TestServer(app) as server, aiohttp.ClientSession() as session:
+            return await test(session, str(server.make_url("")), times)
+
+    return asyncio.run(run())
+
+
+def client(session: aiohttp.ClientSession, url: str, **kwargs) -> OpenAiClient:
+    # Without backoff jitter, retries wait exactly as long as Retry-After asks.
+    return OpenAiClient(session, baseUrl=url, apiKey="test", backoffBase=0, **kwargs)
+
+
+def testRetriesAfterRateLimit():
+    responses = [
+        web.json_response(
+            {"error": "slow down"}, status=429, headers={"Retry-After": "0.2"}
+        ),
+        web.json_response(completion),
+    ]
+
+    async def test(session, url, times):
+        openai = client(session, url)
+        assert await openai.gpt(reqData) == "Hello."
+        assert openai.retries == 1
+        assert times[1] - times[0] >= 0.2
+
+    serve(responses, test)
+
+
+def testGivesUpAfterMaxRetries():
+    responses = [web.Response(status=503, text="unavailable") for _ in range(3)]
+
+    async def test(session, url, times):
+        openai = client(session, url, maxRetries=2)
+        with pytest.raises(OpenAiApiReqError):
+            await openai.gpt(reqData)
+        assert len(times) == 3
+
+    serve(responses, test)
+
+
+def testInsufficientQuotaIsNotRetried():
+    responses = [
+        web.json_response({"error": {"code": "insufficient_quota"}}, status=429),
+        web.json_response(completion),
+    ]
+
+    async def test(session, url, times):
+        openai = client(session, url)
+        with pytest.raises(OpenAiApiReqError, match="insufficient_quota"):
+            await openai.gpt(reqData)
+        assert openai.retries == 0
+        assert len(times) == 1
+
+    serve(responses, test)
+
+
+def testBudgetRefusesRequestsOnceSpent():
+    responses = [web.json_response(completion) for _ in range(2)]
+
+    async def test(session, url, times):
+        # The first completion costs $0.0035, which spends the whole budget.
+        openai = client(session, url, budget=Budget(limit=0.003))
+        assert await openai.gpt(reqData) == "Hello."
+        assert openai.budget.exceeded
+        with pytest.raises(BudgetExceededError):
+            await openai.gpt(reqData)
+        assert len(times) == 1
+
+    serve(responses, test)
+
+
+def testStandaloneFlashcardsShareTheClient(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharedImageStore, "root", str(tmp_path))
+
+    async def run():
+        openai = sharedClient()
+        assert sharedClient() is openai
+        async with StubServer(0) as stubs:
+            openai.baseUrl = stubs.openaiUrl
+            openai.apiKey = "stub"
+            flashcards = [Flashcard(word, styles["watercolor"]) for word in ("a", "b")]
+            # Each flashcard opens a session of its own.
+            await asyncio.gather(
+                *(flashcard.generate(apiUrls=stubs.apiUrls) for flashcard in flashcards)
+            )
+        return openai
+
+    openai = asyncio.run(run())
+    assert openai.budget.images == 2
+    assert openai.session is None
+
+    async def otherLoop():
+        return sharedClient()
+
+    # Its rate limits wait on its own event loop.
+    assert asyncio.run(otherLoop()) is not openai
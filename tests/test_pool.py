@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.converter import pool as poolModule
+from src.converter.pool import RendererPool
+
+pytest.importorskip("selenium")
+
+
+class FakeWebdriver:
+    def __init__(self):
+        self.closed = False
+
+    def execute_script(self, script):
+        return 0
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def launches(monkeypatch):
+    """Launch fake browsers, which fail to launch while "fail" is True."""
+    state = {"fail": False, "launched": 0}
+
+    def createWebdriver(driverPath=None):
+        if state["fail"]:
+            raise RuntimeError("chromedriver failed to start")
+        state["launched"] += 1
+        return FakeWebdriver()
+
+    monkeypatch.setattr(poolModule, "createWebdriver", createWebdriver)
+    return state
+
+
+def testFailedRelaunchKeepsSlot(launches):
+    async def run():
+        async with RendererPool(1) as pool:
+            launches["fail"] = True
+            with pytest.raises(ValueError):
+                async with pool.renderer():
+                    raise ValueError
+            # The slot is left empty, and is launched again by each check-out.
+            with pytest.raises(RuntimeError):
+                async with pool.renderer():
+                    pass
+            launches["fail"] = False
+            async with asyncio.timeout(5):
+                async with pool.renderer() as renderer:
+                    assert isinstance(renderer.webdriver, FakeWebdriver)
+
+    asyncio.run(run())
+    assert launches["launched"] == 2
+
+
+def testCancelledRenderFinishesBeforeRecycle(launches):
+    started = threading.Event()
+    release = threading.Event()
+    closedDuringRender = []
+
+    def render(webdriver):
+        started.set()
+        release.wait(5)
+        closedDuringRender.append(webdriver.closed)
+
+    async def run():
+        async with RendererPool(1) as pool:
+
+            async def use():
+                async with pool.renderer() as renderer:
+                    await pool._use(renderer, render, renderer.webdriver)
+
+            task = asyncio.create_task(use())
+            await asyncio.to_thread(started.wait, 5)
+            task.cancel()
+            await asyncio.sleep(0.05)
+            release.set()
+            async with asyncio.timeout(5):
+                async with pool.renderer() as renderer:
+                    assert not renderer.webdriver.closed
+
+    asyncio.run(run())
+    assert closedDuringRender == [False]
+    assert launches["launched"] == 2
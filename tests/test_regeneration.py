@@ -0,0 +1,74 @@
+import asyncio
+import copy
+
+import aiohttp
+
+from src.benchmarks.stubs import StubServer
+from src.flashcards.batch import genBatch
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.generator import Generator, fingerprint, fieldRequests
+from src.flashcards.storage import CardReader, CardWriter
+from src.flashcards.styles.styles import Style, styles
+from src.flashcards.utils.images import ImageStore
+from src.flashcards.utils.openai import OpenAiClient
+
+
+def withCount(style: Style, field: str, count: int) -> Style:
+    config = copy.deepcopy(style.config)
+    config[field]["count"] = count
+    return Style(
+        style.name, style.front, style.back, style.size, config, style.backend
+    )
+
+
+def generate(flashcard: Flashcard, imagePath: str, batch: list[str] = ()):
+    """Generate a flashcard against the stubs, with other words batched with it."""
+
+    async def run():
+        async with StubServer(0) as stubs, aiohttp.ClientSession() as session:
+            openai = OpenAiClient(session, baseUrl=stubs.openaiUrl, apiKey="stub")
+            generators = [
+                Generator(
+                    word,
+                    session,
+                    imageStore=ImageStore(imagePath),
+                    openai=openai,
+                    apiUrls=stubs.apiUrls,
+                )
+                for word in (flashcard.word, *batch)
+            ]
+            if batch:
+                await genBatch(generators, flashcard.style.config)
+            await flashcard.generate(generator=generators[0])
+            return stubs.requests
+
+    return asyncio.run(run())
+
+
+def testToppingUpKeepsItemsAndAddsNewOnes(tmp_path):
+    style = styles["watercolor"]
+    flashcard = Flashcard("bird", style)
+    generate(flashcard, str(tmp_path / "images"))
+    sentences = flashcard.fields["sentences"]
+    assert len(sentences) == 3
+
+    # Saved and loaded, as a resumed build would.
+    path = str(tmp_path / "cards.jsonl")
+    with CardWriter(path) as writer:
+        writer.write(flashcard)
+    flashcard = next(iter(CardReader(path)))
+    flashcard.style = withCount(style, "sentences", 4)
+    requests = generate(flashcard, str(tmp_path / "images"), batch=["cat"])
+
+    topped = flashcard.fields["sentences"]
+    assert topped[:3] == sentences
+    assert len(topped) == 4
+    assert len({sentence.lower() for sentence in topped}) == 4
+    # Only the sentences were generated again, and the images came from the store.
+    assert requests["dalle"] == 0
+
+
+def testImageFingerprintCoversTheDalleRequest(monkeypatch):
+    before = fingerprint("images", styles["watercolor"].config["images"])
+    monkeypatch.setitem(fieldRequests, "images", {"model": "dall-e-3"})
+    assert fingerprint("images", styles["watercolor"].config["images"]) != before
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.benchmarks.stubs import StubServer
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.service import FlashcardService, LruCache
+from src.flashcards.utils.images import ImageStore
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Render flashcards as their word, without a browser, counting the renders."""
+    counts = {"pdf": 0, "png": 0}
+
+    async def renderAsync(self, pool=None, **kwargs):
+        counts["pdf"] += 1
+        # Slow enough for concurrent requests to overlap.
+        await asyncio.sleep(0.05)
+        return f"PDF of {self.word}: {self.fields['sentences'][0]}".encode()
+
+    async def renderPngAsync(self, back=False, scale=1, pool=None, **kwargs):
+        counts["png"] += 1
+        return f"PNG of {self.word}, back={back}, scale={scale}".encode()
+
+    monkeypatch.setattr(Flashcard, "renderAsync", renderAsync)
+    monkeypatch.setattr(Flashcard, "renderPngAsync", renderPngAsync)
+    return counts
+
+
+def serve(test, tmp_path, **kwargs):
+    """Run a test against a service generating from the stubs."""
+
+    async def run():
+        async with StubServer(0) as stubs:
+            service = FlashcardService(
+                renderers=0,
+                imageStore=ImageStore(str(tmp_path / "images")),
+                apiUrls=stubs.apiUrls,
+                openaiKwargs={"baseUrl": stubs.openaiUrl, "apiKey": "stub"},
+                **kwargs,
+            )
+            async with TestClient(TestServer(service.app())) as client:
+                await test(client, service, stubs)
+
+    asyncio.run(run())
+
+
+def testConcurrentRequestsAreCoalesced(renders, tmp_path):
+    async def test(client, service, stubs):
+        responses = await asyncio.gather(
+            *(client.get("/cards/watercolor/Bird.pdf") for _ in range(10))
+        )
+        bodies = {await response.read() for response in responses}
+        assert [response.status for response in responses] == [200] * 10
+        assert len(bodies) == 1 and bodies.pop().startswith(b"PDF of Bird: ")
+        assert responses[0].content_type == "application/pdf"
+        assert service.stats["generations"] == 1
+        assert renders["pdf"] == 1
+        assert stubs.requests["dictionary"] == 1
+
+        # Other renders of the same flashcard reuse its generation.
+        response = await client.get("/cards/watercolor/Bird.png?side=back&scale=2")
+        assert response.content_type == "image/png"
+        assert await response.read() == b"PNG of Bird, back=True, scale=2.0"
+        assert service.stats["generations"] == 1
+
+    serve(test, tmp_path)
+
+
+def testETags(renders, tmp_path):
+    async def test(client, service, stubs):
+        response = await client.get("/cards/watercolor/bird.pdf")
+        etag = response.headers["ETag"]
+        response = await client.get(
+            "/cards/watercolor/bird.pdf", headers={"If-None-Match": f'"x", {etag}'}
+        )
+        assert response.status == 304
+        assert response.headers["ETag"] == etag
+        response = await client.get(
+            "/cards/watercolor/bird.pdf", headers={"If-None-Match": '"stale"'}
+        )
+        assert response.status == 200
+        assert renders["pdf"] == 1
+        assert service.stats["cacheHits"] == 2
+
+    serve(test, tmp_path)
+
+
+def testWordsKeepTheirCase(renders, tmp_path):
+    async def test(client, service, stubs):
+        for word in ("Apple", "apple", "Apple"):
+            response = await client.get(f"/cards/watercolor/{word}.pdf")
+            assert (await response.read()).startswith(f"PDF of {word}: ".encode())
+        assert service.stats["generations"] == 2
+
+    serve(test, tmp_path)
+
+def testBadRequests(renders, tmp_path):
+    async def test(client, service, stubs):
+        assert (await client.get("/cards/unknown/bird.pdf")).status == 404
+        assert (await client.get("/cards/watercolor/bird.gif")).status == 404
+        response = await client.get("/cards/watercolor/bird.png?scale=9")
+        assert response.status == 400
+
+    serve(test, tmp_path)
+
+
+def testFailuresDoNotLeakDetails(monkeypatch, tmp_path):
+    async def renderAsync(self, pool=None, **kwargs):
+        raise OSError("/secret/path/chromedriver is missing")
+
+    monkeypatch.setattr(Flashcard, "renderAsync", renderAsync)
+
+    async def test(client, service, stubs):
+        response = await client.get("/cards/watercolor/bird.pdf")
+        assert response.status == 502
+        assert "secret" not in await response.text()
+
+    serve(test, tmp_path)
+
+
+def testFileCacheIsBoundedInBytes():
+    cache = LruCache(10, maxBytes=10, sizeOf=len)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("a", b"123")
+    assert cache.bytes == 8
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"123"
+    assert cache.bytes == 7
+    cache.put("d", b"12345678901")
+    assert cache.get("d") is None and cache.bytes == 7
@@ -0,0 +1,37 @@
+import os
+
+from src.flashcards.flashcard import Flashcard
+from src.flashcards.storage import CardReader, CardWriter, truncatePartialLine
+from src.flashcards.styles.styles import styles
+
+
+def flashcard(word: str) -> Flashcard:
+    flashcard = Flashcard(word, styles["watercolor"])
+    flashcard.fields.update({"partOfSpeech": "noun", "synonyms": [f"{word}-synonym"]})
+    return flashcard
+
+
+def testAppendingAfterATruncatedLine(tmp_path):
+    path = str(tmp_path / "cards.jsonl")
+    with CardWriter(path) as writer:
+        writer.write(flashcard("cat"))
+        writer.write(flashcard("dog"))
+    # A crash cuts the last line short.
+    os.truncate(path, os.path.getsize(path) - 10)
+    assert [card.word for card in CardReader(path)] == ["cat"]
+
+    with CardWriter(path) as writer:
+        writer.write(flashcard("bird"))
+    cards = list(CardReader(path))
+    assert [card.word for card in cards] == ["cat", "bird"]
+    assert cards[1].fields["synonyms"] == ["bird-synonym"]
+
+
+def testTruncatingAcrossChunks(tmp_path):
+    path = tmp_path / "lines.jsonl"
+    path.write_bytes(b"first\nsecond line cut sho")
+    truncatePartialLine(str(path), chunkSize=4)
+    assert path.read_bytes() == b"first\n"
+    path.write_bytes(b"no newline at all")
+    truncatePartialLine(str(path), chunkSize=4)
+    assert path.read_bytes() == b""
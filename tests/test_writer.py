@@ -0,0 +1,140 @@
+import io
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream, DecodedStreamObject
+
+from src.converter.writer import DeckWriter, Layout
+
+cardSize = (100, 60)
+
+
+def card(index: int, sides: int = 2) -> bytes:
+    """A card whose pages each draw a 1x1 square at (index, side) to be told apart."""
+    writer = PdfWriter()
+    for side in range(sides):
+        page = writer.add_blank_page(*cardSize)
+        contents = DecodedStreamObject()
+        contents.set_data(f"{index} {side} 1 1 re f".encode())
+        page.replace_contents(contents)
+    file = io.BytesIO()
+    writer.write(file)
+    return file.getvalue()
+
+
+def write(cards: int, layout: Layout) -> tuple[DeckWriter, PdfReader]:
+    """Write a deck of cards, and parse it back strictly."""
+    file = io.BytesIO()
+    with DeckWriter(file, layout) as writer:
+        for index in range(cards):
+            writer.add(card(index))
+    return writer, PdfReader(io.BytesIO(file.getvalue()), strict=True)
+
+
+def cells(reader: PdfReader) -> list[dict[tuple[int, int], tuple[float, float]]]:
+    """The position of every (card, side) on each sheet."""
+    sheets = []
+    for page in reader.pages:
+        positions = {}
+        offset = (0.0, 0.0)
+        contents = ContentStream(page.get_contents(), reader)
+        for operands, operator in contents.operations:
+            if operator == b"cm":
+                offset = (float(operands[4]), float(operands[5]))
+            elif operator == b"re" and operands[2:] == [1, 1]:
+                positions[int(operands[0]), int(operands[1])] = offset
+        sheets.append(positions)
+    return sheets
+
+
+def testSheetCount():
+    writer, reader = write(5, Layout(2, 2))
+    # Two sheets of fronts, each followed by a sheet of backs.
+    assert (writer.cards, writer.sheets, len(reader.pages)) == (5, 4, 4)
+
+    writer, reader = write(5, Layout(2, 2, duplex=None))
+    # Ten pages, four to a sheet.
+    assert (writer.cards, writer.sheets, len(reader.pages)) == (5, 3, 3)
+
+    writer, reader = write(0, Layout(2, 2))
+    assert (writer.sheets, len(reader.pages)) == (0, 0)
+
+
+def testSheetSize():
+    _, reader = write(1, Layout(2, 1, margin=10, gap=5))
+    box = reader.pages[0].mediabox
+    assert (box.width, box.height) == (2 * 100 + 5 + 2 * 10, 60 + 2 * 10)
+
+    _, reader = write(1, Layout(2, 1, sheetSize=(612, 792)))
+    box = reader.pages[0].mediabox
+    assert (box.width, box.height) == (612, 792)
+
+
+def testLongEdgeDuplexMirrorsColumns():
+    _, reader = write(4, Layout(2, 2, duplex="long"))
+    fronts, backs = cells(reader)
+    assert fronts == {
+        (0, 0): (0, 60),
+        (1, 0): (100, 60),
+        (2, 0): (0, 0),
+        (3, 0): (100, 0),
+    }
+    assert backs == {
+        (0, 1): (100, 60),
+        (1, 1): (0, 60),
+        (2, 1): (100, 0),
+        (3, 1): (0, 0),
+    }
+
+
+def testShortEdgeDuplexMirrorsRows():
+    _, reader = write(4, Layout(2, 2, duplex="short"))
+    fronts, backs = cells(reader)
+    assert fronts == {
+        (0, 0): (0, 60),
+        (1, 0): (100, 60),
+        (2, 0): (0, 0),
+        (3, 0): (100, 0),
+    }
+    assert backs == {
+        (0, 1): (0, 0),
+        (1, 1): (100, 0),
+        (2, 1): (0, 60),
+        (3, 1): (100, 60),
+    }
+
+
+def testSimplexTakesPagesInOrder():
+    _, reader = write(3, Layout(2, 2, duplex=None))
+    first, second = cells(reader)
+    assert first == {
+        (0, 0): (0, 60),
+        (0, 1): (100, 60),
+        (1, 0): (0, 0),
+        (1, 1): (100, 0),
+    }
+    assert second == {(2, 0): (0, 60), (2, 1): (100, 60)}
+
+
+def testMissingBacksLeaveTheirCellsEmpty():
+    file = io.BytesIO()
+    with DeckWriter(file, Layout(2, 1)) as writer:
+        writer.add(card(0, sides=1))
+        writer.add(card(1))
+    fronts, backs = cells(PdfReader(io.BytesIO(file.getvalue()), strict=True))
+    assert fronts == {(0, 0): (0, 0), (1, 0): (100, 0)}
+    assert backs == {(1, 1): (0, 0)}
+
+
+def testWritesAfterExistingContent(tmp_path):
+    # PDFs written into an open file count offsets from where they start.
+    file = io.BytesIO(b"prefix")
+    file.seek(0, io.SEEK_END)
+    with DeckWriter(file, Layout(2, 2)) as writer:
+        writer.add(card(0))
+    reader = PdfReader(io.BytesIO(file.getvalue()[len(b"prefix") :]), strict=True)
+    assert len(reader.pages) == 2
+
+    path = str(tmp_path / "deck.pdf")
+    with DeckWriter(path, Layout(2, 2)) as writer:
+        writer.add(card(0))
+    assert len(PdfReader(path, strict=True).pages) == 2